@@ -0,0 +1,130 @@
+"""
+Compare the annotation duration and episode checks of SanityCheck, done episode by episode
+with iterrows as before and column-wise as now, on a synthetic multi-week annotation log.
+
+Usage: python benchmarks/bench_annotation_checks.py [number of episodes]
+"""
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from dateutil.parser import parse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'padar_extra'))
+import SanityCheck
+import TimestampParser
+
+COLUMNS = ['PID', 'ANNOTATOR', 'START_TIME', 'STOP_TIME', 'LABEL_NAME', 'ISSUE']
+LOWER_BOUND = '60 seconds'
+UPPER_BOUND = '20 minutes'
+EPISODE_DURATION = {'sleep': ['>10m', '<2m'], 'walking': '>15m'}
+EPISODE_TIME = {'ambulation': ['10pm', '11pm'], 'sleep': ['9am', '5pm']}
+
+
+def make_annotation(n, seed=0):
+    random = np.random.RandomState(seed)
+    labels = np.array(['Sleep', 'Walking', 'Ambulation', 'Sitting', 'sleep'])
+    durations = pd.Series(pd.to_timedelta(random.randint(10, 1800, n), unit='s'))
+    gaps = pd.Series(pd.to_timedelta(random.randint(0, 600, n), unit='s'))
+    start_time = pd.Timestamp('2015-10-08 00:00:00') + (durations + gaps).cumsum() - durations
+    return pd.DataFrame({'HEADER_TIME_STAMP': start_time,
+                         'START_TIME': start_time,
+                         'STOP_TIME': start_time + durations,
+                         'LABEL_NAME': labels[random.randint(0, len(labels), n)]})
+
+
+def format_time_delta(s):
+    return '{:02}:{:02}:{:02}'.format(int(s.total_seconds()) // 3600, int(s.total_seconds()) % 3600 // 60, int(s.total_seconds()) % 60)
+
+
+def check_episode_duration(series, episode_duration_limits, pid, annotator):
+    if series[3].lower() in episode_duration_limits:
+        duration = series[2] - series[1]
+        limits = episode_duration_limits[series[3].lower()]
+        if not isinstance(limits, list):
+            limits = [limits]
+        for time_limit in limits:
+            if '>' in time_limit:
+                time_token = pd.Timedelta(re.findall('>(.*)', time_limit)[0])
+                if duration > time_token:
+                    return {'PID': pid, 'ANNOTATOR': annotator, 'START_TIME': series[1], 'STOP_TIME': series[2],
+                            'LABEL_NAME': series[3],
+                            'ISSUE': 'Activity {} beyond specified limit {}, duration: {}'.format(
+                                    series[3], format_time_delta(time_token), duration)}
+            elif '<' in time_limit:
+                time_token = pd.Timedelta(re.findall('<(.*)', time_limit)[0])
+                if duration < time_token:
+                    return {'PID': pid, 'ANNOTATOR': annotator, 'START_TIME': series[1], 'STOP_TIME': series[2],
+                            'LABEL_NAME': series[3],
+                            'ISSUE': 'Activity {} below specified limit {}, duration: {}'.format(
+                                    series[3], format_time_delta(time_token), duration)}
+    return None
+
+
+def check_episode_time(series, episode_time_limits, pid, annotator):
+    if series[3].lower() in episode_time_limits:
+        limits = episode_time_limits[series[3].lower()]
+        lower_bound = parse(limits[0]).time()
+        upper_bound = parse(limits[1]).time()
+        start_time = pd.to_datetime(series[1]).time()
+        stop_time = pd.to_datetime(series[2]).time()
+        if stop_time > lower_bound and start_time < upper_bound:
+            return {'PID': pid, 'ANNOTATOR': annotator, 'START_TIME': series[1], 'STOP_TIME': series[2],
+                    'LABEL_NAME': series[3],
+                    'ISSUE': 'Activity {} in specified abnormal period of time: {} to {}'.format(
+                            series[3], lower_bound, upper_bound)}
+    return None
+
+
+def check_by_row(annotation_table, pid, annotator):
+    """
+    The checks done episode by episode, as in SanityCheck before they were vectorized
+    """
+    lower_bound = pd.Timedelta(LOWER_BOUND)
+    upper_bound = pd.Timedelta(UPPER_BOUND)
+    exceptions = []
+    for index, series in annotation_table.iterrows():
+        start_time = series[1]
+        stop_time = series[2]
+        if stop_time - start_time < lower_bound:
+            exceptions.append({'PID': pid, 'ANNOTATOR': annotator, 'START_TIME': start_time, 'STOP_TIME': stop_time,
+                               'LABEL_NAME': series[3], 'ISSUE': 'Too short, duration: {}'.format(stop_time - start_time)})
+        if stop_time - start_time > upper_bound:
+            exceptions.append({'PID': pid, 'ANNOTATOR': annotator, 'START_TIME': start_time, 'STOP_TIME': stop_time,
+                               'LABEL_NAME': series[3], 'ISSUE': 'Too long, duration: {}'.format(stop_time - start_time)})
+        exceptions.append(check_episode_duration(series, EPISODE_DURATION, pid, annotator))
+        exceptions.append(check_episode_time(series, EPISODE_TIME, pid, annotator))
+    exceptions = pd.DataFrame([x for x in exceptions if x is not None], columns=COLUMNS)
+    # the times are written with milliseconds, as in annotation_exceptions.csv
+    exceptions['START_TIME'] = TimestampParser.format_timestamps(exceptions['START_TIME'])
+    exceptions['STOP_TIME'] = TimestampParser.format_timestamps(exceptions['STOP_TIME'])
+    return exceptions
+
+
+def check_by_column(annotation_table, pid, annotator):
+    return getattr(SanityCheck, '__check_annotation_table')(
+            annotation_table, pd.Timedelta(LOWER_BOUND), pd.Timedelta(UPPER_BOUND),
+            getattr(SanityCheck, '__parse_episode_duration_limits')(EPISODE_DURATION),
+            getattr(SanityCheck, '__parse_episode_time_limits')(EPISODE_TIME),
+            pid, annotator)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    annotation_table = make_annotation(n)
+    old_table, old_time = timed(check_by_row, annotation_table, 'SPADES_1', 'SPADES_1.annotator')
+    new_table, new_time = timed(check_by_column, annotation_table, 'SPADES_1', 'SPADES_1.annotator')
+    same = old_table.astype(str).equals(new_table.astype(str))
+    print('episodes: {}, exceptions: {}'.format(n, new_table.shape[0]))
+    print('by row:    {:.3f} s'.format(old_time))
+    print('by column: {:.3f} s'.format(new_time))
+    print('speedup: {:.1f}x, same exceptions: {}'.format(old_time / new_time, same))
@@ -0,0 +1,65 @@
+"""
+Compare AnnotationIndex.labels_during with the scan of all the annotations for every window it
+replaces in ModelAnalyzer.align_real_features_and_annotation, on feature windows of 12.8 seconds
+over synthetic splitted annotations.
+
+Usage: python benchmarks/bench_annotation_index.py [OPTIONS]
+"""
+import os
+import sys
+import time
+
+import click
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'padar_extra'))
+import AnnotationIndex
+import AnnotationSplitter
+import bench_annotation_splitter
+
+WINDOW_SECONDS = 12.8
+
+
+def scan_labels_during(annotations, start_times, stop_times):
+    """
+    The previous lookup, the label of the first annotation containing every window
+    """
+    labels = []
+    annotation_start_times = annotations['START_TIME']
+    annotation_stop_times = annotations['STOP_TIME']
+    for start_time, stop_time in zip(start_times, stop_times):
+        for i in range(len(annotation_start_times) + 1):
+            if i == len(annotation_start_times):
+                labels.append('not started')
+            elif annotation_start_times[i] <= start_time:
+                if annotation_stop_times[i] >= stop_time:
+                    labels.append(annotations['LABEL_NAME'][i])
+                    break
+    return np.asarray(labels, dtype=object)
+
+
+@click.command()
+@click.option('--rows', default=500, help='number of annotations before splitting')
+@click.option('--windows', default=1000, help='number of feature windows')
+@click.option('--repeat', default=3, help='number of runs of every lookup')
+def main(rows, windows, repeat):
+    annotations = AnnotationSplitter.annotation_splitter(bench_annotation_splitter.generate_annotations(rows, 1.5, 0))
+    start_times = annotations['START_TIME'].iloc[0] + pd.to_timedelta(np.arange(windows) * WINDOW_SECONDS, unit='s')
+    stop_times = start_times + pd.to_timedelta(WINDOW_SECONDS, unit='s')
+    print('{} splitted annotations, {} windows'.format(annotations.shape[0], windows))
+
+    lookups = [('scan of the annotations', lambda: scan_labels_during(annotations, start_times, stop_times)),
+               ('AnnotationIndex.labels_during',
+                lambda: AnnotationIndex.AnnotationIndex(annotations).labels_during(start_times, stop_times,
+                                                                                   missing='not started'))]
+    results = []
+    for name, function in lookups:
+        seconds, result = bench_annotation_splitter.best_time(function, repeat)
+        results.append(result)
+        print('  {:<34} {:8.3f} s'.format(name, seconds))
+    assert np.array_equal(results[0], results[1]), 'the lookups do not find the same labels'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Compare AnnotationSplitter.annotation_splitter with the loop over the sorted start and stop times
+it replaces, on synthetic overlapping annotations, and check that both split them the same way.
+
+Usage: python benchmarks/bench_annotation_splitter.py [OPTIONS]
+"""
+import os
+import sys
+import time
+
+import click
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'padar_extra'))
+import AnnotationSplitter
+import TimestampParser
+
+LABELS = ['Walking', 'sitting', 'Standing ', 'lying', 'Talking', 'using phone', 'eating', 'Typing']
+
+
+def loop_annotation_splitter(in_annotation):
+    """
+    The previous annotation_splitter, a loop over the sorted start and stop times
+    """
+    time_list = []
+    start_times = TimestampParser.parse_timestamps(in_annotation.iloc[:,1])
+    stop_times = TimestampParser.parse_timestamps(in_annotation.iloc[:,2])
+    for index, start_time, stop_time, label in zip(in_annotation.index, start_times,
+                                                   stop_times, in_annotation.iloc[:,3]):
+        time_list.append((start_time, label,'start',index))
+        time_list.append((stop_time, label,'end',index))
+    time_list.sort(key=lambda tup:tup[0])
+
+    curr_activities = []
+    splitted_time_list = []
+    last_time = time_list[0][0]
+
+    for time_record in time_list:
+        curr_time = time_record[0]
+        if curr_time == last_time and time_record[2] == 'start':
+            curr_activities.append(time_record[1].lower().strip())
+        else:
+            if len(curr_activities) > 0 and last_time != curr_time:
+                curr_activities.sort()
+                new_label = '-'.join(curr_activities)
+                splitted_time_list.append(pd.Series([last_time, last_time, curr_time, new_label],
+                                                    index=['HEADER_TIME_STAMP','START_TIME','STOP_TIME','LABEL_NAME']))
+            if time_record[2] == 'start':
+                curr_activities.append(time_record[1].lower().strip())
+            else:
+                curr_activities.remove(time_record[1].lower().strip())
+
+            last_time = curr_time
+
+    splitted_time_list.sort(key=lambda series: series['START_TIME'])
+    return pd.DataFrame(splitted_time_list)
+
+
+def generate_annotations(rows, overlap, seed):
+    """
+    Return rows annotations in mHealth format, in random order, with on average overlap annotations
+    at any time. The times are whole seconds, so many annotations start or stop at the same time,
+    and some have the same start and stop time.
+    """
+    random = np.random.RandomState(seed)
+    durations = random.exponential(600, rows).astype(np.int64)
+    durations[random.rand(rows) < 0.01] = 0
+    span = int(durations.sum() / overlap) + 1
+    start_times = pd.Timestamp('2015-10-08 20:00:00') + pd.to_timedelta(random.randint(0, span, rows), unit='s')
+    stop_times = start_times + pd.to_timedelta(durations, unit='s')
+    start_strings = start_times.strftime(TimestampParser.MHEALTH_TIMESTAMP_FORMAT).str[:-3]
+    return pd.DataFrame({'HEADER_TIME_STAMP': start_strings,
+                         'START_TIME': start_strings,
+                         'STOP_TIME': stop_times.strftime(TimestampParser.MHEALTH_TIMESTAMP_FORMAT).str[:-3],
+                         'LABEL_NAME': random.choice(LABELS, rows)})
+
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+@click.command()
+@click.option('--rows', default=20000, help='number of annotations')
+@click.option('--overlap', default=3.0, help='average number of annotations at any time')
+@click.option('--repeat', default=3, help='number of runs of every splitter')
+@click.option('--seed', default=0, help='seed of the random generator')
+def main(rows, overlap, repeat, seed):
+    in_annotation = generate_annotations(rows, overlap, seed)
+    print('{} annotations with {} overlapping on average'.format(rows, overlap))
+    results = []
+    for name, function in [('loop over the sorted times', loop_annotation_splitter),
+                           ('AnnotationSplitter.annotation_splitter', AnnotationSplitter.annotation_splitter)]:
+        seconds, result = best_time(lambda: function(in_annotation), repeat)
+        results.append(result)
+        print('  {:<40} {:8.3f} s'.format(name, seconds))
+    assert results[0].equals(results[1]), 'the splitters do not split the annotations the same way'
+    print('{} segments, identical'.format(results[1].shape[0]))
+
+    # the annotations sorted by start time in hourly chunks, like the hourly annotation files
+    in_annotation = in_annotation.sort_values('START_TIME', kind='mergesort')
+    chunks = [x for _, x in in_annotation.groupby(in_annotation['START_TIME'].str[:13], sort=True)]
+    seconds, result = best_time(lambda: pd.concat(list(AnnotationSplitter.iter_annotation_splitter(chunks)),
+                                                  ignore_index=True), repeat)
+    assert result.equals(results[1]), 'the streaming splitter does not split the annotations the same way'
+    print('  {:<40} {:8.3f} s, {} hourly chunks, identical'.format('AnnotationSplitter.iter_annotation_splitter',
+                                                                  seconds, len(chunks)))
+
+
+if __name__ == '__main__':
+    main()
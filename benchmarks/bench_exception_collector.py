@@ -0,0 +1,70 @@
+"""
+Compare the time to accumulate sanity check exceptions row by row with DataFrame.append
+and with ExceptionCollector, for a participant with many flagged minutes.
+
+Usage: python benchmarks/bench_exception_collector.py [number of exceptions]
+"""
+import os
+import sys
+import time
+import warnings
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'padar_extra'))
+import ExceptionCollector
+
+COLUMNS = ['PID', 'ANNOTATOR', 'START_TIME', 'STOP_TIME', 'LABEL_NAME', 'ISSUE']
+
+
+def make_records(n):
+    start = pd.Timestamp('2015-10-08 10:00:00')
+    records = []
+    for i in range(n):
+        start_time = start + pd.Timedelta(minutes=i)
+        stop_time = start_time + pd.Timedelta(seconds=30)
+        records.append({'PID': 'SPADES_1',
+                        'ANNOTATOR': 'SPADES_1.annotator',
+                        'START_TIME': start_time,
+                        'STOP_TIME': stop_time,
+                        'LABEL_NAME': 'walking',
+                        'ISSUE': 'Too short, duration: {}'.format(stop_time - start_time)})
+    return records
+
+
+def append_rows(records):
+    table = pd.DataFrame(columns=COLUMNS)
+    for record in records:
+        if hasattr(table, 'append'):
+            table = table.append(record, ignore_index=True)
+        else:
+            # DataFrame.append was removed in pandas 2, concat copies the frame the same way
+            table = pd.concat([table, pd.DataFrame([record], columns=COLUMNS)], ignore_index=True)
+    return table
+
+
+def collect_rows(records):
+    collector = ExceptionCollector.ExceptionCollector(COLUMNS)
+    for record in records:
+        collector.append(record)
+    return collector.to_frame()
+
+
+def timed(function, records):
+    start = time.perf_counter()
+    result = function(records)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    # DataFrame.append is deprecated since pandas 1.4
+    warnings.simplefilter('ignore', FutureWarning)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    records = make_records(n)
+    old_table, old_time = timed(append_rows, records)
+    new_table, new_time = timed(collect_rows, records)
+    same = old_table.astype(str).equals(new_table.astype(str))
+    print('exceptions: {}'.format(n))
+    print('DataFrame.append:   {:.3f} s'.format(old_time))
+    print('ExceptionCollector: {:.3f} s'.format(new_time))
+    print('speedup: {:.1f}x, same table: {}'.format(old_time / new_time, same))
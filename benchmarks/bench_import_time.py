@@ -0,0 +1,96 @@
+"""
+Measure the cold start of every command line tool by running `--help`, with `python -X importtime`
+from Python 3.7, and fail if it takes longer than a limit or loads one of the heavy libraries, which
+must only be imported by the commands using them. The libraries loaded are read from sys.modules of
+the process running the command, so they are checked on every Python version.
+
+Usage: python benchmarks/bench_import_time.py [OPTIONS]
+"""
+import os
+import subprocess
+import sys
+import time
+
+import click
+
+TOOLS_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'padar_extra')
+COMMANDS = ['SanityCheckCommand.py', 'VisualizerCommand.py', 'InteractiveHistogramCommand.py',
+            'SensorCacheCommand.py', 'DatasetCatalogCommand.py']
+HEAVY_MODULES = ['pandas', 'numpy', 'bokeh', 'bs4', 'yaml', 'dateutil', 'sklearn', 'matplotlib', 'plotly',
+                 'dash', 'pyarrow']
+# -X importtime is only available from Python 3.7
+IMPORT_TIME = sys.version_info >= (3, 7)
+MODULES_PREFIX = 'modules loaded:'
+# run the command given as argument, then write the modules it loaded on stderr
+HELP_SCRIPT = """
+import runpy, sys
+sys.argv = [sys.argv[1], '--help']
+code = 0
+try:
+    runpy.run_path(sys.argv[0], run_name='__main__')
+except SystemExit as e:
+    code = e.code
+sys.stderr.write('{} ' + ' '.join(sorted(sys.modules)) + '\\n')
+sys.exit(code)
+""".format(MODULES_PREFIX)
+
+
+def run_help(command):
+    """
+    Run the help of a command, return the wall seconds, the import microseconds from the report of
+    -X importtime, None before Python 3.7, and the top level packages loaded
+    """
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable] + (['-X', 'importtime'] if IMPORT_TIME else []) +
+                             ['-c', HELP_SCRIPT, command], cwd=TOOLS_PATH,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    seconds = time.perf_counter() - start
+    if process.returncode != 0:
+        raise click.ClickException('{} --help failed:\n{}'.format(command, process.stderr))
+
+    import_us = 0 if IMPORT_TIME else None
+    import_lines = 0
+    packages = None
+    for line in process.stderr.splitlines():
+        if line.startswith(MODULES_PREFIX):
+            packages = set(x.split('.')[0] for x in line[len(MODULES_PREFIX):].split())
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        import_lines += 1
+        # the modules imported at the top level are not indented
+        if not name[1:].startswith(' '):
+            import_us += int(cumulative)
+    if packages is None:
+        raise click.ClickException('{} --help did not report the modules loaded:\n{}'.format(command, process.stderr))
+    if IMPORT_TIME and import_lines == 0:
+        raise click.ClickException('{} --help did not report the import times:\n{}'.format(command, process.stderr))
+    return seconds, import_us, packages
+
+
+@click.command()
+@click.option('--repeat', default=5, help='number of runs of every command, the fastest is kept')
+@click.option('--max_seconds', default=1.0, help='the limit of the wall time of --help of every command')
+def main(repeat, max_seconds):
+    failures = []
+    print('{:<32} {:>10} {:>10}  {}'.format('command', 'wall (s)', 'import (s)', 'heavy modules loaded'))
+    for command in COMMANDS:
+        runs = [run_help(command) for _ in range(repeat)]
+        seconds = min(x[0] for x in runs)
+        import_seconds = '{:10.3f}'.format(min(x[1] for x in runs) / 1e6) if IMPORT_TIME else '{:>10}'.format('-')
+        heavy = sorted(set(HEAVY_MODULES) & set.union(*[x[2] for x in runs]))
+        print('{:<32} {:10.3f} {}  {}'.format(command, seconds, import_seconds, ', '.join(heavy) or '-'))
+        if seconds > max_seconds:
+            failures.append('{} --help takes {:.3f} s, more than {} s'.format(command, seconds, max_seconds))
+        if heavy:
+            failures.append('{} --help loads {}'.format(command, ', '.join(heavy)))
+
+    if failures:
+        raise click.ClickException('\n'.join(failures))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Benchmark the checks of SanityCheck on synthetic datasets of several sizes, and write the
+timings in a JSON file, so the results of different versions can be compared.
+
+Usage: python benchmarks/bench_sanity_check.py [OPTIONS]
+"""
+import contextlib
+import datetime as dt
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+import click
+import numpy as np
+import pandas as pd
+from bs4 import BeautifulSoup as Soup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'padar_extra'))
+import SanityCheck
+import synthetic
+
+SCALES = OrderedDict([('small', dict(pids=1, days=0.25, sensors=1, sampling_rate=80)),
+                      ('medium', dict(pids=2, days=1, sensors=1, sampling_rate=80)),
+                      ('large', dict(pids=4, days=2, sensors=2, sampling_rate=80))])
+
+CONFIG = {'check_missing_file': True,
+          'check_annotation_file_exist': True,
+          'check_event': False,
+          'check_EMA': False,
+          'check_GPS': False,
+          'num_annotator': 1,
+          'check_annotation': True,
+          'annotation_lower_bound': '60 seconds',
+          'annotation_upper_bound': '20 minutes',
+          'check_episode_duration': {'sleep': ['>10h', '<2h'], 'walking': '>15m'},
+          'check_episode_time': {'ambulation': ['3am', '6am']}}
+
+STAGES = ['check_missing_file', 'check_sampling_rate', 'check_annotation', 'write_report']
+
+
+def build_config(root_path, pids, scale):
+    config = dict(CONFIG)
+    config['pid'] = pids
+    config['num_sensor'] = scale['sensors']
+    config['check_sampling_rate'] = {'claimed_rate': scale['sampling_rate'], 'accept_range': 0.1}
+    config = getattr(SanityCheck, '__fill_up_config')(config, root_path)
+    return getattr(SanityCheck, '__specify_config')(config)
+
+
+def load_report_template():
+    file_dir = os.path.dirname(os.path.realpath(SanityCheck.__file__))
+    with open(os.path.join(file_dir, 'ReportTemplate.html'), 'r') as f:
+        soup = Soup(f.read(), 'html.parser')
+    with open(os.path.join(file_dir, 'BokehScripts.txt'), 'r') as f:
+        soup.find('head').append(Soup(f.read().replace('x.y.z', '0.13.0'), 'html.parser'))
+    return soup
+
+
+def run_checks(root_path, config, workers, soup):
+    """
+    Run the checks and write the total report once, return the seconds of each stage
+    """
+    seconds = OrderedDict()
+    elements = []
+
+    start = time.perf_counter()
+    missing_file, _ = SanityCheck.check_missing_file(root_path, config, True, workers)
+    seconds['check_missing_file'] = time.perf_counter() - start
+    elements.append((missing_file, 'missing-file'))
+
+    start = time.perf_counter()
+    abnormal_rate, _ = SanityCheck.check_sampling_rate(root_path, config, True, workers)
+    seconds['check_sampling_rate'] = time.perf_counter() - start
+    elements.append((abnormal_rate, 'sampling-rate'))
+
+    start = time.perf_counter()
+    annotation_graphs, _ = SanityCheck.check_annotation(root_path, config, True, workers)
+    seconds['check_annotation'] = time.perf_counter() - start
+    elements += [(x, 'annotation') for x in annotation_graphs]
+
+    start = time.perf_counter()
+    getattr(SanityCheck, '__write_styled_report')(root_path, elements, soup)
+    seconds['write_report'] = time.perf_counter() - start
+    return seconds
+
+
+def dataset_size(root_path):
+    files = 0
+    size = 0
+    for path, _, file_names in os.walk(root_path):
+        for file_name in file_names:
+            files += 1
+            size += os.path.getsize(os.path.join(path, file_name))
+    return files, size
+
+
+def get_version():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.realpath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_scale(name, scale, repeat, workers, soup):
+    root_path = tempfile.mkdtemp(prefix='sanity_check_{}_'.format(name))
+    try:
+        start = time.perf_counter()
+        pids = synthetic.generate_dataset(root_path, **scale)
+        generate_seconds = time.perf_counter() - start
+        files, size = dataset_size(root_path)
+        config = build_config(root_path, pids, scale)
+
+        runs = []
+        for _ in range(repeat):
+            # the checks print every file they parse
+            with contextlib.redirect_stdout(io.StringIO()):
+                runs.append(run_checks(root_path, config, workers, soup))
+    finally:
+        shutil.rmtree(root_path, ignore_errors=True)
+
+    timings = OrderedDict()
+    for stage in STAGES:
+        seconds = [run[stage] for run in runs]
+        timings[stage] = OrderedDict([('min', min(seconds)), ('median', float(np.median(seconds))), ('runs', seconds)])
+    return OrderedDict([('parameters', scale),
+                        ('files', files),
+                        ('bytes', size),
+                        ('generate_seconds', generate_seconds),
+                        ('timings', timings)])
+
+
+@click.command()
+@click.option('--scales', default='small,medium', help='comma separated scales to run: ' + ', '.join(SCALES))
+@click.option('--repeat', default=3, help='number of runs of the checks at every scale')
+@click.option('--workers', default=1, help='number of worker processes passed to the checks')
+@click.option('--output', default='sanity_check_benchmark.json', help='the JSON file to write the results in')
+def main(scales, repeat, workers, output):
+    soup = load_report_template()
+    results = OrderedDict([('created', dt.datetime.now().isoformat()),
+                           ('version', get_version()),
+                           ('python', platform.python_version()),
+                           ('pandas', pd.__version__),
+                           ('numpy', np.__version__),
+                           ('workers', workers),
+                           ('repeat', repeat),
+                           ('scales', OrderedDict())])
+    for name in scales.split(','):
+        print('BENCHMARKING', name, SCALES[name])
+        results['scales'][name] = benchmark_scale(name, SCALES[name], repeat, workers, soup)
+        for stage, timing in results['scales'][name]['timings'].items():
+            print('  {:<20} {:8.3f} s'.format(stage, timing['min']))
+
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print('Results written in', output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare the time and memory of reading the hourly sensor files of a synthetic dataset with
+pandas.read_csv and pandas.to_datetime, and with SensorCache from their columnar files.
+
+Usage: python benchmarks/bench_sensor_cache.py [OPTIONS]
+"""
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import click
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'padar_extra'))
+import SensorCache
+import synthetic
+
+
+def read_csv(file_path):
+    data = pd.read_csv(file_path)
+    data[data.columns[0]] = pd.to_datetime(data.iloc[:, 0])
+    return data
+
+
+def time_reads(file_paths, function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frames = [function(x) for x in file_paths]
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, sum(x.memory_usage(deep=True).sum() for x in frames)
+
+
+@click.command()
+@click.option('--hours', default=4, help='number of hourly sensor files')
+@click.option('--sampling_rate', default=80, help='samples per second of the sensor files')
+@click.option('--repeat', default=3, help='number of reads of all the files')
+def main(hours, sampling_rate, repeat):
+    if SensorCache.feather is None:
+        raise click.ClickException('pyarrow is needed to write the columnar sensor files')
+    root_path = tempfile.mkdtemp(prefix='sensor_cache_')
+    try:
+        synthetic.generate_dataset(root_path, pids=1, days=hours / 24, sampling_rate=sampling_rate, missing_hour_ratio=0)
+        file_paths = sorted(glob.glob(os.path.join(root_path, '*', 'MasterSynced', '*', '*', '*', '*', '*.sensor.csv')))
+
+        csv_seconds, csv_bytes = time_reads(file_paths, read_csv, repeat)
+        start = time.perf_counter()
+        SensorCache.convert_sensor_files(root_path)
+        convert_seconds = time.perf_counter() - start
+        cache_seconds, cache_bytes = time_reads(file_paths, SensorCache.read_sensor_file, repeat)
+        csv_size = sum(os.path.getsize(x) for x in file_paths)
+        cache_size = sum(os.path.getsize(SensorCache.get_cache_path(x)) for x in file_paths)
+    finally:
+        shutil.rmtree(root_path, ignore_errors=True)
+
+    print('{} files, {:.1f} MB of csv, {:.1f} MB of columnar files'.format(len(file_paths), csv_size / 1e6, cache_size / 1e6))
+    print('conversion        {:8.3f} s'.format(convert_seconds))
+    print('read_csv          {:8.3f} s {:8.1f} MB in memory'.format(csv_seconds, csv_bytes / 1e6))
+    print('read_sensor_file  {:8.3f} s {:8.1f} MB in memory'.format(cache_seconds, cache_bytes / 1e6))
+    print('speedup           {:8.1f} x'.format(csv_seconds / cache_seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Compare the time of TimeRecordParser.parse with the baseline parser, which built a Series per record,
+on a synthetic time record log, writing total.annotation.csv or the hourly annotation files when
+split by hour. tests/test_time_record_parser.py checks that both write the same files.
+
+Usage: python benchmarks/bench_time_record_parser.py [OPTIONS]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import click
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'padar_extra'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'tests'))
+import TimeRecordParser
+import baseline_time_record_parser
+
+ACTIVITIES = ['walking outdoor', 'sitting, typing', 'running', 'standing', 'using computer', 'walk in door',
+              'eating lunch', 'sit, use computer', 'shopping']
+ANNOTATION_SET = 'SPADESInLab'
+ANNOTATOR_SET_ID = 'alvin-SPADESInLab'
+
+
+def generate_time_records(file_path, records, seed):
+    """
+    Write a time record log of the Time Keeper Memo app with records activities, mostly of a few
+    minutes to an hour, stopped by the next start or by an end record, with a night of sleep
+    every 50 activities so some activities last several hours
+    """
+    random = np.random.RandomState(seed)
+    time = pd.Timestamp('2018-06-20 08:00:00')
+    lines = []
+    for i in range(records):
+        label = 'sleeping' if i % 50 == 49 else ACTIVITIES[random.randint(len(ACTIVITIES))]
+        lines.append('[{}] start {}\n'.format(time.strftime('%Y/%m/%d %H:%M:%S'), label))
+        time += pd.Timedelta(seconds=int(8 * 3600 if label == 'sleeping' else random.randint(30, 3600)))
+        if random.rand() < 0.3:
+            lines.append('[{}] end\n'.format(time.strftime('%Y/%m/%d %H:%M:%S')))
+            time += pd.Timedelta(seconds=int(random.randint(0, 600)))
+    lines.append('[{}] end\n'.format(time.strftime('%Y/%m/%d %H:%M:%S')))
+    with open(file_path, 'w') as f:
+        f.writelines(lines)
+
+
+def list_files(root_path):
+    return sorted(os.path.relpath(os.path.join(path, x), root_path)
+                  for path, _, file_names in os.walk(root_path) for x in file_names)
+
+
+def run_parser(parse, file_path, split, hours):
+    """
+    Run a parser in a new output folder, with the hourly folders created first if hours is not None,
+    return the seconds and the folder
+    """
+    path_out = tempfile.mkdtemp(prefix='time_record_parser_') + '/'
+    for hour in hours if hours is not None else []:
+        os.makedirs(os.path.join(path_out, 'MasterSynced', hour.strftime('%Y/%m/%d/%H')))
+    start = time.perf_counter()
+    parse(file_path, path_out, split, False, ANNOTATION_SET, ANNOTATOR_SET_ID)
+    return time.perf_counter() - start, path_out
+
+
+def folder_size(root_path):
+    return sum(os.path.getsize(os.path.join(path, x)) for path, _, file_names in os.walk(root_path) for x in file_names)
+
+
+@click.command()
+@click.option('--records', default=5000, help='number of activities in the time record log')
+@click.option('--seed', default=0, help='seed of the random generator')
+@click.option('--workers', default=TimeRecordParser.WRITE_WORKERS, help='number of threads writing the hourly files')
+def main(records, seed, workers):
+    root_path = tempfile.mkdtemp(prefix='time_records_')
+    output_paths = []
+    try:
+        file_path = os.path.join(root_path, 'time_records.txt')
+        generate_time_records(file_path, records, seed)
+        # the baseline parser expects the hourly folders to exist when the records are split by hour
+        with open(file_path, 'r') as f:
+            times = pd.to_datetime([line[1:20] for line in f])
+        hours = pd.date_range(times.min().floor('H'), times.max().floor('H'), freq='H')
+        print('{} activities over {} hours'.format(records, len(hours)))
+
+        for split in [False, True]:
+            parsers = [('baseline parse', baseline_time_record_parser.parse, hours),
+                       ('TimeRecordParser.parse', lambda *args: TimeRecordParser.parse(*args, workers=workers), None)]
+            for name, parse, parser_hours in parsers:
+                seconds, path_out = run_parser(parse, file_path, split, parser_hours)
+                output_paths.append(path_out)
+                print('  {:<24} {:<14} {:8.3f} s {:8.1f} MB/s'.format(name, 'split by hour' if split else 'total', seconds,
+                                                                    folder_size(path_out) / seconds / 1e6))
+            print('  {} files'.format(len(list_files(path_out))))
+    finally:
+        for path in [root_path] + output_paths:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
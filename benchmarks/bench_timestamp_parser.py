@@ -0,0 +1,57 @@
+"""
+Compare TimestampParser with the pandas calls it replaces, on timestamps in mHealth format:
+pandas.to_datetime on a column with and without the format, and pandas.to_datetime per row.
+
+Usage: python benchmarks/bench_timestamp_parser.py [OPTIONS]
+"""
+import os
+import sys
+import time
+
+import click
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'padar_extra'))
+import TimestampParser
+
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+@click.command()
+@click.option('--rows', default=288000, help='number of timestamps of the column, the default is an hour at 80 Hz')
+@click.option('--scalar_rows', default=20000, help='number of timestamps parsed one by one')
+@click.option('--repeat', default=3, help='number of runs of every parser')
+def main(rows, scalar_rows, repeat):
+    timestamps = pd.Series(pd.date_range('2015-10-08 20:00:00', periods=rows, freq='12.5ms').floor('ms'))
+    values = timestamps.dt.strftime(TimestampParser.MHEALTH_TIMESTAMP_FORMAT).str[:-3]
+
+    print('column of {} timestamps'.format(rows))
+    columns = [('pandas.to_datetime', lambda: pd.to_datetime(values)),
+               ('pandas.to_datetime with format', lambda: pd.to_datetime(values, format=TimestampParser.MHEALTH_TIMESTAMP_FORMAT)),
+               ('TimestampParser.parse_timestamps', lambda: TimestampParser.parse_timestamps(values))]
+    for name, function in columns:
+        seconds, result = best_time(function, repeat)
+        assert result.equals(timestamps)
+        print('  {:<34} {:8.3f} s'.format(name, seconds))
+
+    # e.g. the start and stop times of annotations parsed in a loop, where the same strings come back
+    scalar_values = values[:scalar_rows // 2].tolist() * 2
+    print('{} timestamps parsed one by one'.format(len(scalar_values)))
+    scalars = [('pandas.to_datetime', lambda: [pd.to_datetime(x) for x in scalar_values]),
+               ('TimestampParser.parse_timestamp', lambda: [TimestampParser.parse_timestamp(x) for x in scalar_values])]
+    for name, function in scalars:
+        seconds, result = best_time(function, repeat)
+        assert result == timestamps[:scalar_rows // 2].tolist() * 2
+        print('  {:<34} {:8.3f} s'.format(name, seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Generate a synthetic dataset in mHealth structure, [pid]/MasterSynced/YYYY/MM/DD/HH and [pid]/Derived,
+to benchmark the tools on data of a known size.
+
+Usage: python benchmarks/synthetic.py [OPTIONS] ROOT_PATH
+"""
+import os
+
+import click
+import numpy as np
+import pandas as pd
+
+SENSOR_LOCATIONS = ['DominantAnkle', 'DominantThigh', 'DominantWaist', 'NonDominantWrist', 'DominantWrist']
+ACTIVITIES = ['walking', 'sitting', 'standing', 'ambulation', 'lying']
+ANNOTATOR = 'SPADESInLab.alvin-SPADESInLab'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+VALUE_POOL_SIZE = 4096
+
+
+def generate_dataset(root_path, pids=2, days=1, sensors=1, sampling_rate=80, gap_ratio=0.02,
+                     missing_hour_ratio=0.05, start_time='2015-10-08 20:00:00', seed=0):
+    """
+    Write a synthetic dataset in mHealth structure in root_path.
+
+    Args:
+        root_path: the folder to write the dataset in
+        pids: number of participants, named SPADES_1, SPADES_2...
+        days: number of days of data of every participant
+        sensors: number of sensors of every participant, one sensor file per sensor and hour
+        sampling_rate: samples per second of the sensor files
+        gap_ratio: ratio of the minutes with no sample in the sensor files
+        missing_hour_ratio: ratio of the hourly folders not written
+        start_time: the time of the first hour, the default starts in the evening so the data crosses midnight
+        seed: seed of the random generator, the same arguments always write the same dataset
+
+    Returns:
+        list of the pids written
+    """
+    random = np.random.RandomState(seed)
+    start_time = pd.Timestamp(start_time).floor('H')
+    hours = [start_time + pd.Timedelta(hours=i) for i in range(int(days * 24))]
+    # the minutes and seconds of the timestamps are the same in every hour
+    offsets = pd.to_timedelta(np.arange(3600 * sampling_rate) * (1e9 / sampling_rate), unit='ns')
+    minute_seconds = [x[14:23] for x in (pd.Timestamp(0) + offsets).strftime(TIMESTAMP_FORMAT)]
+    minute_of_rows = np.arange(len(offsets)) // (60 * sampling_rate)
+    # the sensor values are drawn from a pool of formatted values, formatting every value is slow
+    value_pool = [',{},{},{}\n'.format(x, y, z) for x, y, z in random.randn(VALUE_POOL_SIZE, 3).round(3).tolist()]
+
+    pid_list = []
+    for i in range(pids):
+        pid = 'SPADES_{}'.format(i + 1)
+        pid_list.append(pid)
+        sensor_ids = ['TAS{}'.format(j + 1) for j in range(sensors)]
+        __write_meta_data(root_path, pid, sensor_ids)
+
+        missing_hours = random.rand(len(hours)) < missing_hour_ratio
+        # keep the first and last hours so the time span of the pid is always the same
+        missing_hours[0] = missing_hours[-1] = False
+        episodes = __generate_episodes(random, hours[0], hours[-1] + pd.Timedelta(hours=1))
+
+        for hour, missing in zip(hours, missing_hours):
+            if missing:
+                continue
+            hour_path = os.path.join(root_path, pid, 'MasterSynced', *hour.strftime('%Y-%m-%d-%H').split('-'))
+            os.makedirs(hour_path, exist_ok=True)
+            file_time = hour.strftime('%Y-%m-%d-%H-%M-%S') + '-000'
+            for sensor_id in sensor_ids:
+                gaps = random.rand(60) < gap_ratio
+                rows = np.flatnonzero(~gaps[minute_of_rows])
+                file_name = 'ActigraphGT9X-AccelerationCalibrated-NA.{}.{}-M0400.sensor.csv'.format(sensor_id, file_time)
+                values = random.randint(VALUE_POOL_SIZE, size=len(rows))
+                __write_sensor_file(os.path.join(hour_path, file_name), hour, rows, values, minute_seconds, value_pool)
+            file_name = '{}.{}-P0000.annotation.csv'.format(ANNOTATOR, file_time)
+            __write_annotation_file(os.path.join(hour_path, file_name), hour, episodes)
+    return pid_list
+
+
+def __write_meta_data(root_path, pid, sensor_ids):
+    derived_path = os.path.join(root_path, pid, 'Derived')
+    os.makedirs(derived_path, exist_ok=True)
+    pd.DataFrame({'PID': pid,
+                  'SENSOR_ID': sensor_ids,
+                  'LOCATION': [SENSOR_LOCATIONS[i % len(SENSOR_LOCATIONS)] for i in range(len(sensor_ids))]},
+                 columns=['PID', 'SENSOR_ID', 'LOCATION']).to_csv(os.path.join(derived_path, 'location_mapping.csv'), index=False)
+    pd.DataFrame({'PID': [pid], 'GENDER': ['F'], 'AGE': [30]}).to_csv(os.path.join(derived_path, 'subject.csv'), index=False)
+    pd.DataFrame({'PID': [pid], 'SESSION': [1]}).to_csv(os.path.join(derived_path, 'sessions.csv'), index=False)
+
+
+def __write_sensor_file(file_path, hour, rows, values, minute_seconds, value_pool):
+    prefix = hour.strftime('%Y-%m-%d %H:')
+    lines = [prefix + minute_seconds[row] + value_pool[value] for row, value in zip(rows.tolist(), values.tolist())]
+    with open(file_path, 'w') as f:
+        f.write('HEADER_TIME_STAMP,X_ACCELATION_METERS_PER_SECOND_SQUARED,'
+                'Y_ACCELATION_METERS_PER_SECOND_SQUARED,Z_ACCELATION_METERS_PER_SECOND_SQUARED\n')
+        f.writelines(lines)
+
+
+def __generate_episodes(random, start_time, stop_time):
+    """
+    Generate consecutive episodes from start_time to stop_time, mostly of a few minutes, some
+    shorter than a minute, and a sleep episode every night from 23:00 to 7:00 crossing midnight.
+    """
+    episodes = []
+    time = start_time
+    while time < stop_time:
+        night = time.normalize() + pd.Timedelta(hours=23)
+        if night <= time < night + pd.Timedelta(minutes=1):
+            duration = night + pd.Timedelta(hours=8) - time
+            label = 'sleep'
+        else:
+            duration = pd.Timedelta(seconds=int(random.choice([30, 120, 300, 600, 1500])))
+            label = ACTIVITIES[random.randint(len(ACTIVITIES))]
+            # stop the episode before the night so the sleep episode starts at 23:00
+            if time < night < time + duration:
+                duration = night - time
+        # some episodes are followed by a gap without annotation
+        episodes.append((time, min(time + duration, stop_time), label))
+        time = time + duration + pd.Timedelta(seconds=int(random.choice([0, 0, 0, 30])))
+    return episodes
+
+
+def __write_annotation_file(file_path, hour, episodes):
+    # the episodes are cut at the hour boundaries like the hourly annotation files of mHealth
+    hour_end = hour + pd.Timedelta(hours=1)
+    rows = []
+    for start, stop, label in episodes:
+        if start < hour_end and stop > hour:
+            start = max(start, hour)
+            stop = min(stop, hour_end - pd.Timedelta(milliseconds=1))
+            start_string = start.strftime(TIMESTAMP_FORMAT)[:-3]
+            rows.append((start_string, start_string, stop.strftime(TIMESTAMP_FORMAT)[:-3], label))
+    pd.DataFrame(rows, columns=['HEADER_TIME_STAMP', 'START_TIME', 'STOP_TIME', 'LABEL_NAME']).to_csv(file_path, index=False)
+
+
+@click.command()
+@click.argument('root_path', type=click.Path())
+@click.option('--pids', default=2, help='number of participants')
+@click.option('--days', default=1.0, help='number of days of data of every participant')
+@click.option('--sensors', default=1, help='number of sensors of every participant')
+@click.option('--sampling_rate', default=80, help='samples per second of the sensor files')
+@click.option('--gap_ratio', default=0.02, help='ratio of the minutes with no sample')
+@click.option('--missing_hour_ratio', default=0.05, help='ratio of the hourly folders not written')
+@click.option('--seed', default=0, help='seed of the random generator')
+def main(root_path, pids, days, sensors, sampling_rate, gap_ratio, missing_hour_ratio, seed):
+    generate_dataset(root_path, pids=pids, days=days, sensors=sensors, sampling_rate=sampling_rate,
+                     gap_ratio=gap_ratio, missing_hour_ratio=missing_hour_ratio, seed=seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+
+try:
+    from . import AnnotationSplitter, TimestampParser
+except ImportError:
+    # run from the padar_extra folder instead of as a package
+    import AnnotationSplitter
+    import TimestampParser
+
+
+class AnnotationIndex(object):
+    """
+    Index of annotations for finding the annotations active at time points or during time windows
+    with binary searches on their start and stop times, instead of scanning all the annotations.
+    The queries take arrays of times and return one value per time or window.
+    If no annotation contains another, e.g. the output of AnnotationSplitter.annotation_splitter,
+    a query is two binary searches, else the annotations starting before the query are scanned.
+
+    Args:
+        annotations: pandas.DataFrame of annotations, or the path of an annotation file, in mHealth format
+        split: if the annotations are split with AnnotationSplitter.annotation_splitter first, so a
+            time is in one annotation at most, whose label joins the labels active at that time
+        time_columns: the positions of the start and stop time columns, default those of mHealth format
+    """
+
+    def __init__(self, annotations, split=False, time_columns=(1, 2)):
+        if isinstance(annotations, str):
+            annotations = pd.read_csv(annotations)
+        if split:
+            annotations = AnnotationSplitter.annotation_splitter(annotations)
+            time_columns = (1, 2)
+        self.annotations = annotations
+
+        start_times = self.__parse_times(annotations.iloc[:, time_columns[0]])
+        stop_times = self.__parse_times(annotations.iloc[:, time_columns[1]])
+        # the annotations with a missing time are never found
+        rows = np.flatnonzero((start_times != AnnotationSplitter.NAT) & (stop_times != AnnotationSplitter.NAT))
+        order = np.argsort(start_times[rows], kind='mergesort')
+        self.rows = rows[order]
+        self.start_times = start_times[self.rows]
+        self.stop_times = stop_times[self.rows]
+        # sorted by start time, the stop times are sorted too if no annotation contains another
+        self.nested = bool(np.any(np.diff(self.stop_times) < 0))
+
+
+    @staticmethod
+    def __parse_times(values):
+        if np.ndim(values) == 0:
+            values = [values]
+        return np.asarray(TimestampParser.parse_timestamps(values)).view(np.int64)
+
+
+    def find_at(self, times):
+        """
+        Return the positions in annotations of the first annotation, in the order of the rows,
+        active at every time, start <= time < stop, -1 if there is none
+
+        Args:
+            times: array, list or Series of timestamps or strings
+        """
+        times = self.__parse_times(times)
+        return self.__find(times, times, False)
+
+
+    def find_containing(self, start_times, stop_times):
+        """
+        Return the positions in annotations of the first annotation, in the order of the rows,
+        containing every window, start <= window start and window stop <= stop, -1 if there is none
+
+        Args:
+            start_times: array, list or Series of the start times of the windows
+            stop_times: array, list or Series of the stop times of the windows
+        """
+        return self.__find(self.__parse_times(start_times), self.__parse_times(stop_times), True)
+
+
+    def find_overlapping(self, start_time, stop_time):
+        """
+        Return the positions in annotations of the annotations overlapping or touching the window
+        from start_time to stop_time, in the order of the rows
+        """
+        start_time = self.__parse_times(start_time)[0]
+        stop_time = self.__parse_times(stop_time)[0]
+        end = np.searchsorted(self.start_times, stop_time, side='right')
+        if not self.nested:
+            rows = self.rows[np.searchsorted(self.stop_times, start_time, side='left'):end]
+        else:
+            rows = self.rows[:end][self.stop_times[:end] >= start_time]
+        return np.sort(rows)
+
+
+    def get_values(self, positions, column='LABEL_NAME', missing=None):
+        """
+        Return the values of a column of the annotations at positions as a numpy array, missing for
+        the positions -1
+        """
+        positions = np.asarray(positions)
+        values = self.annotations[column].values.astype(object)[np.maximum(positions, 0)] \
+            if self.annotations.shape[0] > 0 else np.empty(positions.shape[0], dtype=object)
+        values[positions < 0] = missing
+        return values
+
+
+    def labels_at(self, times, column='LABEL_NAME', missing=None):
+        """
+        Return the labels, or the values of another column, of the annotations active at every time,
+        see find_at
+        """
+        return self.get_values(self.find_at(times), column, missing)
+
+
+    def labels_during(self, start_times, stop_times, column='LABEL_NAME', missing=None):
+        """
+        Return the labels, or the values of another column, of the annotations containing every
+        window, see find_containing
+        """
+        return self.get_values(self.find_containing(start_times, stop_times), column, missing)
+
+
+    def __find(self, start_times, stop_times, contain_stop):
+        # the candidates start at or before the start of the query
+        ends = np.searchsorted(self.start_times, start_times, side='right')
+        positions = np.full(start_times.shape[0], -1, dtype=np.int64)
+        if not self.nested:
+            # the candidates stopping late enough are the ones after a position in the sorted stop times
+            begins = np.searchsorted(self.stop_times, stop_times, side='left' if contain_stop else 'right')
+            single = ends - begins == 1
+            positions[single] = self.rows[begins[single]]
+            # e.g. a window at the boundary of two annotations is contained in both
+            for i in np.flatnonzero(ends - begins > 1):
+                positions[i] = self.rows[begins[i]:ends[i]].min()
+            return positions
+
+        for i in np.flatnonzero(ends > 0):
+            stops = self.stop_times[:ends[i]]
+            found = stops >= stop_times[i] if contain_stop else stops > stop_times[i]
+            if np.any(found):
+                positions[i] = self.rows[:ends[i]][found].min()
+        return positions
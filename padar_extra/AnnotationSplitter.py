@@ -6,223 +6,425 @@ Created on Thu Jun 14 11:03:13 2018
 @author: zhangzhanming
 """
 
+import numpy as np
 import pandas as pd
 import sys
 import os.path
 import re
 import collections
+import functools
+import hashlib
+import glob
+import time
+from concurrent.futures import ProcessPoolExecutor
+try:
+    from . import ResultCache, TimestampParser
+except ImportError:
+    # run from the padar_extra folder instead of as a package
+    import ResultCache
+    import TimestampParser
+
+# int64 value of NaT
+NAT = np.iinfo(np.int64).min
+SPLITTED_COLUMNS = ['HEADER_TIME_STAMP', 'START_TIME', 'STOP_TIME', 'LABEL_NAME']
+CLASS_MAPPING_COLUMNS = ['label', 'posture', 'four_classes', 'activity_group', 'indoor_outdoor', 'activity',
+                         'hand_gesture']
+# the keyword tables of class_mapping, see load_class_mapping_rules
+CLASS_MAPPING_RULES_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'class_mapping_rules.txt')
+TALKING_WITH_PHONE_PATTERN = re.compile('talk.*phone|call')
+TALKING_PATTERN = re.compile('talk|tell.*story')
+USING_PHONE_PATTERN = re.compile('phone|text')
+# the cache of the mapped labels shared by all the runs, see class_mapping
+CLASS_MAPPING_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.padar_extra', 'class_mapping_cache.pkl')
+CLASS_MAPPING_CACHE_SECTION = 'class_mapping'
+# bump the version when the mapping code changes, the labels cached by older versions are mapped again
+CLASS_MAPPING_VERSION = 1
+ANNOTATION_SUFFIX = '.annotation.csv'
+SPLITTED_SUFFIX = '.splitted.annotation.csv'
+# the splitted files, splitted.annotation.csv or [name].splitted.annotation.csv, are not raw annotation files
+SPLITTED_FILE_NAME = 'splitted.annotation.csv'
+CLASS_MAPPING_SUFFIX = '.class_mapping.csv'
+# number of files sent to a worker process at once by split_files
+SPLIT_CHUNK_SIZE = 8
+
 
 def annotation_splitter(in_annotation):
     '''
     Combine overlapped labels and split them according to time
 
-    :param pandas.DataFrame in_annotation: the raw annotation to split
+    The start and stop times of all the annotations are swept once: the distinct times cut the
+    time line into segments, every annotation covers the segments between its start and stop
+    times, and the label of a segment is the sorted lower case labels covering it joined by '-'.
+    The segments covered by no annotation are dropped.
+
+    :param pandas.DataFrame in_annotation: the raw annotation to split, with the start time, stop
+        time and label name in the second, third and fourth columns
+    :raises ValueError: if a time or label is missing, or a stop time is before its start time
+    '''
+    return __to_splitted_frame(*__split_arrays(*__read_annotations(in_annotation)))
+
+
+def iter_annotation_splitter(chunks):
     '''
+    Split the annotations of chunks read in time order, e.g. the hourly annotation files of an
+    annotator, and yield the splitted annotations as soon as they can not change. The annotations
+    still active at the latest start time are carried to the next chunk, so the memory used only
+    depends on the size of the chunks, not on the total duration. The concatenated results are
+    the same as annotation_splitter of the concatenated chunks.
+
+    :param chunks: iterable of pandas.DataFrame in the format of annotation_splitter, the start
+        times of a chunk must not be before the start times of the previous chunks
+    :return: generator of pandas.DataFrame in the format of annotation_splitter, one per chunk
+        and one for the annotations still active after the last chunk, possibly empty
+    :raises ValueError: if a chunk starts before the previous chunks
+    '''
+    carried = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=object))
+    watermark = None
+    for chunk in chunks:
+        start_times, stop_times, labels = __read_annotations(chunk)
+        if start_times.shape[0] == 0:
+            continue
+        if watermark is not None and start_times.min() < watermark:
+            raise ValueError('Annotation chunk starting before the previous chunks')
+        start_times = np.concatenate([carried[0], start_times])
+        stop_times = np.concatenate([carried[1], stop_times])
+        labels = np.concatenate([carried[2], labels])
+
+        # the next chunks start at the watermark or later, so they can not change the segments before it
+        watermark = start_times.max()
+        segment_starts, segment_stops, new_labels = __split_arrays(start_times, stop_times, labels)
+        count = np.count_nonzero(segment_stops <= watermark)
+        yield __to_splitted_frame(segment_starts[:count], segment_stops[:count], new_labels[:count])
+
+        # the segments after the watermark are split again with the next chunk
+        active = stop_times > watermark
+        carried = (np.maximum(start_times[active], watermark), stop_times[active], labels[active])
+    yield __to_splitted_frame(*__split_arrays(*carried))
 
-    time_list = []
-    # iterate through the annotation data, put (start time/end time, label name
-    # start/end, index) to a list
-    for index, series in in_annotation.iterrows():
-        time_list.append((pd.to_datetime(series[1]),
-                          series[3],'start',index))
-        time_list.append((pd.to_datetime(series[2]),
-                          series[3],'end',index))
-    time_list.sort(key=lambda tup:tup[0])# sort the list according to time
-
-    # iterate through the time list, detect overlap. If exist, split and concatenate them
-    curr_activities = []
-    splitted_time_list = []
-    last_time = time_list[0][0]
-
-    for time_record in time_list:
-        curr_time = time_record[0]
-        if curr_time == last_time and time_record[2] == 'start':
-            curr_activities.append(time_record[1].lower().strip())
+
+def split_annotation_stream(file_paths, output_path):
+    '''
+    Split the annotation files of an annotator in time order, e.g. the hourly files in MasterSynced,
+    with iter_annotation_splitter, and append the splitted annotations to output_path as they are
+    ready, with the timestamps in mHealth format. The files of several annotators, see
+    group_annotation_files, are not split together, they raise ValueError.
+
+    :return: the number of splitted annotations written
+    '''
+    groups = group_annotation_files(file_paths)
+    if len(groups) > 1:
+        raise ValueError('Annotation files of {} annotators, split the files of every annotator '
+                         'separately: {}'.format(len(groups), ', '.join('/'.join(x) for x in groups)))
+    count = 0
+    with open(output_path, 'w') as f:
+        for splitted_annotation in iter_annotation_splitter(pd.read_csv(x) for x in file_paths):
+            for column in SPLITTED_COLUMNS[:3]:
+                splitted_annotation[column] = splitted_annotation[column].dt.strftime(
+                    TimestampParser.MHEALTH_TIMESTAMP_FORMAT).str[:-3]
+            splitted_annotation.to_csv(f, index=False, header=f.tell() == 0)
+            count += splitted_annotation.shape[0]
+    return count
+
+
+def group_annotation_files(file_paths):
+    '''
+    Group annotation files in mHealth format, [AnnotationSet].[ANNOTATORID-ANNOTATIONSETID].[time].annotation.csv,
+    by pid and annotator. The pid is the folder containing MasterSynced, or the folder of the file
+    if it is not in MasterSynced.
+
+    :return: OrderedDict of the (pid, [AnnotationSet].[ANNOTATORID-ANNOTATIONSETID]) and their files,
+        in the order of file_paths
+    '''
+    groups = collections.OrderedDict()
+    for file_path in file_paths:
+        folders = os.path.normpath(os.path.abspath(file_path)).split(os.sep)
+        if 'MasterSynced' in folders:
+            pid = folders[folders.index('MasterSynced') - 1]
         else:
-            if len(curr_activities) > 0 and last_time != curr_time:
-                curr_activities.sort()
-                new_label = '-'.join(curr_activities)
-                splitted_time_list.append(pd.Series([last_time, last_time, curr_time, new_label],
-                                                    index=['HEADER_TIME_STAMP','START_TIME','STOP_TIME','LABEL_NAME']))
-            if time_record[2] == 'start':
-                curr_activities.append(time_record[1].lower().strip())
-            else:
-                curr_activities.remove(time_record[1].lower().strip())
+            pid = folders[-2]
+        annotator = '.'.join(folders[-1].split('.')[:2])
+        groups.setdefault((pid, annotator), []).append(file_path)
+    return groups
 
-            last_time = curr_time
 
-    # sort by start time, export to dataframe
-    splitted_time_list.sort(key=lambda series: series['START_TIME'])
-    splitted_annotation = pd.DataFrame(splitted_time_list)
+def __read_annotations(in_annotation):
+    '''
+    Return the start and stop times as int64 nanoseconds and the lower case labels of annotations
+    '''
+    if in_annotation.shape[0] == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=object)
+
+    start_times = TimestampParser.parse_timestamps(in_annotation.iloc[:,1]).values.view(np.int64)
+    stop_times = TimestampParser.parse_timestamps(in_annotation.iloc[:,2]).values.view(np.int64)
+    if np.any(start_times == NAT) or np.any(stop_times == NAT):
+        raise ValueError('Annotation with missing start or stop time')
+    if np.any(stop_times < start_times):
+        raise ValueError('Annotation with a stop time before its start time')
 
-    return splitted_annotation
+    label_codes, labels = pd.factorize(in_annotation.iloc[:,3])
+    if np.any(label_codes < 0):
+        raise ValueError('Annotation with missing label name')
+    labels = np.array([x.lower().strip() for x in labels], dtype=object)
+    return start_times, stop_times, labels[label_codes]
 
 
-def class_mapping(in_annotation):
+def __split_arrays(start_times, stop_times, labels):
+    '''
+    Return the start and stop times as int64 nanoseconds and the labels of the splitted annotations
+    '''
+    # the codes of the labels are in the order of the label names, so sorting the codes of a
+    # segment sorts its labels
+    label_names, label_codes = np.unique(labels.astype(str), return_inverse=True)
+
+    # every annotation covers the segments from the one starting at its start time to the one
+    # before its stop time
+    times = np.unique(np.concatenate([start_times, stop_times]))
+    first_segments = np.searchsorted(times, start_times)
+    segment_counts = np.searchsorted(times, stop_times) - first_segments
+    offsets = np.repeat(np.cumsum(segment_counts) - segment_counts, segment_counts)
+    segments = np.repeat(first_segments, segment_counts) + np.arange(offsets.shape[0]) - offsets
+    codes = np.repeat(label_codes, segment_counts)
+    if segments.shape[0] == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), []
+
+    order = np.lexsort((codes, segments))
+    segments = segments[order]
+    names = label_names[codes[order]].tolist()
+    boundaries = np.flatnonzero(np.diff(segments)) + 1
+    splitted_segments = segments[np.concatenate(([0], boundaries))]
+    splits = [0] + boundaries.tolist() + [len(names)]
+    new_labels = ['-'.join(names[splits[i]:splits[i + 1]]) for i in range(len(splits) - 1)]
+    return times[splitted_segments], times[splitted_segments + 1], new_labels
+
+
+def __to_splitted_frame(segment_starts, segment_stops, new_labels):
+    segment_starts = segment_starts.view('datetime64[ns]')
+    return pd.DataFrame({'HEADER_TIME_STAMP': segment_starts,
+                         'START_TIME': segment_starts,
+                         'STOP_TIME': segment_stops.view('datetime64[ns]'),
+                         'LABEL_NAME': np.array(new_labels, dtype=object)}, columns=SPLITTED_COLUMNS)
+
+
+def class_mapping(in_annotation, rules_path=None, cache_path=None):
     '''
     Create a table with more features('label','posture','four_class',
                                       'activity_group','indoor_outdoor',
                                       'activity', 'hand_gesture')
     of the labels of input annotation data
 
+    If cache_path is given, the labels are looked up in the cache file first and the labels
+    mapped are added to it, so a label is only mapped once across the runs and the participants.
+    The cached labels are mapped again when the rules file or CLASS_MAPPING_VERSION changes.
+
     :param pandas.DataFrame in_annotation: input annotation data
+    :param str rules_path: the rules file, class_mapping_rules.txt next to this module if None
+    :param str cache_path: the cache file, e.g. CLASS_MAPPING_CACHE_PATH, no cache if None
 
     '''
+    return map_labels(in_annotation.iloc[:,3].unique(), rules_path, cache_path)
+
 
-    labels = in_annotation.iloc[:,3].unique()
+def map_labels(labels, rules_path=None, cache_path=None):
+    '''
+    Return the class mapping table of a list of distinct labels, in the same order, see class_mapping
+    '''
+    rules = load_class_mapping_rules(rules_path)
+    cache = ResultCache.ResultCache(cache_path) if cache_path is not None else None
+    fingerprint = (CLASS_MAPPING_VERSION, get_class_mapping_rules_hash(rules_path))
     mapped_list = []
     for label in labels:
-        activity = __get_activity(label)
-        posture = __get_posture(label, activity)
-        four_class = __get_four_class(label, activity)
-        ambience = __get_indoor_outdoor(label, activity)
-        hand_gesture = __get_hand_gesture(label, activity)
-        activity_group = __get_activity_group(label, four_class)
-        mapped_list.append(pd.Series([label, posture, four_class, activity_group,
-                                      ambience, activity,hand_gesture],
-                                     index=['label','posture','four_classes',
-                                            'activity_group','indoor_outdoor',
-                                            'activity', 'hand_gesture']))
-    return pd.DataFrame(mapped_list)
-
-
-def __get_posture(label, activity):
-    if label == 'transition':
-        return label
+        mapped = cache.get(CLASS_MAPPING_CACHE_SECTION, label, fingerprint) if cache is not None else None
+        if mapped is None:
+            mapped = __map_label(label, rules)
+            if cache is not None:
+                cache.put(CLASS_MAPPING_CACHE_SECTION, label, fingerprint, mapped)
+        mapped_list.append(mapped)
+    if cache is not None:
+        # the labels of the other annotation files are kept
+        cache.save(prune=False)
+    return pd.DataFrame(mapped_list, columns=CLASS_MAPPING_COLUMNS)
+
+
+def find_annotation_files(path):
+    '''
+    Return the raw annotation files, *.annotation.csv, in a folder and its sub folders, e.g. the
+    root of a dataset with the files of every pid and annotator, or matching a glob pattern.
+    The splitted annotation files, e.g. written by split_files, are skipped.
+    '''
+    if os.path.isdir(path):
+        file_paths = [os.path.join(folder, x) for folder, _, file_names in os.walk(path)
+                      for x in file_names if x.endswith(ANNOTATION_SUFFIX)]
+    else:
+        file_paths = glob.glob(path, recursive=True)
+    return sorted([x for x in file_paths if not os.path.basename(x).endswith(SPLITTED_FILE_NAME)])
 
-    sit_keywords = ['sit','bik','reclin','eat']
-    if any(re.findall(word, label) for word in sit_keywords):
-        return 'sitting'
 
-    upright_keywords = ['stand', 'run', 'jump', 'walk', 'frisbee', 'escalator'
-                        ,'elevator', 'climb.*stair','stair', 'treadmill',
-                        'vend.*machine', 'shelf reloading or unloading','sweep','shop','cook']
-    if any((re.findall(word, label) or re.findall(word, activity)) for word in upright_keywords):
-        return 'upright'
+def split_files(file_paths, output_path, workers=1, class_map=True, cache_path=CLASS_MAPPING_CACHE_PATH):
+    '''
+    Split every annotation file and write the result in output_path, in the same sub folders as
+    the file relative to the common folder of all the files, [name].splitted.annotation.csv for
+    [name].annotation.csv, so the dataset itself is not modified. The files are split in a pool of
+    worker processes if workers is greater than 1. If class_map is True, the labels of all the
+    files are mapped once and the class mapping of every file is written in [name].class_mapping.csv.
+
+    :param list file_paths: the annotation files, e.g. from find_annotation_files
+    :param str output_path: the folder of the splitted and class mapping files
+    :param int workers: the number of worker processes
+    :param bool class_map: if the class mapping files are written
+    :param str cache_path: the cache of the mapped labels, see class_mapping, no cache if None
+    :return: the list of the files which could not be split
+    '''
+    if len(file_paths) == 0:
+        return []
+    root_path = os.path.commonpath([os.path.dirname(os.path.abspath(x)) for x in file_paths])
+    output_prefixes = [os.path.join(output_path, os.path.relpath(os.path.abspath(x), root_path))[:-len(ANNOTATION_SUFFIX)]
+                       for x in file_paths]
+    if workers is None or workers <= 1 or len(file_paths) <= 1:
+        results = [__split_file(x, y) for x, y in zip(file_paths, output_prefixes)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(file_paths))) as executor:
+            results = list(executor.map(__split_file, file_paths, output_prefixes, chunksize=SPLIT_CHUNK_SIZE))
+
+    failed = [file_path for file_path, labels in zip(file_paths, results) if labels is None]
+    if class_map:
+        # the distinct labels of all the files, in the order they are found
+        labels = list(collections.OrderedDict.fromkeys(x for file_labels in results if file_labels is not None
+                                                       for x in file_labels))
+        class_maps = map_labels(labels, cache_path=cache_path).set_index('label', drop=False)
+        for output_prefix, file_labels in zip(output_prefixes, results):
+            if file_labels is not None:
+                class_maps.loc[file_labels].to_csv(output_prefix + CLASS_MAPPING_SUFFIX, index=False)
+    return failed
+
+
+def __split_file(file_path, output_prefix):
+    '''
+    Split an annotation file and write the splitted file, [output_prefix].splitted.annotation.csv,
+    return its distinct labels or None if it can not be split
+    '''
+    print('SPLITTING ' + file_path)
+    try:
+        splitted_annotation = annotation_splitter(pd.read_csv(file_path))
+    except Exception as e:
+        print('WARNING: Can not split', file_path, e)
+        return None
+    os.makedirs(os.path.dirname(os.path.abspath(output_prefix)), exist_ok=True)
+    splitted_annotation.to_csv(output_prefix + SPLITTED_SUFFIX, index=False)
+    return splitted_annotation['LABEL_NAME'].unique().tolist()
+
+
+def __map_label(label, rules):
+    activity = __get_activity(label, rules)
+    posture = __get_posture(label, activity, rules)
+    four_class = __get_four_class(label, activity, rules)
+    ambience = __get_indoor_outdoor(label, activity, rules)
+    hand_gesture = __get_hand_gesture(label, activity, rules)
+    activity_group = __get_activity_group(label, four_class, rules)
+    return [label, posture, four_class, activity_group,
+            ambience, activity, hand_gesture]
+
+
+def load_class_mapping_rules(rules_path=None):
+    '''
+    Load the rules of class_mapping from a YAML file. The expressions of every class are compiled
+    once into a single alternation, and the rules of a file are only loaded again when it changes.
+
+    :param str rules_path: the rules file, class_mapping_rules.txt next to this module if None
+    :return: dict of the tables of the file, a table is a list of (class, compiled expression) in
+        the order of the file, or a dict of tables
+    '''
+    rules_path = os.path.realpath(rules_path if rules_path is not None else CLASS_MAPPING_RULES_PATH)
+    return __load_rules(rules_path, os.stat(rules_path).st_mtime_ns)[1]
 
-    lying_keywords = ['lying','sleep','nap']
-    if any((re.findall(word, label) or re.findall(word, activity)) for word in lying_keywords):
-        return 'lying'
 
-    print('unknown posture', activity, label)
-    return 'unknown'
+def get_class_mapping_rules_hash(rules_path=None):
+    '''
+    Return the SHA-1 of the content of the rules file, class_mapping_rules.txt next to this module if None
+    '''
+    rules_path = os.path.realpath(rules_path if rules_path is not None else CLASS_MAPPING_RULES_PATH)
+    return __load_rules(rules_path, os.stat(rules_path).st_mtime_ns)[0]
 
 
-def __get_four_class(label, activity):
-    if 'transition' in label:
-        return 'transition'
+@functools.lru_cache(maxsize=None)
+def __load_rules(rules_path, mtime_ns):
+    import yaml
+    with open(rules_path, 'rb') as f:
+        content = f.read()
+    return hashlib.sha1(content).hexdigest(), __compile_table(yaml.safe_load(content.decode('utf-8')))
 
-    amb_keywords = ['walk','run','stair']
-    if any((re.findall(word, label) or re.findall(word, activity)) for word in amb_keywords):
-        return 'ambulation'
 
-    cyc_keywords = ['cycl','bik']
-    if any((re.findall(word, label) or re.findall(word, activity)) for word in cyc_keywords):
-        return 'cycling'
+def __compile_table(table):
+    if all(isinstance(x, list) for x in table.values()):
+        # a class matches if any of its expressions is found
+        return [(name, re.compile('|'.join('(?:{})'.format(x) for x in expressions)))
+                for name, expressions in table.items()]
+    return dict([(name, __compile_table(x)) for name, x in table.items()])
 
-    seden_keywords = ['sit','stand','lying','typ', 'sleep', 'computer', 'still',
-                      'elevator','text','wait','eat','watch','gam']
-    if any((re.findall(word, label) or re.findall(word, activity)) for word in seden_keywords):
-        return 'sedentary'
 
-    other_keywords = ['frisbee', 'sweep', 'paint', 'clean.*room', 'soccer',
-                      'basketball', 'tennis', 'jump','packing','shop','cook']
-    if any((re.findall(word, label) or re.findall(word, activity)) for word in other_keywords):
-        return 'others'
+def __first_match(table, *texts):
+    for name, pattern in table:
+        if any(pattern.search(text) for text in texts):
+            return name
+    return None
 
-    print('unknown four class:', label)
+
+def __all_matches(table, text):
+    return [name for name, pattern in table if pattern.search(text)]
+
+
+def __get_posture(label, activity, rules):
+    if label == 'transition':
+        return label
+
+    posture = __first_match(rules['posture']['label'], label)
+    if posture is None:
+        posture = __first_match(rules['posture']['label_or_activity'], label, activity)
+    if posture is not None:
+        return posture
+
+    print('unknown posture', activity, label)
     return 'unknown'
 
 
-def __get_indoor_outdoor(label, activity):
-    indoor_keywords = ['in\s*door', 'elevator', 'mbta', 'computer', r'brush\s*teeth'
-                       ,'sleep','escalator','shop','cook','stairs','bed', 'typ'
-                       ,'treadmill', 'arm.*on desk', 'stationary biking', 'lying','sweep','game',
-                       'eat','shop','pack','gam']
-    if any((re.findall(word, label) or re.findall(word, activity)) for word in indoor_keywords):
-        return 'indoor'
+def __get_four_class(label, activity, rules):
+    if 'transition' in label:
+        return 'transition'
+
+    four_class = __first_match(rules['four_classes'], label, activity)
+    if four_class is not None:
+        return four_class
+
+    print('unknown four class:', label)
+    return 'unknown'
 
-    outdoor_keywords = ['out\s*door', 'signal\s*light', 'city','stop.*light']
-    if any((re.findall(word, label) or re.findall(word, activity)) for word in outdoor_keywords):
-        return 'outdoor'
 
+def __get_indoor_outdoor(label, activity, rules):
+    ambience = __first_match(rules['indoor_outdoor'], label, activity)
+    if ambience is not None:
+        return ambience
 
     print('unknow indoor outdoor: ', label, activity)
     return 'unknown'
 
 
-def __get_activity_group(label, four_class):
-    if re.findall('sleep|lying', label):
-        return 'sleep'
-
-    unwear_keywords = [r'take\s*off','not.*wear','unworn','unwear','non.*wear']
-    if any(re.findall(word, label) for word in unwear_keywords):
-        print('unknown four class', label)
-        return 'nonwear'
+def __get_activity_group(label, four_class, rules):
+    activity_group = __first_match(rules['activity_group'], label)
+    if activity_group is not None:
+        return activity_group
 
     return four_class
 
 
-def __get_activity(label):
+def __get_activity(label, rules):
     actions = []
     # detect if the special verbs inside the label first
     # for walk and run, detect if the speed or climbing stairs exist
-    first_activity = ''
-    special_words = {'treadmill running at 5.5 mph 5% grade': ['5.5\s*mph.*5%\s*grade',
-                                           '5%\s*grade.*5.5\s*mph'],
-                   'treadmill walking at 1 mph':['1\s*mph'],
-                   'treadmill walking at 2 mph':['2\s*mph'],
-                   'treadmill walking at 3-3.5 mph':['3-3.5\s*mph','3\s*mph','3.5\s*mph'],
-                   'treadmill running at 5.5 mph':['5.5\s*mph'],
-                   'walking up stairs':['up.*stairs'],
-                   'walking down stairs':['down.*stairs']}
-
-    for key, keyword_list in special_words.items():
-        if any(re.findall(keyword, label) for keyword in keyword_list):
-            first_activity = key
-            continue
-
-    if len(first_activity) == 0:
-        if 'walk' in label:
-            first_activity = 'self-paced walking'
-        elif 'run' in label or 'jog' in label:
-            first_activity = 'running'
-
-    if len(first_activity) > 0:
-        actions.insert(0, first_activity)
+    first_activity = __first_match(rules['activity']['first_action'], label)
+    if first_activity is not None:
+        actions.append(first_activity)
 
     # detect if there are other actions at the same time
-    activities_verbs = collections.OrderedDict({'sitting':['sit'],
-                  'standing':['stand','signal.*light'],
-                  'biking outdoor' : [r'bik.*out\s*door',r'out\s*door.*bik', '300.*kpm.*bik'],
-                  'stationary biking':['bik.*stationary',r'bik.*in\s*door|in\s*door.*bik'],
-                  'frisbee':['frisbee'],
-                  'jumping jacks':['jumping jacks'],
-                  'lying on the back':['lying.*back','ly.*bed'],
-                  'elevator up':['elevator.*up', 'up.*elevator'],
-                  'elevator down':['elevator.*down', 'down.*elevator'],
-                  'escalator up':['escalator.*up','up.*escalator'],
-                  'escalator down':['escalator.*down','down.*escalator'],
-                  'transition':['transition'],
-                  'reclining':['reclin.*'],
-                  'writing':['writ'],
-                  'sweeping':['sweep'],
-                  'keyboard typing':['typ'],
-                  'folding towel':['fold.*towel'],
-                  'shelf loading or unloading':['shelf.*load','unload'],
-                  'using vending machine': ['vend.*machine'],
-                  'texting':['text'], 'web browsing':['web browsing'], 
-                  'gaming':['gam'],
-                  'using computer':['us.*computer','watch.*netflix'],
-                  'sleeping':['sleep','nap'],
-                  'eating':['eat'],
-                  'packing':['pack'],
-                  'shopping':['shop'],
-                  'cooking':['cook','mak.*food']})
-
-    for key, keyword_list in activities_verbs.items():
-        if any(re.findall(keyword, label) for keyword in keyword_list):
-            actions.append(key)
+    actions += __all_matches(rules['activity']['actions'], label)
 
     # deal with some overlap activities
 
@@ -240,29 +442,17 @@ def __get_activity(label):
 
 
     # special match for talking
-    if any(re.findall(keyword, label) for keyword in ['talk.*phone','call']):
+    if TALKING_WITH_PHONE_PATTERN.search(label):
         actions.append('talking with phone')
     else:
-        if any(re.findall(keyword, label) for keyword in ['talk','tell.*story']):
+        if TALKING_PATTERN.search(label):
             actions.append('talking')
         if 'phone' in label:
             actions.append('using phone')
 
     activity = ' and '.join(actions)
 
-    activity_adverbs = {'with bag':['bag'],
-                        'naturally':['natur'],
-                        'carrying a drink':['carry.*drink'],
-                        'with arms on desk':['arms.*on.*desk'],
-                        'on train':['on train'],
-                        'for stop light':['for.*stop.*light']
-                        }
-
-    adverbs = []
-
-    for key, keyword_list in activity_adverbs.items():
-        if any(re.findall(keyword, label) for keyword in keyword_list):
-            adverbs.append(key)
+    adverbs = __all_matches(rules['activity']['adverbs'], label)
 
     if len(adverbs) != 0:
         activity = activity + ' '+' '.join(adverbs)
@@ -280,38 +470,18 @@ def __get_activity(label):
     return activity
 
 
-def __get_hand_gesture(label, activity):
-    handgestures_label = {'writing':['writ'],
-                'arms on desk':['on.*desk','computer','gam'],
-                'holding cellphone':['phone'],
-                'transition':['transition'],
-                'biking': ['bik'],
-                'carrying a drink': ['drink'],
-                'carrying a suitcase': ['carry.*suitcase'],
-                'frisbee':['frisbee'],
-                'jumping jacks':['jumping.*jacks'],
-                'keyboard typing':['typ'],
-                'sweeping':['sweep'],
-                'shelf loading or unloading':['shelf.*load','unload'],
-                'using vending machine':['vend.*machine'],
-                'still':['still','lying','sleep'],
-                'folding towels':['fold.*towel'],
-                'laundry':['laundry'],
-                'eating':['eat'],
-                'packing':['pack'],
-                'holding a bag':['hold.*bag','with.*bag'],
-                'shopping':['shop']}
-    for key, keyword_list in handgestures_label.items():
-        if any((re.findall(word, label) or re.findall(word, activity)) for word in keyword_list):
-                return key
+def __get_hand_gesture(label, activity, rules):
+    hand_gesture = __first_match(rules['hand_gesture'], label, activity)
+    if hand_gesture is not None:
+        return hand_gesture
 
     # special match for talking
-    if any(re.findall(keyword, label) for keyword in ['talk.*phone','call']):
+    if TALKING_WITH_PHONE_PATTERN.search(label):
         return 'phone talking'
     else:
-        if any(re.findall(keyword, label) for keyword in ['talk','tell.*story']):
+        if TALKING_PATTERN.search(label):
             return 'talking'
-        if any(re.findall(keyword, label) for keyword in ['phone','text']):
+        if USING_PHONE_PATTERN.search(label):
             return 'using phone'
 
     if activity == 'unknown':
@@ -323,31 +493,60 @@ def __get_hand_gesture(label, activity):
 
 
 if __name__ == '__main__':
-    if len(sys.argv) < 4:
+    if len(sys.argv) >= 4 and sys.argv[1] == 'SPLIT_STREAM':
+        for (pid, annotator), file_paths in group_annotation_files(find_annotation_files(sys.argv[2])).items():
+            output_path = os.path.join(sys.argv[3], pid, annotator + SPLITTED_SUFFIX)
+            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+            count = split_annotation_stream(file_paths, output_path)
+            print('Wrote {} splitted annotations in {}'.format(count, output_path))
+    elif len(sys.argv) >= 4 and sys.argv[1] in ('SPLIT_BATCH', 'SPLIT_CLASSMAP_BATCH'):
+        workers = int(sys.argv[4]) if len(sys.argv) > 4 else os.cpu_count()
+        cache_path = sys.argv[5] if len(sys.argv) > 5 else CLASS_MAPPING_CACHE_PATH
+        if cache_path == 'NONE':
+            cache_path = None
+        start = time.perf_counter()
+        file_paths = find_annotation_files(sys.argv[2])
+        failed = split_files(file_paths, sys.argv[3], workers, sys.argv[1] == 'SPLIT_CLASSMAP_BATCH', cache_path)
+        seconds = time.perf_counter() - start
+        print('Split {} files in {:.1f} s, {:.1f} files/s, {} failed'.format(
+            len(file_paths), seconds, len(file_paths) / seconds if seconds > 0 else 0, len(failed)))
+        for file_path in failed:
+            print('FAILED ' + file_path)
+    elif len(sys.argv) < 4:
         print('INSTRUCTION: \n'+
               'For splitting: \n SPLIT [Original File Path] [Formatted Annotation File Path] \n' +
               'For splitting and generating a class mapping file: \n' +
               'SPLIT_CLASSMAP [Original File Path] [Formatted Annotation File Path]\n' +
               'For generating a class mapping file: \n' +
-              'CLASSMAP [Original File Path] [Formatted Annotation File Path]')
+              'CLASSMAP [Original File Path] [Formatted Annotation File Path]\n' +
+              'For splitting all the annotation files in a folder or matching a glob pattern, with or without\n' +
+              'generating their class mapping files, in the same sub folders of an output folder: \n' +
+              'SPLIT_BATCH/SPLIT_CLASSMAP_BATCH [Root Path or Glob Pattern] [Output Folder Path] [Number of Workers]\n' +
+              'For splitting the hourly annotation files of every annotator in time order as one stream: \n' +
+              'SPLIT_STREAM [Root Path or Glob Pattern] [Output Folder Path]\n' +
+              'The mapped labels are cached in ' + CLASS_MAPPING_CACHE_PATH + ', another cache file\n' +
+              'can be given after the paths, or NONE to map all the labels again')
     else:
         command = sys.argv[1]
         path_in = sys.argv[2]
         path_out = sys.argv[3]
+        cache_path = sys.argv[4] if len(sys.argv) > 4 else CLASS_MAPPING_CACHE_PATH
+        if cache_path == 'NONE':
+            cache_path = None
 
 
         in_annotation = pd.read_csv(path_in)
 
         if 'SPLIT' in command:
             splitted_annotation = annotation_splitter(in_annotation)
-            splitted_annotation.to_csv(os.path.join(path_out, 'splitted.annotation.csv'), index=False)
+            splitted_annotation.to_csv(os.path.join(path_out, SPLITTED_FILE_NAME), index=False)
 
             if command == 'SPLIT_CLASSMAP':
-                class_map = class_mapping(splitted_annotation)
+                class_map = class_mapping(splitted_annotation, cache_path=cache_path)
                 class_map.to_csv(os.path.join(path_out,'class_mapping.csv'), index=False)
 
         elif command == 'CLASSMAP':
-            class_map = class_mapping(in_annotation)
+            class_map = class_mapping(in_annotation, cache_path=cache_path)
             class_map.to_csv(os.path.join(path_out,'class_mapping.csv'), index=False)
 
 
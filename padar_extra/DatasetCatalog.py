@@ -0,0 +1,185 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+try:
+    from . import DatasetIndex, SensorCache, TimestampParser
+except ImportError:
+    # run from the padar_extra folder instead of as a package
+    import DatasetIndex
+    import SensorCache
+    import TimestampParser
+
+CATALOG_FILE_NAME = 'dataset_catalog.sqlite'
+# bump the version when the schema changes, older catalogs are rebuilt
+CATALOG_VERSION = 1
+# the folders with the hourly structure YYYY/MM/DD/HH indexed in every pid
+CATALOG_FOLDERS = ['MasterSynced', os.path.join('Derived', 'Preprocessed')]
+CATALOG_FILE_TYPES = ['sensor', 'annotation', 'feature']
+CATALOG_COLUMNS = ['PID', 'FOLDER', 'HOUR', 'FILE_PATH', 'FILE_TYPE', 'SENSOR_ID', 'START_TIME', 'STOP_TIME',
+                   'ROW_COUNT', 'SIZE', 'MTIME_NS']
+
+
+class DatasetCatalog(object):
+    """
+    Catalog of the sensor, annotation and feature files of a dataset in mHealth structure, stored in
+    a SQLite database, by default dataset_catalog.sqlite in the root path. Every file is recorded with
+    its pid, type, sensor id, the timestamps of its first and last samples, its row count, size and
+    modification time, so the files covering a time range are found without listing the folders or
+    opening the files.
+
+    Args:
+        root_path: the root folder of the dataset
+        catalog_path: the path of the database, created if it does not exist
+    """
+
+    def __init__(self, root_path, catalog_path=None):
+        self.root_path = os.path.realpath(root_path)
+        self.catalog_path = catalog_path if catalog_path is not None else os.path.join(self.root_path, CATALOG_FILE_NAME)
+        self.connection = sqlite3.connect(self.catalog_path)
+        self.__create_tables()
+
+
+    def __create_tables(self):
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            version = self.connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if version is None or int(version[0]) != CATALOG_VERSION:
+                self.connection.execute('DROP TABLE IF EXISTS files')
+                self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(CATALOG_VERSION),))
+            # the timestamps are stored as int64 nanoseconds since epoch
+            self.connection.execute('CREATE TABLE IF NOT EXISTS files (pid TEXT, folder TEXT, hour TEXT, '
+                                    'file_path TEXT PRIMARY KEY, file_type TEXT, sensor_id TEXT, '
+                                    'start_time INTEGER, stop_time INTEGER, row_count INTEGER, '
+                                    'size INTEGER, mtime_ns INTEGER)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS files_time ON files (pid, file_type, start_time, stop_time)')
+
+
+    def close(self):
+        self.connection.close()
+
+
+    def refresh(self, pids=None):
+        """
+        Update the catalog with the files of the given pids, all the folders of the root path if None.
+        Only the new files and the files whose size or modification time changed are opened, the
+        removed files are removed from the catalog.
+
+        Returns:
+            the number of files opened
+        """
+        if pids is None:
+            pids = [x for x in sorted(os.listdir(self.root_path)) if os.path.isdir(os.path.join(self.root_path, x))]
+
+        count = 0
+        for pid in pids:
+            known = dict([(row[0], (row[1], row[2])) for row in
+                          self.connection.execute('SELECT file_path, size, mtime_ns FROM files WHERE pid = ?', (pid,))])
+            rows = []
+            found = set()
+            for folder in CATALOG_FOLDERS:
+                dataset_index = DatasetIndex.DatasetIndex(self.root_path, pid, folder)
+                for file_type in CATALOG_FILE_TYPES:
+                    for hour, file_path in dataset_index.get_file_paths(file_type):
+                        found.add(file_path)
+                        stat = os.stat(file_path)
+                        if known.get(file_path) == (stat.st_size, stat.st_mtime_ns):
+                            continue
+                        print('CATALOGING ' + file_path)
+                        rows.append((pid, folder, hour, file_path, file_type, get_sensor_id(file_path, file_type)) +
+                                    scan_file(file_path, file_type) + (stat.st_size, stat.st_mtime_ns))
+            removed = [(x,) for x in known if x not in found]
+            with self.connection:
+                self.connection.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                self.connection.executemany('DELETE FROM files WHERE file_path = ?', removed)
+            count += len(rows)
+        return count
+
+
+    def find_files(self, pid, start_time=None, stop_time=None, file_type=None, sensor_id=None):
+        """
+        Return the files of a pid with samples between start_time and stop_time, in time order.
+
+        Args:
+            pid: the pid of the files
+            start_time: the start of the time range, as a string or timestamp, unbounded if None
+            stop_time: the end of the time range, as a string or timestamp, unbounded if None
+            file_type: 'sensor', 'annotation' or 'feature', all the types if None
+            sensor_id: only the files of the given sensor, all the sensors if None
+
+        Returns:
+            DataFrame with the columns of CATALOG_COLUMNS, START_TIME and STOP_TIME as timestamps
+        """
+        conditions = ['pid = ?']
+        arguments = [pid]
+        if start_time is not None:
+            conditions.append('stop_time >= ?')
+            arguments.append(TimestampParser.parse_timestamp(start_time).value)
+        if stop_time is not None:
+            conditions.append('start_time <= ?')
+            arguments.append(TimestampParser.parse_timestamp(stop_time).value)
+        if file_type is not None:
+            conditions.append('file_type = ?')
+            arguments.append(file_type)
+        if sensor_id is not None:
+            conditions.append('sensor_id = ?')
+            arguments.append(sensor_id)
+        rows = self.connection.execute('SELECT * FROM files WHERE ' + ' AND '.join(conditions) +
+                                       ' ORDER BY start_time, file_path', arguments).fetchall()
+        files = pd.DataFrame(rows, columns=CATALOG_COLUMNS)
+        files['START_TIME'] = pd.to_datetime(files['START_TIME'], unit='ns')
+        files['STOP_TIME'] = pd.to_datetime(files['STOP_TIME'], unit='ns')
+        return files
+
+
+    def read_sensor_data(self, pid, start_time, stop_time, sensor_id=None):
+        """
+        Return the samples of the sensor files of a pid between start_time and stop_time, read with
+        SensorCache, in time order. The files of all the sensors are read if sensor_id is None.
+        """
+        start_time = TimestampParser.parse_timestamp(start_time)
+        stop_time = TimestampParser.parse_timestamp(stop_time)
+        files = self.find_files(pid, start_time, stop_time, 'sensor', sensor_id)
+        data = [SensorCache.read_sensor_file(x) for x in files['FILE_PATH']]
+        if len(data) == 0:
+            return pd.DataFrame()
+        data = pd.concat(data, ignore_index=True)
+        data = data[(data.iloc[:, 0] >= start_time) & (data.iloc[:, 0] <= stop_time)]
+        return data.reset_index(drop=True)
+
+
+def get_sensor_id(file_path, file_type):
+    """
+    Return the sensor id in the name of a sensor or feature file in mHealth format, e.g. TAS1E23150066
+    in ActigraphGT9X-AccelerationCalibrated-NA.TAS1E23150066-AccelerationCalibrated.2015-10-08-14-00-00-000-M0400.sensor.csv,
+    None for the other files
+    """
+    tokens = os.path.basename(file_path).split('.')
+    if file_type not in ('sensor', 'feature') or len(tokens) < 3:
+        return None
+    return tokens[1].split('-')[0]
+
+
+def scan_file(file_path, file_type):
+    """
+    Return the (start time, stop time, row count) of a file, the times as int64 nanoseconds since
+    epoch or None if the file has no row. The sensor files are only scanned, the times of the other
+    files are the first START_TIME and the last STOP_TIME, or the first column if they do not exist.
+    """
+    if file_type == 'sensor':
+        row_count, start_time, stop_time = DatasetIndex.scan_sensor_file(file_path)
+    else:
+        data = pd.read_csv(file_path)
+        row_count = data.shape[0]
+        if 'START_TIME' in data.columns and 'STOP_TIME' in data.columns:
+            start_time = TimestampParser.parse_timestamps(data['START_TIME']).min()
+            stop_time = TimestampParser.parse_timestamps(data['STOP_TIME']).max()
+        elif row_count > 0:
+            timestamps = TimestampParser.parse_timestamps(data.iloc[:, 0])
+            start_time, stop_time = timestamps.min(), timestamps.max()
+        else:
+            start_time = stop_time = pd.NaT
+    if pd.isnull(start_time) or pd.isnull(stop_time):
+        return None, None, row_count
+    return start_time.value, stop_time.value, row_count
@@ -0,0 +1,43 @@
+import click
+
+@click.group()
+def cli():
+    pass
+
+@cli.command()
+@click.argument('root_path', type=click.Path(exists=True))
+@click.option('--pid', help='only refresh the files of the given pid')
+@click.option('--catalog_path', default=None, help='the path of the catalog database, default dataset_catalog.sqlite in the root path')
+def refresh(root_path, pid, catalog_path):
+    # imported here so that --help does not load pandas
+    try:
+        from . import DatasetCatalog
+    except ImportError:
+        # run from the padar_extra folder instead of as a package
+        import DatasetCatalog
+    catalog = DatasetCatalog.DatasetCatalog(root_path, catalog_path)
+    count = catalog.refresh(None if pid is None else [pid])
+    catalog.close()
+    print('{} files cataloged'.format(count))
+
+@cli.command()
+@click.argument('root_path', type=click.Path(exists=True))
+@click.argument('pid')
+@click.option('--start_time', default=None, help='the start of the time range, e.g. "2015-10-08 14:10:00"')
+@click.option('--stop_time', default=None, help='the end of the time range, e.g. "2015-10-08 14:30:00"')
+@click.option('--file_type', type=click.Choice(['sensor', 'annotation', 'feature']), default=None, help='only list the files of the given type')
+@click.option('--sensor_id', default=None, help='only list the files of the given sensor')
+@click.option('--catalog_path', default=None, help='the path of the catalog database, default dataset_catalog.sqlite in the root path')
+def find(root_path, pid, start_time, stop_time, file_type, sensor_id, catalog_path):
+    try:
+        from . import DatasetCatalog
+    except ImportError:
+        # run from the padar_extra folder instead of as a package
+        import DatasetCatalog
+    catalog = DatasetCatalog.DatasetCatalog(root_path, catalog_path)
+    files = catalog.find_files(pid, start_time, stop_time, file_type, sensor_id)
+    catalog.close()
+    print(files[['FILE_TYPE', 'SENSOR_ID', 'START_TIME', 'STOP_TIME', 'ROW_COUNT', 'FILE_PATH']].to_string(index=False))
+
+if __name__ == '__main__':
+    cli()
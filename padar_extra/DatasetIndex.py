@@ -0,0 +1,151 @@
+import mmap
+import os
+import re
+from collections import OrderedDict
+
+import pandas as pd
+
+try:
+    from . import TimestampParser
+except ImportError:
+    # run from the padar_extra folder instead of as a package
+    import TimestampParser
+
+# patterns to classify the files in the hourly folders, the first match decides the type
+FILE_PATTERNS = OrderedDict([('sensor', re.compile(r'\.sensor\.csv')),
+                             ('annotation', re.compile(r'\.annotation\.csv')),
+                             ('event', re.compile(r'\.event\.csv')),
+                             ('EMA', re.compile(r'\.EMA\.csv')),
+                             ('GPS', re.compile(r'\.GPS\.csv')),
+                             ('feature', re.compile(r'\.feature\.csv'))])
+# the files derived from the annotation files by AnnotationSplitter, splitted.annotation.csv and
+# [name].splitted.annotation.csv, are classified as other files
+DERIVED_FILE_PATTERN = re.compile(r'splitted\.annotation\.csv$')
+
+YEAR_PATTERN = re.compile(r'^\d{4}$')
+TWO_DIGITS_PATTERN = re.compile(r'^\d{2}$')
+# the newlines of the sensor files are counted by blocks of this size
+SCAN_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+class DatasetIndex(object):
+    """
+    Index of the hourly folders of a pid in mHealth structure, e.g. [pid]/MasterSynced/YYYY/MM/DD/HH.
+    Every directory is listed only once with os.scandir when the index is created, and the files
+    are classified as sensor, annotation, event, EMA, GPS, feature or other, the hidden files are skipped.
+
+    Args:
+        root_path: the root folder of the dataset
+        pid: the pid folder to index
+        folder: the folder with the hourly structure inside the pid folder, default MasterSynced
+    """
+
+    def __init__(self, root_path, pid, folder='MasterSynced'):
+        self.root_path = root_path
+        self.pid = pid
+        self.folder = folder
+        self.hourly_path = []
+        self.hourly_files = dict()
+        self.__scan()
+
+
+    def __scan(self):
+        base_path = os.path.join(self.root_path, self.pid, self.folder)
+        for year in self.__list_dirs(base_path, YEAR_PATTERN):
+            for month in self.__list_dirs(os.path.join(base_path, year), TWO_DIGITS_PATTERN):
+                for day in self.__list_dirs(os.path.join(base_path, year, month), TWO_DIGITS_PATTERN):
+                    for hour in self.__list_dirs(os.path.join(base_path, year, month, day), TWO_DIGITS_PATTERN):
+                        time = '-'.join([year, month, day, hour])
+                        self.hourly_path.append(time)
+                        self.hourly_files[time] = self.__classify(os.path.join(base_path, year, month, day, hour))
+
+
+    @staticmethod
+    def __list_dirs(path, pattern):
+        if not os.path.isdir(path):
+            return []
+        with os.scandir(path) as entries:
+            names = [entry.name for entry in entries if entry.is_dir() and pattern.match(entry.name)]
+        return sorted(names)
+
+
+    @staticmethod
+    def __classify(path):
+        files = dict([(file_type, []) for file_type in FILE_PATTERNS])
+        files['other'] = []
+        with os.scandir(path) as entries:
+            # the hidden files, e.g. the temporary files of a writer, are skipped
+            names = sorted(entry.name for entry in entries if entry.is_file() and not entry.name.startswith('.'))
+
+        for name in names:
+            if DERIVED_FILE_PATTERN.search(name):
+                files['other'].append(name)
+                continue
+            for file_type, pattern in FILE_PATTERNS.items():
+                if pattern.search(name):
+                    files[file_type].append(name)
+                    break
+            else:
+                files['other'].append(name)
+        return files
+
+
+    def get_hour_path(self, time):
+        """
+        Return the folder of the given hour, time is in the format of 'YYYY-MM-DD-HH'
+        """
+        return os.path.join(self.root_path, self.pid, self.folder, *time.split('-'))
+
+
+    def get_files(self, time, file_type):
+        """
+        Return the names of the files of the given type in the given hour
+        """
+        return self.hourly_files[time][file_type]
+
+
+    def get_file_paths(self, file_type):
+        """
+        Return a list of (time, file path) of all the files of the given type, in time order
+        """
+        file_paths = []
+        for time in self.hourly_path:
+            target_path = self.get_hour_path(time)
+            for file_name in self.hourly_files[time][file_type]:
+                file_paths.append((time, os.path.join(target_path, file_name)))
+        return file_paths
+
+
+def scan_sensor_file(file_path):
+    """
+    Count the rows of a sensor file by counting the newlines of the memory-mapped file,
+    and parse the timestamps of the first and the last rows only.
+
+    Returns:
+        row_count: the number of rows without the header
+        start_time: the timestamp of the first row, NaT if there is no row
+        stop_time: the timestamp of the last row, NaT if there is no row
+    """
+    if os.path.getsize(file_path) == 0:
+        return 0, pd.NaT, pd.NaT
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        # ignore the line breaks at the end of the file
+        end = len(data)
+        while end > 0 and data[end-1:end] in (b'\n', b'\r'):
+            end -= 1
+        header_end = data.find(b'\n', 0, end)
+        if header_end < 0:
+            return 0, pd.NaT, pd.NaT
+
+        # the last row does not end with a line break in [0, end)
+        row_count = 1
+        for offset in range(header_end + 1, end, SCAN_BLOCK_SIZE):
+            row_count += data[offset:min(offset + SCAN_BLOCK_SIZE, end)].count(b'\n')
+
+        first_end = data.find(b'\n', header_end + 1, end)
+        first_line = data[header_end + 1:first_end if first_end >= 0 else end]
+        last_line = data[data.rfind(b'\n', 0, end) + 1:end]
+
+    timestamps = [line.split(b',')[0].decode().strip() for line in [first_line, last_line]]
+    start_time, stop_time = TimestampParser.parse_timestamps(timestamps)
+    return row_count, start_time, stop_time
@@ -0,0 +1,65 @@
+import pandas as pd
+
+
+class ExceptionCollector(object):
+    """
+    Collect rows in a list and create a single DataFrame at the end, instead of calling
+    DataFrame.append for every row, which copies the whole frame every time.
+    The rows are kept in the order they are added.
+
+    Args:
+        columns: the columns of the DataFrame created
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.frames = []
+        self.records = []
+        self.count = 0
+
+
+    def append(self, record):
+        """
+        Add a row as a dict or pandas Series with the column names as keys, None is ignored
+        """
+        if record is None:
+            return
+        if isinstance(record, pd.Series):
+            record = record.to_dict()
+        self.records.append(record)
+        self.count += 1
+
+
+    def extend(self, frame):
+        """
+        Add all the rows of a DataFrame, None is ignored
+        """
+        if frame is None or frame.shape[0] == 0:
+            return
+        self.__flush()
+        self.frames.append(frame)
+        self.count += frame.shape[0]
+
+
+    def __flush(self):
+        if len(self.records) > 0:
+            self.frames.append(pd.DataFrame(self.records, columns=self.columns))
+            self.records = []
+
+
+    def __len__(self):
+        return self.count
+
+
+    def to_frame(self, ignore_index=True):
+        """
+        Return the DataFrame of all the rows added. If ignore_index is False, the DataFrames
+        added with extend keep their index, else the rows are numbered from 0.
+        """
+        self.__flush()
+        if len(self.frames) == 0:
+            return pd.DataFrame(columns=self.columns)
+        if len(self.frames) == 1:
+            frame = self.frames[0].reindex(columns=self.columns)
+            return frame.reset_index(drop=True) if ignore_index else frame
+        return pd.concat(self.frames, ignore_index=ignore_index).reindex(columns=self.columns)
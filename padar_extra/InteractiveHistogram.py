@@ -11,7 +11,11 @@ import dash_core_components as dcc
 import dash_html_components as html
 import plotly.graph_objs as go
 from textwrap import dedent as d
-import Visualizer
+try:
+    from . import Visualizer
+except ImportError:
+    # run from the padar_extra folder instead of as a package
+    import Visualizer
 import pandas as pd
 import copy
 
@@ -71,21 +75,7 @@ def gen_interactive_histograms(annotations, testing_data = [], training_data = [
     all_shapes = []
     
     if len(testing_data) > 0:
-        for index, series in testing_data[0].iloc[:,:2].iterrows():
-                all_shapes.append(
-                        {'type': 'rect',
-                         'xref': 'x',
-                         'yref': 'paper',
-                         'x0': series[0],
-                         'y0': 0,
-                         'x1': series[1],
-                         'y1': 1,
-                         'fillcolor': '#FF3383',
-                         'opacity': 0.5,
-                         'line': {
-                            'width': 0,
-                         }
-                        })
+        all_shapes = __window_shapes(testing_data[0])
 
     show_all_clicked=0
     submit_clicked=0
@@ -199,22 +189,7 @@ def gen_interactive_histograms(annotations, testing_data = [], training_data = [
             
             # everytime changed feature selection, update default annotation high light
             nonlocal all_shapes
-            all_shapes = []
-            for index, series in testing_data[0].iloc[:,:2].iterrows():
-                all_shapes.append(
-                {'type': 'rect',
-                 'xref': 'x',
-                 'yref': 'paper',
-                 'x0': series[0],
-                 'y0': 0,
-                 'x1': series[1],
-                 'y1': 1,
-                 'fillcolor': '#FF3383',
-                 'opacity': 0.5,
-                 'line': {
-                    'width': 0,
-                    }
-                 })
+            all_shapes = __window_shapes(testing_data[0])
             
         fig_list = []
         list_of_data = testing_data + training_data
@@ -279,31 +254,35 @@ def gen_interactive_histograms(annotations, testing_data = [], training_data = [
             if point['curveNumber'] < len(testing_data):
                 indexes[point['curveNumber']] = point['pointNumbers']
         
-        time_series = pd.DataFrame(columns=['START_TIME','STOP_TIME'])
-        for key in indexes.keys():
-            time_series = time_series.append(testing_data[key].iloc[indexes[key],:2])
-        shapes = []
-        for index, series in time_series.iterrows():
-            shapes.append(
-                    {'type': 'rect',
-                     'xref': 'x',
-                     'yref': 'paper',
-                     'x0': series[0],
-                     'y0': 0,
-                     'x1': series[1],
-                     'y1': 1,
-                     'fillcolor': '#FF3383',
-                     'opacity': 0.5,
-                     'line': {
-                        'width': 0,
-                     }
-                    })
-        new_fig['layout']['shapes'] += shapes
+        if len(indexes) == 0:
+            return new_fig
+        time_series = pd.concat([testing_data[key].iloc[indexes[key],:2] for key in indexes.keys()])
+        new_fig['layout']['shapes'] += __window_shapes(time_series)
         return new_fig
         
     app.run_server()
 
 
+def __window_shapes(windows):
+    """
+    Return the rectangles highlighting feature windows on the annotation graph, the start and stop
+    times of the windows are their first two columns
+    """
+    return [{'type': 'rect',
+             'xref': 'x',
+             'yref': 'paper',
+             'x0': start_time,
+             'y0': 0,
+             'x1': stop_time,
+             'y1': 1,
+             'fillcolor': '#FF3383',
+             'opacity': 0.5,
+             'line': {
+                'width': 0,
+             }
+            } for start_time, stop_time in zip(windows.iloc[:,0], windows.iloc[:,1])]
+
+
 
         
         
@@ -1,4 +1,3 @@
-import InteractiveHistogram
 import click as cli
 
 @cli.command()
@@ -6,6 +5,12 @@ import click as cli
 @cli.argument('all_testing', type=cli.Path(exists=True))
 @cli.argument('all_training', type=cli.Path(exists=True))
 def gen_interactive_histograms(annotations, all_testing, all_training):
+    # imported here so that --help does not load dash and plotly
+    try:
+        from . import InteractiveHistogram
+    except ImportError:
+        # run from the padar_extra folder instead of as a package
+        import InteractiveHistogram
     InteractiveHistogram.gen_interactive_histograms(annotations=annotations, 
                                                 all_testing=all_testing, 
                                                 all_training=all_training)
@@ -6,25 +6,21 @@ Created on Fri Jun 29 15:45:06 2018
 @author: zhangzhanming
 """
 
-import plotly.offline as py
-import plotly.graph_objs as go
-from sklearn.metrics import confusion_matrix
-import matplotlib.pyplot as plt
 import itertools
 import numpy as np
 import pandas as pd
-import Visualizer
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import scale
-from sklearn.model_selection import cross_val_score
-from sklearn import svm
-#from sklearn.model_selection import cross_val_predict
-from sklearn import metrics
+try:
+    from . import AnnotationIndex, SensorCache, TimestampParser
+except ImportError:
+    # run from the padar_extra folder instead of as a package
+    import AnnotationIndex
+    import SensorCache
+    import TimestampParser
 import os 
 import re
-import plotly.offline as py
-import plotly.figure_factory as ff
-import InteractiveHistogram
+
+# sklearn, matplotlib, plotly, Visualizer and InteractiveHistogram are imported in the methods
+# using them, so importing this module for one method does not load all of them
 
 class ModelAnalyzer(object):
     
@@ -78,6 +74,7 @@ class ModelAnalyzer(object):
     
     def gen_confusion_matrix(self, prediction=None, 
                              target_data=None, normalize=True):
+        from sklearn.metrics import confusion_matrix
         if prediction is None:
             prediction = self.prediction
         if target_data is None:
@@ -90,7 +87,7 @@ class ModelAnalyzer(object):
     
     def get_confusion_data(self,true_value, predicted_value, target_data=None,
                            prediction=None, time_series=None, feature_data=None, root=None, 
-                           get_feature_data=True, get_acc_data=True):
+                           get_feature_data=True, get_acc_data=True, catalog=None):
         """
         provide the feature data or raw data misclassified
 
@@ -104,6 +101,9 @@ class ModelAnalyzer(object):
             root: root folder of raw data which has MasterSynced
             get_feature_data: if return feature data of misclassified result
             get_acc_data: if return raw data of misclassified result
+            catalog: DatasetCatalog of the dataset containing root, used to find the sensor files
+                of the windows, including the next hour when a window crosses it, if None the
+                sensor file of every hour folder is read directly
         
         Returns:
             feature data of misclassified result if get_feature_data == true
@@ -133,30 +133,36 @@ class ModelAnalyzer(object):
             
         if get_acc_data:
             times = time_series[indexes]
-            times.iloc[:,0] = pd.to_datetime(times.iloc[:,0])
-            times.iloc[:,1] = pd.to_datetime(times.iloc[:,1])
+            times.iloc[:,0] = TimestampParser.parse_timestamps(times.iloc[:,0])
+            times.iloc[:,1] = TimestampParser.parse_timestamps(times.iloc[:,1])
             times['key'] = times['START_TIME'].dt.strftime('%Y/%m/%d/%H')
             
             grouped_time = times.groupby('key')
-            acc_data = pd.DataFrame(columns=['HEADER_TIME_STAMP', 'X_ACCELERATION_METERS_PER_SECOND_SQUARED',
+            acc_list = [pd.DataFrame(columns=['HEADER_TIME_STAMP', 'X_ACCELERATION_METERS_PER_SECOND_SQUARED',
            'Y_ACCELERATION_METERS_PER_SECOND_SQUARED',
-           'Z_ACCELERATION_METERS_PER_SECOND_SQUARED'])
+           'Z_ACCELERATION_METERS_PER_SECOND_SQUARED'])]
+
+            # with a catalog, the root is the pid folder
+            pid = os.path.basename(os.path.normpath(root))
             
             for key, data in grouped_time:
-                file_list = []
-                path = root+'MasterSynced/'+key
-                for filename in os.listdir(path):
-                    if re.findall(".sensor.csv", filename):
-                        file_list.append(pd.read_csv(os.path.join(path, filename)))
+                if catalog is not None:
+                    files = catalog.find_files(pid, data.iloc[:,0].min(), data.iloc[:,1].max(), 'sensor')
+                    file_paths = files.loc[files['FOLDER'] == 'MasterSynced', 'FILE_PATH'].tolist()
+                    sensor_count = files.loc[files['FOLDER'] == 'MasterSynced', 'SENSOR_ID'].nunique()
+                else:
+                    path = root+'MasterSynced/'+key
+                    file_paths = [os.path.join(path, x) for x in os.listdir(path) if re.findall(".sensor.csv", x)]
+                    sensor_count = len(file_paths)
                 
-                if len(file_list) > 1 or len(file_list) < 1:
-                    raise Exception("Can't handle now: {} files found".format(len(file_list)))
+                if sensor_count != 1:
+                    raise Exception("Can't handle now: {} files found".format(sensor_count))
                 
-                temp_acc = file_list[0]
-                temp_acc.iloc[:,0] = pd.to_datetime(temp_acc.iloc[:,0])
+                temp_acc = pd.concat([SensorCache.read_sensor_file(x) for x in file_paths], ignore_index=True)
                 for i in range(data.shape[0]):
-                    acc_data = acc_data.append(temp_acc[(temp_acc.iloc[:,0] >= data.iloc[i,0]) & 
-                                                        (temp_acc.iloc[:,0] <= data.iloc[i,1])])
+                    acc_list.append(temp_acc[(temp_acc.iloc[:,0] >= data.iloc[i,0]) & 
+                                             (temp_acc.iloc[:,0] <= data.iloc[i,1])])
+            acc_data = pd.concat(acc_list)
     
             if not get_feature_data:
                 return acc_data
@@ -166,6 +172,12 @@ class ModelAnalyzer(object):
     
     @staticmethod
     def plot_feature_and_raw(features, acc_data, path_out='/Users/zhangzhanming/Desktop/mHealth/Test/'):
+        import plotly.offline as py
+        try:
+            from . import Visualizer
+        except ImportError:
+            # run from the padar_extra folder instead of as a package
+            import Visualizer
         acc_fig = Visualizer.acc_grapher(acc_data, return_fig=True, showlegend=True)
         feature_fig = Visualizer.feature_grapher(features, return_fig=True, showlegend=True, hide_traces=True)
         acc_fig['data'] += feature_fig['data']
@@ -199,6 +211,7 @@ class ModelAnalyzer(object):
         target = target[~ drop_list]
         features = features[~ drop_list]
         if rescale: 
+            from sklearn.preprocessing import scale
             features = scale(features)
         
         return features, target
@@ -207,11 +220,15 @@ class ModelAnalyzer(object):
     def plot_confusion_matrix(self, cm, classes,
                           normalize=False,
                           title='Confusion matrix',
-                          cmap=plt.cm.Blues):
+                          cmap=None):
         """
         This function prints and plots the confusion matrix.
         Normalization can be applied by setting `normalize=True`.
+        The default color map is plt.cm.Blues.
         """
+        import matplotlib.pyplot as plt
+        if cmap is None:
+            cmap = plt.cm.Blues
         if normalize:
             cm = cm.astype('float') / cm.sum(axis=1)[:, np.newaxis]
             print("Normalized confusion matrix")
@@ -244,22 +261,10 @@ class ModelAnalyzer(object):
         real_features = real_features.iloc[:,:18]
         if class_mapping is not None:
             real_annotation = pd.merge(real_annotation, class_mapping, left_on ='LABEL_NAME', right_on='label', copy=False).drop('LABEL_NAME', axis=1)
-        truth= []
-        starttimelist = real_annotation['START_TIME']
-        stoptimelist = real_annotation['STOP_TIME']
-    
-        for key, series in real_features.iterrows():
-            starttime = series['START_TIME']
-            stoptime = series['STOP_TIME']
-            for i in range(len(starttimelist)+1):
-                if i == len(starttimelist):
-                    truth.append('not started')
-                elif starttimelist[i] <= starttime:
-                    if stoptimelist[i] >= stoptime:
-                        truth.append(real_annotation.loc[real_annotation.index[i],target_class])
-                        break
-        
-        truth = np.asarray(truth)  
+        # the class of the first annotation containing every feature window
+        annotation_index = AnnotationIndex.AnnotationIndex(real_annotation)
+        truth = annotation_index.labels_during(real_features['START_TIME'], real_features['STOP_TIME'],
+                                               target_class, missing='not started')
     
         real_features['Truth'] = truth
         real_features = real_features.dropna()
@@ -303,6 +308,8 @@ class ModelAnalyzer(object):
 
     @staticmethod
     def get_histograms(list_of_data, list_of_names = None, return_fig=False, mode='overlaid', path_out='/Users/zhangzhanming/Desktop/mHealth/Test/'):
+        import plotly.graph_objs as go
+        import plotly.offline as py
         fig_list = []
         feature_names=[]
         n_traces = len(list_of_data)
@@ -379,6 +386,14 @@ class ModelAnalyzer(object):
         
 
 def test_on_data(position, time, target_class):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import cross_val_score
+    from sklearn import metrics
+    try:
+        from . import InteractiveHistogram
+    except ImportError:
+        # run from the padar_extra folder instead of as a package
+        import InteractiveHistogram
     classes = pd.read_csv('/Users/zhangzhanming/Desktop/mHealth/Data/SampleData/spadeslab/SPADESInLab-cleaned.class.csv')
     in_data = pd.read_csv('/Users/zhangzhanming/Desktop/mHealth/Data/SampleData/'+position+'.csv')
     in_data.drop(in_data.columns[0], axis =1, inplace=True)
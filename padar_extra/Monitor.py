@@ -9,6 +9,12 @@ import pandas as pd
 import time
 import threading
 import datetime
+try:
+    from . import SensorCache, TimestampParser
+except ImportError:
+    # run from the padar_extra folder instead of as a package
+    import SensorCache
+    import TimestampParser
 
 class AccDataBase(object):
 
@@ -33,7 +39,7 @@ class AccDataBase(object):
         if isinstance(annotationdata, str):
             self.annotationdata = pd.read_csv(annotationdata)
         if isinstance(rawdata, str):
-            self.rawdata = pd.read_csv(rawdata)
+            self.rawdata = SensorCache.read_sensor_file(rawdata)
 
         if isinstance(featuredata, pd.DataFrame):
             self.featuredata = featuredata
@@ -148,7 +154,7 @@ class Monitor(object):
             annotationdata = annotationdata.values.tolist()
             # sort annotation data by end time, just like in real situations
             annotationdata.sort(key=lambda x: x[1])
-            rawdata = pd.read_csv('/Users/zhangzhanming/Desktop/mHealth/Data/SPADES_2/Derived/Preprocessed/2015/10/08/14/ActigraphGT9X-AccelerationCalibrated-NA.TAS1E23150066-AccelerationCalibrated.2015-10-08-14-00-00-000-M0400.sensor.csv')
+            rawdata = SensorCache.read_sensor_file('/Users/zhangzhanming/Desktop/mHealth/Data/SPADES_2/Derived/Preprocessed/2015/10/08/14/ActigraphGT9X-AccelerationCalibrated-NA.TAS1E23150066-AccelerationCalibrated.2015-10-08-14-00-00-000-M0400.sensor.csv')
 # =============================================================================
 #             last_time = pd.to_datetime(rawdata.iloc[0,0])
 #             feature_interval = datetime.timedelta(seconds=self.feature_time)
@@ -162,7 +168,7 @@ class Monitor(object):
                 raw_update = rawdata[int(count*refresh/1000*sampling_rate):
                     int((count+1)*refresh/1000*sampling_rate)]
 
-                currtime = pd.to_datetime(raw_update.iloc[-1,0])
+                currtime = raw_update.iloc[-1,0]
 
 # =============================================================================
 #                 nonlocal threshold_time
@@ -173,7 +179,7 @@ class Monitor(object):
 #                     feature_count += 1
 # =============================================================================
                 annotation_update = []
-                while currtime >= pd.to_datetime(annotationdata[0][1]):
+                while currtime >= TimestampParser.parse_timestamp(annotationdata[0][1]):
                     annotation_update.append(annotationdata.pop(0))
                     feature_update.append(featuredata.pop(0))
                     
@@ -0,0 +1,126 @@
+import contextlib
+import os
+import sys
+import time
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    # resource is not available on Windows, the peak memory is not recorded
+    resource = None
+
+PROFILE_COLUMNS = ['Stage', 'PID', 'WallSeconds', 'CPUSeconds', 'BytesRead', 'PeakRSSMegabytes', 'ProcessID']
+
+
+class Profiler(object):
+    """
+    Record the wall time, CPU time, bytes read and peak memory of the stages of a run.
+    The CPU time and bytes read are those of the process running the stage, e.g. a worker process,
+    the peak memory is the peak resident memory of that process since it started.
+    If enabled is False, nothing is recorded.
+
+    Args:
+        enabled: if the stages are recorded, default True
+    """
+
+    # the (profiler, pid) of the enabled stages running in this process, the innermost last, see sub_stage
+    running_stages = []
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.records = []
+
+
+    @contextlib.contextmanager
+    def stage(self, stage, pid=None, accumulate=False):
+        """
+        Record the code run in the with statement as a stage, pid is None for the stages of all the pids.
+        If accumulate is True, the runs of the stage of the same pid in the same process are summed
+        in one record, e.g. for a step run for every file.
+        """
+        if not self.enabled:
+            yield
+            return
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        start_read = get_bytes_read()
+        Profiler.running_stages.append((self, pid))
+        try:
+            yield
+        finally:
+            Profiler.running_stages.pop()
+            stop_read = get_bytes_read()
+            record = {'Stage': stage,
+                      'PID': 'ALL' if pid is None else pid,
+                      'WallSeconds': time.perf_counter() - start_wall,
+                      'CPUSeconds': time.process_time() - start_cpu,
+                      'BytesRead': None if start_read is None else stop_read - start_read,
+                      'PeakRSSMegabytes': get_peak_rss(),
+                      'ProcessID': os.getpid()}
+            previous = [x for x in self.records if accumulate and
+                        (x['Stage'], x['PID'], x['ProcessID']) == (record['Stage'], record['PID'], record['ProcessID'])]
+            if len(previous) == 0:
+                self.records.append(record)
+            else:
+                previous[-1]['WallSeconds'] += record['WallSeconds']
+                previous[-1]['CPUSeconds'] += record['CPUSeconds']
+                if record['BytesRead'] is not None:
+                    previous[-1]['BytesRead'] += record['BytesRead']
+                previous[-1]['PeakRSSMegabytes'] = record['PeakRSSMegabytes']
+
+
+    def extend(self, records):
+        """
+        Add the records of another profiler, e.g. the one of a worker process
+        """
+        self.records.extend(records)
+
+
+    def to_frame(self, pid=None):
+        """
+        Return the records as a DataFrame, only those of the given pid if pid is not None
+        """
+        records = [x for x in self.records if pid is None or x['PID'] == pid]
+        return pd.DataFrame(records, columns=PROFILE_COLUMNS)
+
+
+def sub_stage(stage):
+    """
+    Record the code run in the with statement as a stage of the pid of the innermost running stage,
+    summed over all its runs, e.g. the timestamp conversion in the check of a pid run in a worker
+    process. The time of a sub stage is included in the time of the stage running it. Nothing is
+    recorded if no enabled stage is running.
+    """
+    if len(Profiler.running_stages) == 0:
+        return Profiler(enabled=False).stage(stage)
+    profiler, pid = Profiler.running_stages[-1]
+    return profiler.stage(stage, pid, accumulate=True)
+
+
+def get_bytes_read():
+    """
+    Return the bytes read by the current process so far, from /proc/self/io on Linux, else None
+    """
+    try:
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+
+
+def get_peak_rss():
+    """
+    Return the peak resident memory of the current process in megabytes, None if it is not available
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak / 1024 / 1024
+    return peak / 1024
@@ -0,0 +1,99 @@
+import os
+import pickle
+import tempfile
+
+# bump the version when the format of the cached results changes, older caches are ignored
+CACHE_VERSION = 2
+
+
+class ResultCache(object):
+    """
+    Persistent cache of the results computed from files, stored with pickle in a single file.
+    Every result is stored with the fingerprint of its input, e.g. the size and modification time
+    of a file, and is only returned while the fingerprint is the same. The results are grouped
+    by section, and the results of a section not used since the cache was loaded are removed
+    when the cache is saved.
+
+    Args:
+        cache_path: the path of the cache file, it is created when the cache is saved
+    """
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self.entries = dict()
+        self.used = dict()
+        self.__load()
+
+
+    def __load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'rb') as f:
+                version, entries = pickle.load(f)
+        except Exception:
+            print('WARNING: Ignore unreadable cache file', self.cache_path)
+            return
+        if version == CACHE_VERSION:
+            self.entries = entries
+
+
+    @staticmethod
+    def fingerprint(file_path):
+        """
+        Return the (size, modification time) of the file, which changes when the file is modified
+        """
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime_ns
+
+
+    def get(self, section, key, fingerprint):
+        """
+        Return the result stored for key in section if it was computed from the same fingerprint, else None
+        """
+        self.used.setdefault(section, set()).add(key)
+        entry = self.entries.get(section, dict()).get(key)
+        if entry is None or entry[0] != fingerprint:
+            return None
+        return entry[1]
+
+
+    def put(self, section, key, fingerprint, result):
+        self.used.setdefault(section, set()).add(key)
+        self.entries.setdefault(section, dict())[key] = (fingerprint, result)
+
+
+    def get_file_result(self, section, file_path, function):
+        """
+        Return the cached result of function(file_path), function is only called if the file
+        is new or has been modified since the result was cached
+        """
+        fingerprint = self.fingerprint(file_path)
+        result = self.get(section, file_path, fingerprint)
+        if result is None:
+            result = function(file_path)
+            self.put(section, file_path, fingerprint, result)
+        return result
+
+
+    def save(self, prune=True):
+        """
+        Write the cache file. If prune is True, the results not used since the cache was loaded are
+        dropped from the sections used, e.g. those of the removed files
+        """
+        if prune:
+            for section, keys in self.used.items():
+                entries = self.entries.get(section, dict())
+                self.entries[section] = dict([(key, entries[key]) for key in keys if key in entries])
+
+        folder = os.path.dirname(os.path.abspath(self.cache_path))
+        os.makedirs(folder, exist_ok=True)
+        # a temporary file of its own, so runs saving the same cache at the same time do not write in the same file
+        fd, temp_path = tempfile.mkstemp(dir=folder, prefix='.' + os.path.basename(self.cache_path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((CACHE_VERSION, self.entries), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.cache_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
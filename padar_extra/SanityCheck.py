@@ -1,40 +1,59 @@
-import yaml
 import pandas as pd
 import re
 import os 
-from bokeh.models.widgets import DataTable, TableColumn
-from bokeh.models import ColumnDataSource
-from bokeh.io import show, output_file, reset_output, save
-from bokeh import layouts
-from bokeh.plotting import figure
-from bokeh.models import DatetimeTickFormatter, DateFormatter
-from bokeh.models.widgets import Panel, Tabs
-from bokeh.models.tools import HoverTool
 import math
 import sys
 import datetime as dt
 import numpy as np
 import copy
 import re
-from dateutil.parser import parse
-from bokeh.models.widgets import Paragraph
-from bs4 import BeautifulSoup as Soup
-from bokeh.embed import components
+from concurrent.futures import ProcessPoolExecutor
+try:
+    from . import DatasetIndex, ResultCache, ExceptionCollector, Profiler, SensorCache, TimestampParser
+except ImportError:
+    # run from the padar_extra folder instead of as a package
+    import DatasetIndex
+    import ResultCache
+    import ExceptionCollector
+    import Profiler
+    import SensorCache
+    import TimestampParser
 
-def sanity_check(root_path, config_path, totalreport, pid=None):
+# bokeh, BeautifulSoup, yaml and dateutil are imported in the functions using them, so the
+# command line help and the worker processes do not load them
+
+# number of bytes, or rows if the timestamps have to be parsed by pandas, read at a time
+# when counting the samples of a sensor file
+SAMPLING_RATE_BLOCK_SIZE = 8 * 1024 * 1024
+SAMPLING_RATE_CHUNK_SIZE = 500000
+# cache of the results of the unchanged files in incremental mode, in the Derived folder of each pid
+CACHE_FILE_NAME = 'sanity_check_cache.pkl'
+
+def sanity_check(root_path, config_path, totalreport, pid=None, workers=1, incremental=False, profile=False):
     """
     This function parse files in mHealth structure and generate reports with statistics 
     and discrepancies flagged, according to the configuration file provided.
+    If workers is greater than 1, the files of different pids are parsed in a pool
+    of worker processes, and the results are merged in the same order as a serial run.
+    If incremental is True, the results of the sensor and annotation files are cached in
+    [pid]/Derived/sanity_check_cache.pkl, and only the new or modified files are parsed again.
+    If profile is True, the wall time, CPU time, bytes read and peak memory of every stage are
+    written in sanity_check_profile.csv in root_path, and in the Performance section of the reports.
     For more information, see https://github.com/codeconomics/DataTools/edit/master/ReadMe.md
     """
+    import yaml
+    from bokeh.models.widgets import Paragraph
+    from bs4 import BeautifulSoup as Soup
 
     # Below are HTML Tag ids used in html template
     MISSING_FILE_TAG = 'missing-file'
     ANNOTATION_TAG = 'annotation'
     SAMPLING_RATE_TAG = 'sampling-rate'
+    PERFORMANCE_TAG = 'performance'
     BOKEH_VERSION = '0.13.0'
 
     root_path = os.path.realpath(root_path)
+    profiler = Profiler.Profiler(enabled=profile)
     config = dict()
     with open(config_path, 'r') as file:
         config = yaml.load(file)
@@ -49,6 +68,11 @@ def sanity_check(root_path, config_path, totalreport, pid=None):
     to_check_sampling_rate = any([x['check_sampling_rate'] is not None for x in config])
     to_check_annotation = any([x['check_annotation'] for x in config])
 
+    # index the hourly folders of every pid once, the index is shared by all the checks
+    indexes = None
+    if to_check_missing_file or to_check_sampling_rate or to_check_annotation:
+        indexes = __build_indexes(root_path, config, workers, profiler)
+
     # create the report elements according to configuration
     # add corresponding html tag id to the elements
     total_report_elements = []
@@ -66,7 +90,7 @@ def sanity_check(root_path, config_path, totalreport, pid=None):
     if not has_template:
         total_report_elements.append(Paragraph(text='Missing File List', style={'color':'blue'}))
     if to_check_missing_file:
-        missing_file, missing_file_table_pid = check_missing_file(root_path, config, totalreport)
+        missing_file, missing_file_table_pid = check_missing_file(root_path, config, totalreport, workers, indexes, profiler)
         for pid in missing_file_table_pid:
             if pid not in pid_report_elements:
                 pid_report_elements[pid] = []
@@ -76,7 +100,7 @@ def sanity_check(root_path, config_path, totalreport, pid=None):
     if not has_template:
         total_report_elements.append(Paragraph(text='Sensor File Exceptions', style={'color':'blue'}))
     if to_check_sampling_rate:
-        abnormal_rate, sensor_tables = check_sampling_rate(root_path, config, totalreport)
+        abnormal_rate, sensor_tables = check_sampling_rate(root_path, config, totalreport, workers, indexes, incremental, profiler)
         for pid in sensor_tables:
             if pid not in pid_report_elements:
                 pid_report_elements[pid] = []
@@ -86,7 +110,7 @@ def sanity_check(root_path, config_path, totalreport, pid=None):
     if not has_template:
         total_report_elements.append(Paragraph(text='Annotation Reports and Exceptions', style={'color':'blue'}))
     if to_check_annotation:
-        total_annotation_graphs, histogram_by_day = check_annotation(root_path, config, totalreport)
+        total_annotation_graphs, histogram_by_day = check_annotation(root_path, config, totalreport, workers, indexes, incremental, profiler)
         for pid in histogram_by_day:
             if pid not in pid_report_elements:
                 pid_report_elements[pid] = []
@@ -106,18 +130,36 @@ def sanity_check(root_path, config_path, totalreport, pid=None):
         scripts = Soup(scripts.replace('x.y.z',BOKEH_VERSION), 'html.parser')
         soup = Soup(template, 'html.parser')
         soup.find('head').append(scripts)
-        if totalreport:
-            __write_styled_report(root_path, total_report_elements, soup)
+        # the total report is written last to include the performance of the pid reports
         for pid in pid_report_elements:
-            __write_styled_report(os.path.join(root_path, pid, 'Derived'), pid_report_elements[pid], soup)
-    else:
+            with profiler.stage('write_report', pid):
+                __write_styled_report(os.path.join(root_path, pid, 'Derived'),
+                                      pid_report_elements[pid] + __graph_profile(profiler, pid, PERFORMANCE_TAG), soup)
         if totalreport:
-            __write_raw_report(root_path, [x[0] for x in total_report_elements if isinstance(x, list)])
+            with profiler.stage('write_report'):
+                __write_styled_report(root_path, total_report_elements + __graph_profile(profiler, None, PERFORMANCE_TAG), soup)
+    else:
         for pid in pid_report_elements:
-            __write_raw_report(os.path.join(root_path, pid, 'Derived'), [x[0] for x in pid_report_elements[pid] if isinstance(x, list)])
+            with profiler.stage('write_report', pid):
+                __write_raw_report(os.path.join(root_path, pid, 'Derived'), [x[0] for x in pid_report_elements[pid] + __graph_profile(profiler, pid, PERFORMANCE_TAG) if isinstance(x, list)])
+        if totalreport:
+            with profiler.stage('write_report'):
+                __write_raw_report(root_path, [x[0] for x in total_report_elements + __graph_profile(profiler, None, PERFORMANCE_TAG) if isinstance(x, list)])
+
+    if profile:
+        profiler.to_frame().to_csv(os.path.join(root_path, 'sanity_check_profile.csv'))
     
      
+def __graph_profile(profiler, pid, tag):
+    # the table of the stages recorded so far for the report of a pid, or of all the pids if pid is None
+    if not profiler.enabled:
+        return []
+    return [(__graph_table(profiler.to_frame(pid)), tag)]
+
+
 def __write_raw_report(root_path, element_list):
+    from bokeh import layouts
+    from bokeh.io import output_file, reset_output, save
     reset_output()
     output_file(os.path.join(root_path,'report.html') , mode='inline')
     #output_file("report.html")
@@ -126,6 +168,8 @@ def __write_raw_report(root_path, element_list):
 
 
 def __write_styled_report(root_path, element_list, soup):
+    from bokeh.embed import components
+    from bs4 import BeautifulSoup as Soup
     soup = copy.deepcopy(soup)
     for element_tuple in element_list:
         tag_id = element_tuple[1]
@@ -138,32 +182,95 @@ def __write_styled_report(root_path, element_list, soup):
         f.write(str(soup))
 
 
-def check_missing_file(root_path, config, totalreport):
-    
+def check_missing_file(root_path, config, totalreport, workers=1, indexes=None, profiler=None):
+    from bokeh.models.widgets import Paragraph
+
     # if not __validate_config_missing_file(config):
     #     raise Exception('Invalid Configuration')
 
-    missing_file = pd.DataFrame(columns=['PID', 'FileType', 'FilePath', 'Note'])
+    missing_file = ExceptionCollector.ExceptionCollector(['PID', 'FileType', 'FilePath', 'Note'])
     missing_file_table_pid = dict()
 
+    if profiler is None:
+        profiler = Profiler.Profiler(enabled=False)
+    checks = [check for check in config if check['check_missing_file']]
+    if indexes is None:
+        indexes = __build_indexes(root_path, checks, workers, profiler)
+    with profiler.stage('check_missing_file'):
+        results = __map_pids(__check_missing_file_for_pid, [(root_path, check, indexes[check['pid']]) for check in checks],
+                             workers, profiler, 'missing_file', [check['pid'] for check in checks])
+    missing_file_by_pid = dict(zip([check['pid'] for check in checks], results))
+
     for check in config:
         if check['check_missing_file']:
-            missing_file_for_pid = __check_meta_data(root_path, check['pid'], check['num_sensor'], check['sensor_locations'])
-            missing_file_for_pid = missing_file_for_pid.append(__check_hourly_data(root_path, check['pid'], 
-                                                                check['check_annotation_file_exist'], check['check_event'], 
-                                                                check['check_EMA'], check['check_GPS'], 
-                                                                check['num_sensor'], check['num_annotator']))
-            missing_file = missing_file.append(missing_file_for_pid)
+            missing_file_for_pid = missing_file_by_pid[check['pid']]
+            missing_file.extend(missing_file_for_pid)
             missing_file_for_pid.to_csv(os.path.join(root_path,check['pid'],'Derived','missing_files.csv'))
             missing_file_table_pid[check['pid']] = __graph_table(missing_file_for_pid)
         else:
             missing_file_table_pid[check['pid']] = Paragraph(text='Missing File Not Checked', style={'color':'blue'})
     
+    missing_file = missing_file.to_frame(ignore_index=False)
     if totalreport:
         missing_file.to_csv(os.path.join(root_path, 'missing_file.csv'))
    
     return __graph_table(missing_file), missing_file_table_pid
-    
+
+
+def __check_missing_file_for_pid(root_path, check, dataset_index):
+    missing_file = ExceptionCollector.ExceptionCollector(['PID', 'FileType', 'FilePath', 'Note'])
+    missing_file.extend(__check_meta_data(root_path, check['pid'], check['num_sensor'], check['sensor_locations']))
+    missing_file.extend(__check_hourly_data(root_path, check['pid'],
+                                            check['check_annotation_file_exist'], check['check_event'],
+                                            check['check_EMA'], check['check_GPS'],
+                                            check['num_sensor'], check['num_annotator'], dataset_index))
+    return missing_file.to_frame(ignore_index=False)
+
+
+def __build_indexes(root_path, config, workers=1, profiler=None):
+    pids = [check['pid'] for check in config]
+    return dict(zip(pids, __map_pids(DatasetIndex.DatasetIndex, [(root_path, pid) for pid in pids],
+                                     workers, profiler, 'index', pids)))
+
+
+def __map_pids(function, arguments, workers=1, profiler=None, stage=None, pids=None):
+    """
+    Call function with each tuple in arguments. If workers is greater than 1, the calls
+    are run in a pool of worker processes. The results are always returned in the order
+    of arguments so the merged reports are the same as a serial run.
+    If profiler is enabled, each call is recorded as the stage of its pid in the process running it.
+    """
+    profiled = profiler is not None and profiler.enabled
+    if profiled:
+        arguments = [(function, stage, pid, args) for pid, args in zip(pids, arguments)]
+        function = __profile_call
+
+    if workers is None or workers <= 1 or len(arguments) <= 1:
+        results = [function(*args) for args in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(arguments))) as executor:
+            futures = [executor.submit(function, *args) for args in arguments]
+            results = [future.result() for future in futures]
+
+    if not profiled:
+        return results
+    for result, records in results:
+        profiler.extend(records)
+    return [result for result, records in results]
+
+
+def __profile_call(function, stage, pid, args):
+    profiler = Profiler.Profiler()
+    with profiler.stage(stage, pid):
+        result = function(*args)
+    return result, profiler.records
+
+
+def __open_cache(root_path, pid, incremental):
+    if not incremental:
+        return None
+    return ResultCache.ResultCache(os.path.join(root_path, pid, 'Derived', CACHE_FILE_NAME))
+
 
 def __fill_up_config(config, root_path = None):
     if root_path is not None:
@@ -234,7 +341,7 @@ def __validate_config_missing_file(config):
     
 def __check_meta_data(root_path, pid, num_sensor, sensor_locations):
     print('CHECKING META DATA FILE', pid)
-    missing_file = pd.DataFrame(columns=['PID', 'FileType', 'FilePath', 'Note'])
+    missing_file = ExceptionCollector.ExceptionCollector(['PID', 'FileType', 'FilePath', 'Note'])
     target_path = os.path.join(root_path, pid, 'Derived')
     if not os.path.isdir(target_path):
         os.mkdir(target_path)
@@ -250,115 +357,101 @@ def __check_meta_data(root_path, pid, num_sensor, sensor_locations):
                     location_mapping = pd.read_csv(os.path.join(target_path, existed_file))
                     if sensor_locations is None:
                         if num_sensor != location_mapping.shape[0]:
-                            missing_file = missing_file.append({'PID': pid,
+                            missing_file.append({'PID': pid,
                                                 'FileType': 'meta',
                                                 'FilePath': os.path.join(target_path, required_file),
-                                                'Note': '{} sensors missing in location mapping'.format(num_sensor - location_mapping.shape[0])},
-                                                ignore_index=True)
+                                                'Note': '{} sensors missing in location mapping'.format(num_sensor - location_mapping.shape[0])})
                     else:
                         existed_location = list(location_mapping.iloc[:,2].values)
                         for location in sensor_locations:
                             if location not in existed_location:
-                                missing_file = missing_file.append({'PID': pid,
+                                missing_file.append({'PID': pid,
                                                 'FileType': 'meta',
                                                 'FilePath': os.path.join(target_path, required_file),
-                                                'Note': location + ' missing in location mapping'},
-                                                ignore_index=True)
+                                                'Note': location + ' missing in location mapping'})
                             
                 break
         
         if not_there:
-            missing_file = missing_file.append({'PID': pid,
+            missing_file.append({'PID': pid,
                                                 'FileType': 'meta',
                                                 'FilePath': os.path.join(target_path, required_file),
-                                                'Note': ''},
-                                                ignore_index=True)    
-    return missing_file
+                                                'Note': ''})    
+    return missing_file.to_frame()
                 
 
-def __check_hourly_data(root_path, pid, _exist, check_event, check_EMA, check_GPS, num_sensor, num_annotator):
-    missing_file = pd.DataFrame(columns=['PID', 'FileType', 'FilePath', 'Note'])
-    # traverse the directory tree to find the start time and end time
-    hourly_path = __get_hourly_path(root_path, pid)
+def __check_hourly_data(root_path, pid, _exist, check_event, check_EMA, check_GPS, num_sensor, num_annotator, dataset_index):
+    missing_file = ExceptionCollector.ExceptionCollector(['PID', 'FileType', 'FilePath', 'Note'])
+    # the hourly folders are in time order in the index, find the start time and end time
+    hourly_path = dataset_index.hourly_path
     start_time = hourly_path[0]
     end_time = hourly_path[-1]
     
     expected_range = list(pd.date_range(start_time, end_time, freq='H').strftime('%Y-%m-%d-%H'))
     for file_name in expected_range:
         if file_name not in hourly_path:
-            missing_file = missing_file.append({'PID':pid,
+            missing_file.append({'PID':pid,
                                  'FileType': 'directory',
                                  'FilePath': os.path.join(root_path, pid, 'MasterSynced'),
-                                 'Note': 'No directory for the time ' + file_name},
-                                ignore_index=True)
+                                 'Note': 'No directory for the time ' + file_name})
     
     for time in hourly_path:
         print('CHECKING HOURLY DATA FILE', pid, time)
-        time_path = os.path.join(*time.split('-'))
-        target_path = os.path.join(root_path, pid, 'MasterSynced', time_path)
-        files = os.listdir(target_path)
-        
-        sensor_count = 0
-        for file_name in files:
-            if re.findall('.sensor.csv', file_name):
-                sensor_count += 1
-        
+        target_path = dataset_index.get_hour_path(time)
+
+        sensor_count = len(dataset_index.get_files(time, 'sensor'))
+
         if sensor_count < num_sensor:
-            missing_file = missing_file.append({'PID': pid,
+            missing_file.append({'PID': pid,
                                         'FileType': 'sensor',
                                         'FilePath': target_path,
                                         'Note': '{} sensor files missing in {}'.format(
                                                 num_sensor-sensor_count,
                                                 time) 
-                                    },
-                                    ignore_index=True)
+                                    })
         
         if _exist:
-            annotation_count = 0
-            for file_name in files:
-                if re.findall('.annotation.csv', file_name):
-                    annotation_count += 1
-                    
+            annotation_count = len(dataset_index.get_files(time, 'annotation'))
+
             if annotation_count < num_annotator:
-                missing_file = missing_file.append({'PID': pid,
+                missing_file.append({'PID': pid,
                                             'FileType': 'annotation',
                                             'FilePath': target_path,
                                             'Note': '{} annotation files missing in {}'.format(
                                                     num_annotator-annotation_count,
                                                     time) 
-                                        },
-                                        ignore_index=True)
+                                        })
         
         if check_event:
-            if all(not re.findall('.event.csv', file_name) for file_name in files):
-                missing_file = missing_file.append({'PID':pid,
+            if not dataset_index.get_files(time, 'event'):
+                missing_file.append({'PID':pid,
                      'FileType': 'event',
                      'FilePath': target_path,
-                     'Note': ''},
-                    ignore_index=True) 
+                     'Note': ''}) 
          
         #TODO: How to check EMA?
         if check_EMA:
-            if all(not re.findall('.EMA.csv', file_name) for file_name in files):
-                missing_file = missing_file.append({'PID':pid,
+            if not dataset_index.get_files(time, 'EMA'):
+                missing_file.append({'PID':pid,
                      'FileType': 'EMA',
                      'FilePath': target_path,
-                     'Note': ''},
-                    ignore_index=True)
+                     'Note': ''})
                 
         #TODO: How to check GPS?
         if check_GPS:
-            if all(not re.findall('.GPS.csv', file_name) for file_name in files):
-                missing_file = missing_file.append({'PID':pid,
+            if not dataset_index.get_files(time, 'GPS'):
+                missing_file.append({'PID':pid,
                      'FileType': 'GPS',
                      'FilePath': target_path,
-                     'Note': ''},
-                    ignore_index=True)
+                     'Note': ''})
     
-    return missing_file
+    return missing_file.to_frame()
         
     
 def __graph_table(table):
+    from bokeh import layouts
+    from bokeh.models import ColumnDataSource, DateFormatter
+    from bokeh.models.widgets import DataTable, Paragraph, TableColumn
     if table.shape[0] < 1:
         return Paragraph(text='No Exceptions Found', style={'color':'blue'})
     source = ColumnDataSource(table)
@@ -381,79 +474,257 @@ def __graph_table(table):
     return layouts.widgetbox(data_table, sizing_mode='fixed')
     
 
-def check_sampling_rate(root_path, config, totalreport):
-    abnormal_rate = pd.DataFrame(columns = ['PID','TimePeriod', 'SamplingRatePerMinute', 'FilePath'])
+def check_sampling_rate(root_path, config, totalreport, workers=1, indexes=None, incremental=False, profiler=None):
+    from bokeh.models.widgets import Paragraph
+    abnormal_rate = ExceptionCollector.ExceptionCollector(['PID','TimePeriod', 'SamplingRatePerMinute', 'FilePath'])
     sensor_tables = dict()
 
+    if profiler is None:
+        profiler = Profiler.Profiler(enabled=False)
+    checks = [check for check in config if check['check_sampling_rate'] is not None]
+    if indexes is None:
+        indexes = __build_indexes(root_path, checks, workers, profiler)
+    with profiler.stage('check_sampling_rate'):
+        results = __map_pids(__parse_sampling_rate, [(check['pid'],
+                                                      check['check_sampling_rate']['claimed_rate'],
+                                                      check['check_sampling_rate']['accept_range'],
+                                                      root_path, indexes[check['pid']], incremental,
+                                                      check['check_sampling_rate'].get('precheck', False)) for check in checks],
+                             workers, profiler, 'sampling_rate', [check['pid'] for check in checks])
+    abnormal_rate_by_pid = dict(zip([check['pid'] for check in checks], results))
+
     for check in config:
         if check['check_sampling_rate'] is not None:
-            abnormal_rate_for_pid = __parse_sampling_rate(check['pid'], 
-                check['check_sampling_rate']['claimed_rate'], 
-                check['check_sampling_rate']['accept_range'], 
-                root_path)
-            abnormal_rate = abnormal_rate.append(abnormal_rate_for_pid)
-            abnormal_rate.to_csv(os.path.join(root_path, check['pid'], 'Derived','sensor_exceptions.csv'))
+            abnormal_rate_for_pid, file_rates = abnormal_rate_by_pid[check['pid']]
+            if file_rates is not None:
+                file_rates.to_csv(os.path.join(root_path, check['pid'], 'Derived', 'sensor_file_rates.csv'))
+            abnormal_rate.extend(abnormal_rate_for_pid)
+            abnormal_rate.to_frame(ignore_index=False).to_csv(os.path.join(root_path, check['pid'], 'Derived','sensor_exceptions.csv'))
             sensor_tables[check['pid']] = __graph_table(abnormal_rate_for_pid)
         else:
             sensor_tables[check['pid']] = Paragraph(text='Sampling Rate Not Checked', style={'color':'blue'})
 
+    abnormal_rate = abnormal_rate.to_frame(ignore_index=False)
     if totalreport:    
         abnormal_rate.to_csv(os.path.join(root_path, 'sensor_exceptions.csv'))
     return __graph_table(abnormal_rate), sensor_tables
 
 
-def __parse_sampling_rate(pid, claim_rate, accept_range, root_path):
-    abnormal_rate = pd.DataFrame(columns = ['PID','TimePeriod', 'SamplingRatePerMinute', 'FilePath'])
-    hourly_path = __get_hourly_path(root_path, pid)
+def __parse_sampling_rate(pid, claim_rate, accept_range, root_path, dataset_index, incremental=False, precheck=False):
+    """
+    Find the minutes of the sensor files with a sampling rate out of the accepted range.
+    If precheck is True, the rows of every file are counted first, and only the files with
+    a number of rows out of the accepted range for an hour are checked minute by minute.
+
+    Returns:
+        abnormal_rate: DataFrame of the abnormal minutes
+        file_rates: DataFrame of the rows, time span and average rate of every file, None if precheck is False
+    """
+    abnormal_rate = ExceptionCollector.ExceptionCollector(['PID','TimePeriod', 'SamplingRatePerMinute', 'FilePath'])
+    file_rates = ExceptionCollector.ExceptionCollector(['PID', 'FilePath', 'RowCount', 'StartTime', 'StopTime',
+                                                        'AverageRate', 'Suspicious'])
+    normalrate = 60*claim_rate
+    hourly_rate = 3600*claim_rate
+    cache = __open_cache(root_path, pid, incremental)
+
+    for time in dataset_index.hourly_path:
+        target_path = dataset_index.get_hour_path(time)
+        files = dataset_index.get_files(time, 'sensor')
 
-    for time in hourly_path:
-        time_path = os.path.join(*time.split('-'))
-        target_path = os.path.join(root_path, pid, 'MasterSynced', time_path)
-        files = list(os.listdir(target_path))
-        files = list(filter(lambda x: re.findall('.sensor.csv', x), files))
-        
         for sensor_file in files:
             print('CHECKING SAMPLING RATE ', pid, sensor_file)
-            sensor_data = pd.read_csv(os.path.join(target_path, sensor_file))
-            sensor_data.iloc[:,0] = pd.to_datetime(sensor_data.iloc[:,0])
-            groups = sensor_data.iloc[:,[0,1]].groupby(pd.Grouper(key=sensor_data.columns[0], freq = '1min')).count()
-            normalrate = 60*claim_rate
-            for index, count in groups.iterrows():
-                if count[0] <= normalrate*(1-accept_range) or count[0] >= normalrate*(1+accept_range):
-                    abnormal_rate = abnormal_rate.append({'PID' : pid,
-                                                          'TimePeriod': index,
-                                                          'SamplingRatePerMinute': count[0],
-                                                          'FilePath': os.path.join(target_path, sensor_file)},
-                                        ignore_index=True)
-    return abnormal_rate
-            
+            file_path = os.path.join(target_path, sensor_file)
+            if precheck:
+                if cache is None:
+                    row_count, start_time, stop_time = DatasetIndex.scan_sensor_file(file_path)
+                else:
+                    row_count, start_time, stop_time = cache.get_file_result('file_scan', file_path, DatasetIndex.scan_sensor_file)
+                suspicious = row_count <= hourly_rate*(1-accept_range) or row_count >= hourly_rate*(1+accept_range)
+                span = (stop_time - start_time).total_seconds() if row_count > 1 else 0
+                file_rates.append({'PID': pid,
+                                   'FilePath': file_path,
+                                   'RowCount': row_count,
+                                   'StartTime': start_time,
+                                   'StopTime': stop_time,
+                                   'AverageRate': (row_count - 1) / span if span > 0 else np.nan,
+                                   'Suspicious': suspicious})
+                if not suspicious:
+                    continue
+
+            if cache is None:
+                minutes, counts = __count_samples_per_minute(file_path)
+            else:
+                minutes, counts = cache.get_file_result('sampling_rate', file_path, __count_samples_per_minute)
+            abnormal = (counts <= normalrate*(1-accept_range)) | (counts >= normalrate*(1+accept_range))
+            if abnormal.any():
+                abnormal_rate.extend(pd.DataFrame({'PID': pid,
+                                                   'TimePeriod': pd.to_datetime(minutes[abnormal], unit='m'),
+                                                   'SamplingRatePerMinute': counts[abnormal],
+                                                   'FilePath': file_path},
+                                                  columns=['PID','TimePeriod', 'SamplingRatePerMinute', 'FilePath']))
+
+    if cache is not None:
+        cache.save()
+    return abnormal_rate.to_frame(), file_rates.to_frame() if precheck else None
+
+
+def __count_samples_per_minute(file_path):
+    """
+    Count the samples of a sensor file in every minute between its first and last sample.
+    The timestamps are read from the columnar file of the sensor file if it is fresh, else the
+    file is read in blocks so the memory used does not depend on the size of the file.
+
+    Returns:
+        minutes: numpy array of int64 minutes since epoch
+        counts: numpy array of the number of samples in each minute
+    """
+    timestamps = SensorCache.read_sensor_timestamps(file_path)
+    if timestamps is not None:
+        minutes, counts = np.unique(timestamps // (60 * 10**9), return_counts=True)
+        return __fill_empty_minutes(minutes, counts)
+    try:
+        minutes, counts = __count_minutes_from_bytes(file_path)
+    except ValueError:
+        # the timestamps are not in the fixed mHealth format, let pandas parse them
+        minutes, counts = __count_minutes_from_csv(file_path)
+    return __fill_empty_minutes(minutes, counts)
+
+
+def __fill_empty_minutes(minutes, counts):
+    if len(minutes) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    first_minute = minutes.min()
+    # empty minutes between the first and the last sample are counted as 0
+    all_counts = np.zeros(minutes.max() - first_minute + 1, dtype=np.int64)
+    np.add.at(all_counts, minutes - first_minute, counts)
+    return np.arange(first_minute, first_minute + len(all_counts), dtype=np.int64), all_counts
 
-def __get_hourly_path(root_path, pid):
-    hourly_path = []
-    for path, dirs, files in os.walk(os.path.join(root_path, pid, 'MasterSynced')):
-        finds = re.findall('MasterSynced[/\\\\](\d{4})[/\\\\](\d{2})[/\\\\](\d{2})[/\\\\](\d{2})', path)
-        if finds:
-            hourly_path.append('-'.join(finds[0]))
-    return hourly_path
 
+def __count_minutes_from_bytes(file_path):
+    """
+    Count the samples per minute by reading the digits at their fixed offsets in
+    'YYYY-MM-DD HH:MM:SS.fff' at the start of every line, without parsing the rows.
+    Raise ValueError if a line does not start with a timestamp in this format.
+    """
+    minute_list = []
+    count_list = []
+    with open(file_path, 'rb') as f:
+        f.readline()
+        rest = b''
+        while True:
+            data = f.read(SAMPLING_RATE_BLOCK_SIZE)
+            block = rest + data
+            if data:
+                # only parse complete lines, keep the last partial line for the next block
+                end = block.rfind(b'\n') + 1
+                block, rest = block[:end], block[end:]
+            if block:
+                minutes, run_counts = __minute_runs(block)
+                if len(minutes) > 0:
+                    first_minute = minutes.min()
+                    counts = np.zeros(minutes.max() - first_minute + 1, dtype=np.int64)
+                    np.add.at(counts, minutes - first_minute, run_counts)
+                    nonzero = np.flatnonzero(counts)
+                    minute_list.append(nonzero + first_minute)
+                    count_list.append(counts[nonzero])
+            if not data:
+                break
+
+    if len(minute_list) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    return np.concatenate(minute_list), np.concatenate(count_list)
+
+
+def __minute_runs(block):
+    """
+    Split the lines of block into runs of consecutive lines with the same 'YYYY-MM-DD HH:MM' prefix.
+    Only the first line of each run is decoded, into minutes since epoch.
+
+    Returns:
+        minutes: numpy array of the minute of each run
+        counts: numpy array of the number of lines in each run
+    """
+    buffer = np.frombuffer(block, dtype=np.uint8)
+    starts = np.concatenate(([0], np.flatnonzero(buffer == 10) + 1))
+    lengths = np.diff(np.concatenate((starts, [len(buffer) + 1]))) - 1
+    # ignore empty lines, e.g. the end of the file
+    starts = starts[lengths > 1]
+    if len(starts) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    if lengths[lengths > 1].min() < 16:
+        raise ValueError('Line too short for a timestamp')
 
-def check_annotation(root_path, config, totalreport):
+    # read the 16 bytes 'YYYY-MM-DD HH:MM' of each line as two 8 bytes integers
+    words = np.ndarray(shape=(len(buffer) - 7,), dtype=np.uint64, buffer=buffer, strides=(1,))
+    first_word = words[starts]
+    second_word = words[starts + 8]
+    run_starts = np.flatnonzero(np.concatenate(([True], (first_word[1:] != first_word[:-1]) |
+                                                        (second_word[1:] != second_word[:-1]))))
+    run_counts = np.diff(np.concatenate((run_starts, [len(starts)])))
+
+    prefix = np.empty((len(run_starts), 2), dtype=np.uint64)
+    prefix[:, 0] = first_word[run_starts]
+    prefix[:, 1] = second_word[run_starts]
+    with Profiler.sub_stage('parse_timestamps'):
+        minutes = TimestampParser.parse_minute_prefixes(prefix.view(np.uint8))
+    return minutes, run_counts
+
+
+def __count_minutes_from_csv(file_path):
+    minute_list = []
+    count_list = []
+    chunks = pd.read_csv(file_path, usecols=[0], chunksize=SAMPLING_RATE_CHUNK_SIZE)
+    while True:
+        with Profiler.sub_stage('read_csv'):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        with Profiler.sub_stage('parse_timestamps'):
+            timestamps = TimestampParser.parse_timestamps(chunk.iloc[:,0])
+        timestamps = timestamps[timestamps.notnull()]
+        minutes, counts = np.unique(timestamps.values.astype('datetime64[m]').astype(np.int64), return_counts=True)
+        minute_list.append(minutes)
+        count_list.append(counts)
+
+    if len(minute_list) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    return np.concatenate(minute_list), np.concatenate(count_list)
+
+
+def check_annotation(root_path, config, totalreport, workers=1, indexes=None, incremental=False, profiler=None):
+    from bokeh import layouts
+    from bokeh.models.widgets import Panel, Paragraph, Tabs
     SLICING_RANGE = 6
-    annotation_exceptions = pd.DataFrame(columns=['PID','ANNOTATOR','START_TIME','STOP_TIME','LABEL_NAME','ISSUE'])
-    
+    annotation_exceptions = ExceptionCollector.ExceptionCollector(['PID','ANNOTATOR','START_TIME','STOP_TIME','LABEL_NAME','ISSUE'])
+
     histogram_by_day = dict()
-    
+
+    if profiler is None:
+        profiler = Profiler.Profiler(enabled=False)
+    checks = [check for check in config if check['check_annotation']]
+    if indexes is None:
+        indexes = __build_indexes(root_path, checks, workers, profiler)
+    with profiler.stage('check_annotation'):
+        results = __map_pids(__parse_annotation, [(check['pid'], check['annotation_lower_bound'], check['annotation_upper_bound'],
+                                                   check['check_episode_duration'],
+                                                   check['check_episode_time'],
+                                                   root_path, indexes[check['pid']], incremental) for check in checks],
+                             workers, profiler, 'annotation', [check['pid'] for check in checks])
+    parsed_annotation_by_pid = dict(zip([check['pid'] for check in checks], results))
+
     for check in config:
         if check['check_annotation']:
-            new_exceptions, figures = __parse_annotation(check['pid'], check['annotation_lower_bound'], check['annotation_upper_bound'], 
-                                                         check['check_episode_duration'], 
-                                                         check['check_episode_time'],
-                                                         root_path)
-            annotation_exceptions = annotation_exceptions.append(new_exceptions)
+            # the figures are created in this process, bokeh models are not shared with the workers
+            new_exceptions, all_annotation_table = parsed_annotation_by_pid[check['pid']]
+            with profiler.stage('annotation_figures', check['pid']):
+                figures = __graph_annotation(check['pid'], new_exceptions, all_annotation_table)
+            annotation_exceptions.extend(new_exceptions)
             histogram_by_day[check['pid']] = figures
         else:
             histogram_by_day[check['pid']] = Paragraph(text='Annotation Not Checked', style={'color':'blue'})
 
+    annotation_exceptions = annotation_exceptions.to_frame(ignore_index=False)
     if totalreport:
         annotation_exceptions.to_csv(os.path.join(root_path, 'annotation_exceptions.csv'))
     
@@ -483,24 +754,24 @@ def check_annotation(root_path, config, totalreport):
     return total_annotation_graphs, histogram_by_day
 
 
-def __parse_annotation(pid, lower_bound, upper_bound, check_episode_duration, check_episode_time, root_path):
+def __parse_annotation(pid, lower_bound, upper_bound, check_episode_duration, check_episode_time, root_path, dataset_index, incremental=False):
     print('CHECKING ANNOTATION', pid)
+    cache = __open_cache(root_path, pid, incremental)
+    if cache is not None:
+        # the exceptions depend on all the annotation files of the pid and on the configuration
+        fingerprint = ([(file_path, cache.fingerprint(file_path)) for _, file_path in dataset_index.get_file_paths('annotation')],
+                       lower_bound, upper_bound, check_episode_duration, check_episode_time)
+        cached_result = cache.get('annotation', pid, fingerprint)
+        if cached_result is not None:
+            cache.save()
+            return cached_result
 
-    ## this is a fix for bokeh bug:
-    fig1 = figure()
-    fig1.circle([0],[0])
-    tab_invsible = Panel(child=fig1, title='')    
-
-    annotation_exceptions = pd.DataFrame(columns=['PID','ANNOTATOR','START_TIME','STOP_TIME','LABEL_NAME','ISSUE'])
-    hourly_path = __get_hourly_path(root_path, pid)
+    annotation_exceptions = ExceptionCollector.ExceptionCollector(['PID','ANNOTATOR','START_TIME','STOP_TIME','LABEL_NAME','ISSUE'])
     all_annotation_files = {}
 
-    for time in hourly_path:
-        time_path = os.path.join(*time.split('-'))
-        target_path = os.path.join(root_path, pid, 'MasterSynced', time_path)
-        files = list(os.listdir(target_path))
-        files = list(filter(lambda x: re.findall('.annotation.csv', x), files))
-        for file_path in files:
+    for time in dataset_index.hourly_path:
+        target_path = dataset_index.get_hour_path(time)
+        for file_path in dataset_index.get_files(time, 'annotation'):
             file_id = re.findall('(.*)\\.\d{4}-\d{2}-\d{2}', file_path)
             if len(file_id) != 1:
                 raise Exception('Failed to parse annotation file name:', file_path) 
@@ -511,58 +782,53 @@ def __parse_annotation(pid, lower_bound, upper_bound, check_episode_duration, ch
             else:
                 all_annotation_files[file_id] = [os.path.join(target_path, file_path)]
 
-    all_annotation_table = __combine_annotation(all_annotation_files)
+    all_annotation_table = __combine_annotation(all_annotation_files, cache)
     
+    # parse the limits in the configuration once for all the episodes
     lower_bound = pd.Timedelta(lower_bound)
     upper_bound = pd.Timedelta(upper_bound)
-    histogram_list = []
-    episode_table_list = []
-
-    # create graphs by day
-    histogram_graph_list = []
-    episode_graph_list = []
+    episode_duration_limits = __parse_episode_duration_limits(check_episode_duration)
+    episode_time_limits = __parse_episode_time_limits(check_episode_time)
 
     for annotator, annotation_table in all_annotation_table.items():
         
         # check if the duration of annotations within specified length
-        annotation_table.iloc[:,1] = pd.to_datetime(annotation_table.iloc[:,1])
-        annotation_table.iloc[:,2] = pd.to_datetime(annotation_table.iloc[:,2])
-        for index, series in annotation_table.iterrows():
-            start_time = series[1]
-            stop_time = series[2]
-            if stop_time - start_time < lower_bound:
-                annotation_exceptions = annotation_exceptions.append({'PID': pid,
-                                              'ANNOTATOR': annotator,
-                                              'START_TIME': start_time,
-                                              'STOP_TIME': stop_time,
-                                              'LABEL_NAME': series[3],
-                                              'ISSUE': 'Too short, duration: {}'.format(stop_time - start_time),
-                                              },
-                                             ignore_index = True)
-                
-            if stop_time - start_time > upper_bound:
-                annotation_exceptions = annotation_exceptions.append({'PID': pid,
-                                              'ANNOTATOR': annotator,
-                                              'START_TIME': start_time,
-                                              'STOP_TIME': stop_time,
-                                              'LABEL_NAME': series[3],
-                                              'ISSUE': 'Too long, duration: {}'.format(stop_time - start_time),
-                                              },
-                                             ignore_index = True)  
-            
-            if check_episode_duration is not None:
-                annotation_exceptions = annotation_exceptions.append(__check_episode_duration(series, 
-                                                                                              check_episode_duration, pid, annotator),
-                                                                    ignore_index = True)
-            if check_episode_time is not None:
-                annotation_exceptions = annotation_exceptions.append(__check_episode_time(series, 
-                                                                                              check_episode_time, pid, annotator),
-                                                                    ignore_index = True)
-                
+        with Profiler.sub_stage('parse_timestamps'):
+            annotation_table.iloc[:,1] = TimestampParser.parse_timestamps(annotation_table.iloc[:,1])
+            annotation_table.iloc[:,2] = TimestampParser.parse_timestamps(annotation_table.iloc[:,2])
+        annotation_exceptions.extend(__check_annotation_table(annotation_table, lower_bound, upper_bound,
+                                                              episode_duration_limits, episode_time_limits,
+                                                              pid, annotator))
           
         # create annotation table by pid
         annotation_table['DURATION'] = annotation_table.iloc[:,2] - annotation_table.iloc[:,1]
         annotation_table['DAY'] = annotation_table.iloc[:,1].dt.day
+
+    annotation_exceptions = annotation_exceptions.to_frame()
+    if cache is not None:
+        cache.put('annotation', pid, fingerprint, (annotation_exceptions, all_annotation_table))
+        cache.save()
+    return annotation_exceptions, all_annotation_table
+
+
+def __graph_annotation(pid, annotation_exceptions, all_annotation_table):
+    from bokeh import layouts
+    from bokeh.models import ColumnDataSource, DatetimeTickFormatter
+    from bokeh.models.widgets import Panel, Tabs
+    from bokeh.plotting import figure
+    ## this is a fix for bokeh bug:
+    fig1 = figure()
+    fig1.circle([0],[0])
+    tab_invsible = Panel(child=fig1, title='')
+
+    histogram_list = []
+    episode_table_list = []
+
+    # create graphs by day
+    histogram_graph_list = []
+    episode_graph_list = []
+
+    for annotator, annotation_table in all_annotation_table.items():
         group_by_activity = annotation_table.iloc[:,[3,-1,-2]].groupby(by='DAY')
         
         for day, data in group_by_activity:
@@ -592,16 +858,15 @@ def __parse_annotation(pid, lower_bound, upper_bound, check_episode_duration, ch
             
             # compute episodes statistics: episodes count, duration mean, duration std by day
             
-            stats_table = pd.DataFrame(columns=['Activity','Count','DurationMean','DurationStd'])
+            stats_table = ExceptionCollector.ExceptionCollector(['Activity','Count','DurationMean','DurationStd'])
             
             for activity in group_by_duration.index.values:
-                stats_table = stats_table.append(pd.Series({'Activity': activity,
-                                              'Count': data[data['LABEL_NAME'] == activity].shape[0],
-                                              'DurationMean': np.mean(data[data['LABEL_NAME'] == activity]['DURATION']),
-                                              'DurationStd': np.std(data[data['LABEL_NAME'] == activity]['DURATION'])
-                                                  }),
-                                    ignore_index=True)
-            episode_graph_list.append(Panel(child=__graph_table(stats_table), title=pid + ": day "+str(day)))
+                stats_table.append({'Activity': activity,
+                                    'Count': data[data['LABEL_NAME'] == activity].shape[0],
+                                    'DurationMean': np.mean(data[data['LABEL_NAME'] == activity]['DURATION']),
+                                    'DurationStd': np.std(data[data['LABEL_NAME'] == activity]['DURATION'])
+                                    })
+            episode_graph_list.append(Panel(child=__graph_table(stats_table.to_frame()), title=pid + ": day "+str(day)))
             
         #histogram_graph_list.append(tab_invsible)
         #episode_graph_list.append(tab_invsible)
@@ -610,111 +875,211 @@ def __parse_annotation(pid, lower_bound, upper_bound, check_episode_duration, ch
     
     table_graph = __graph_table(annotation_exceptions)
 
-    return annotation_exceptions, [table_graph, *histogram_list, *episode_table_list]
+    return [table_graph, *histogram_list, *episode_table_list]
 
 
-def __combine_annotation(all_annotation_files):
+def __combine_annotation(all_annotation_files, cache=None):
     all_annotation_table = {}
     for key, value in all_annotation_files.items():
-        all_annotation = []
+        annotation_tables = []
         for file_path in value:
-            annotation_table = pd.read_csv(file_path)
-            for index, series in annotation_table.iterrows():
-                if len(all_annotation) > 0 and all_annotation[-1].iloc[3] == series.iloc[3]:
-                    if all_annotation[-1].iloc[2] == series.iloc[1] or ((pd.to_datetime(all_annotation[-1].iloc[2]) + dt.timedelta(seconds=1)).hour == pd.to_datetime(series.iloc[1]).hour
-                                     and pd.to_datetime(series.iloc[1]).second == 0 and pd.to_datetime(series.iloc[1]).minute == 0):
-                        #print('Concatenate activity', all_annotation[-1].iloc[1:4], series.iloc[1:4])
-                        all_annotation[-1].iloc[2] = series.iloc[2]
+            with Profiler.sub_stage('read_csv'):
+                if cache is None:
+                    annotation_tables.append(pd.read_csv(file_path))
                 else:
-                    all_annotation.append(series)
+                    annotation_tables.append(cache.get_file_result('annotation_file', file_path, pd.read_csv))
 
-        all_annotation = pd.DataFrame(all_annotation)
-        
-        # split the cross-day activities to different days
-        splitted_annotation = pd.DataFrame(columns=all_annotation.columns)
-        for index, series in all_annotation.iterrows():
-            start_time = pd.to_datetime(series[1])
-            end_time = pd.to_datetime(series[2])
-            if start_time.day < end_time.day:
-                new_end = pd.to_datetime(dt.datetime(year=start_time.year, month=start_time.month, day=start_time.day,
-                                                  hour=23, minute=59,
-                                                  second=59, microsecond=999999))
-                new_start = pd.to_datetime(dt.datetime(year=end_time.year, month=end_time.month, day=end_time.day, 
-                                                    hour=0, minute=0,
-                                                    second=0, microsecond=0))
-                series1 = copy.deepcopy(series)
-                series2 = copy.deepcopy(series)
-                series1[2] = new_end
-                series2[1] = new_start
-                splitted_annotation = splitted_annotation.append(series1, ignore_index=True)
-                splitted_annotation = splitted_annotation.append(series2, ignore_index=True)
-            else:
-                splitted_annotation = splitted_annotation.append(series, ignore_index=True)
-                
-            
-        all_annotation_table[key] = splitted_annotation
+        all_annotation = pd.concat(annotation_tables, ignore_index=True)
+        with Profiler.sub_stage('parse_timestamps'):
+            all_annotation.iloc[:,1] = TimestampParser.parse_timestamps(all_annotation.iloc[:,1])
+            all_annotation.iloc[:,2] = TimestampParser.parse_timestamps(all_annotation.iloc[:,2])
+        all_annotation_table[key] = __split_by_day(__merge_episodes(all_annotation))
     
     return all_annotation_table
 
 
-def __check_episode_duration(series, episode_duration_limits, pid, annotator):
+def __merge_episodes(annotation):
     """
-    Check the episode duration by activity time
+    Merge the consecutive episodes of the same activity, when an episode starts at the stop time of
+    the previous one, or starts at the beginning of the hour following the previous one, e.g. when
+    an episode is split in two hourly files.
     """
-    
-    if series[3].lower() in episode_duration_limits:
-        duration = series[2] - series[1]
-        limits = episode_duration_limits[series[3].lower()]
+    start_time = annotation.iloc[:,1]
+    stop_time = annotation.iloc[:,2]
+    label = annotation.iloc[:,3]
+    previous_stop = stop_time.shift()
+    at_next_hour = (((previous_stop + pd.Timedelta(seconds=1)).dt.floor('H') == start_time.dt.floor('H'))
+                    & (start_time.dt.minute == 0) & (start_time.dt.second == 0))
+    continued = ((label == label.shift()) & ((previous_stop == start_time) | at_next_hour)).values
+
+    # every episode not continuing the previous one starts a new group, a group ends before the next one starts
+    first_rows = np.flatnonzero(~continued)
+    last_rows = np.append(first_rows[1:] - 1, len(continued) - 1)
+    merged = annotation.iloc[first_rows].reset_index(drop=True)
+    merged.iloc[:,2] = stop_time.values[last_rows]
+    return merged
+
+
+def __split_by_day(annotation):
+    """
+    Split the episodes spanning several days into one episode per day, the episode of a day stops at 23:59:59.999999
+    and the episode of the next day starts at 00:00:00
+    """
+    start_time = annotation.iloc[:,1]
+    stop_time = annotation.iloc[:,2]
+    start_day = start_time.dt.normalize()
+    days = (stop_time.dt.normalize() - start_day).dt.days.fillna(0).clip(lower=0).astype(np.int64).values
+
+    rows = np.repeat(np.arange(annotation.shape[0]), days + 1)
+    # the day of each episode since the start day, and if it is the last day of the episode
+    day_number = np.arange(len(rows)) - np.repeat(np.cumsum(days + 1) - (days + 1), days + 1)
+    is_last_day = day_number == days[rows]
+    day_begin = start_day.values[rows] + day_number * np.timedelta64(1, 'D')
+
+    splitted_annotation = annotation.iloc[rows].reset_index(drop=True)
+    splitted_annotation.iloc[:,1] = np.where(day_number == 0, start_time.values[rows], day_begin)
+    splitted_annotation.iloc[:,2] = np.where(is_last_day, stop_time.values[rows],
+                                             day_begin + np.timedelta64(1, 'D') - np.timedelta64(1, 'us'))
+    return splitted_annotation
+
+
+def __check_annotation_table(annotation_table, lower_bound, upper_bound, episode_duration_limits, episode_time_limits, pid, annotator):
+    """
+    Check the durations and times of all the episodes of an annotator at once, the start time
+    and stop time columns are already parsed as datetime.
+    The exceptions are in the same order as checking the episodes one by one: by episode,
+    then too short, too long, beyond or below the duration limit, in the abnormal period of time.
+    """
+    start_time = annotation_table.iloc[:,1]
+    stop_time = annotation_table.iloc[:,2]
+    label = annotation_table.iloc[:,3]
+    duration = stop_time - start_time
+
+    issue_rows = []
+    issue_orders = []
+    issues = []
+
+    def add_issues(rows, order, format_issues):
+        issue_rows.append(rows)
+        issue_orders.append(np.full(len(rows), order))
+        issues.extend(format_issues(rows))
+
+    add_issues(np.flatnonzero((duration < lower_bound).values), 0,
+               lambda rows: ['Too short, duration: {}'.format(x) for x in duration.iloc[rows]])
+    add_issues(np.flatnonzero((duration > upper_bound).values), 1,
+               lambda rows: ['Too long, duration: {}'.format(x) for x in duration.iloc[rows]])
+    for rows, issue in __check_episode_duration(duration, label, episode_duration_limits):
+        add_issues(rows, 2, issue)
+    for rows, issue in __check_episode_time(start_time, stop_time, label, episode_time_limits):
+        add_issues(rows, 3, issue)
+
+    rows = np.concatenate(issue_rows)
+    order = np.lexsort((np.concatenate(issue_orders), rows))
+    rows = rows[order]
+    # the times are written in annotation_exceptions.csv in mHealth format, with milliseconds
+    return pd.DataFrame({'PID': pid,
+                         'ANNOTATOR': annotator,
+                         'START_TIME': TimestampParser.format_timestamps(start_time.values[rows]),
+                         'STOP_TIME': TimestampParser.format_timestamps(stop_time.values[rows]),
+                         'LABEL_NAME': label.values[rows],
+                         'ISSUE': np.array(issues, dtype=object)[order]},
+                        columns=['PID','ANNOTATOR','START_TIME','STOP_TIME','LABEL_NAME','ISSUE'])
+
+
+def __parse_episode_duration_limits(episode_duration_limits):
+    """
+    Parse the episode duration limits of the configuration, e.g. {sleep: ['>10m', '<2m']}
+
+    Returns:
+        dict of activity: list of (True if it is an upper limit, pd.Timedelta of the limit)
+    """
+    parsed_limits = dict()
+    if episode_duration_limits is None:
+        return parsed_limits
+    for activity, limits in episode_duration_limits.items():
         if not isinstance(limits, list):
             limits = [limits]
-            
+        parsed_limits[activity] = []
         for time_limit in limits:
             if '>' in time_limit:
-                time_token = pd.Timedelta(re.findall('>(.*)', time_limit)[0])
-                if duration > time_token:
-                    return pd.Series({'PID':pid,
-                                      'ANNOTATOR': annotator,
-                                      'START_TIME':series[1],
-                                      'STOP_TIME': series[2],
-                                      'LABEL_NAME': series[3],
-                                      'ISSUE': 'Activity {} beyond specified limit {}, duration: {}'.format(
-                                              series[3], __format_time_delta(time_token), duration)})
+                parsed_limits[activity].append((True, pd.Timedelta(re.findall('>(.*)', time_limit)[0])))
             elif '<' in time_limit:
-                time_token = pd.Timedelta(re.findall('<(.*)', time_limit)[0])
-                if duration < time_token:
-                    return pd.Series({'PID':pid,
-                                      'ANNOTATOR': annotator,
-                                      'START_TIME':series[1],
-                                      'STOP_TIME': series[2],
-                                      'LABEL_NAME': series[3],
-                                      'ISSUE': 'Activity {} below specified limit {}, duration: {}'.format(
-                                              series[3], __format_time_delta(time_token), duration)})    
-    return None
+                parsed_limits[activity].append((False, pd.Timedelta(re.findall('<(.*)', time_limit)[0])))
+    return parsed_limits
+
+
+def __check_episode_duration(duration, label, episode_duration_limits):
+    """
+    Check the episode duration by activity type, only the first limit violated is reported for an episode
+
+    Returns:
+        list of (positions of the episodes, function to format the issues of the episodes at the positions)
+    """
+    found = []
+    activity = label.str.lower()
+    for activity_name, limits in episode_duration_limits.items():
+        not_reported = (activity == activity_name).values
+        for is_upper_limit, time_token in limits:
+            if is_upper_limit:
+                violated = not_reported & (duration > time_token).values
+                issue = 'Activity {} beyond specified limit {}, duration: {}'
+            else:
+                violated = not_reported & (duration < time_token).values
+                issue = 'Activity {} below specified limit {}, duration: {}'
+            not_reported = not_reported & ~violated
+            found.append((np.flatnonzero(violated),
+                          lambda rows, issue=issue, time_token=time_token: [
+                                  issue.format(x, __format_time_delta(time_token), y)
+                                  for x, y in zip(label.iloc[rows], duration.iloc[rows])]))
+    return found
 
 
 def __format_time_delta(s):
     return  '{:02}:{:02}:{:02}'.format(int(s.total_seconds()) // 3600, int(s.total_seconds()) % 3600 // 60, int(s.total_seconds()) % 60)
 
 
-def __check_episode_time(series, episode_time_limits, pid, annotator):
+def __parse_episode_time_limits(episode_time_limits):
     """
-    Check if the episode happened in specified abnormal period of time
+    Parse the abnormal periods of time of the configuration, e.g. {ambulation: [10pm, 11pm]}
+
+    Returns:
+        dict of activity: (start of the period as datetime.time, end of the period as datetime.time)
     """
-    
-    if series[3].lower() in episode_time_limits:
-        limits = episode_time_limits[series[3].lower()]
-        lower_bound = parse(limits[0]).time()
-        upper_bound = parse(limits[1]).time()
-        start_time = pd.to_datetime(series[1]).time()
-        stop_time = pd.to_datetime(series[2]).time()
-        if stop_time > lower_bound and start_time < upper_bound:
-            return pd.Series({'PID':pid,
-                              'ANNOTATOR': annotator,
-                              'START_TIME': series[1],
-                              'STOP_TIME': series[2],
-                              'LABEL_NAME': series[3],
-                              'ISSUE': 'Activity {} in specified abnormal period of time: {} to {}'.format(
-                                      series[3], lower_bound, upper_bound)})
+    from dateutil.parser import parse
+    parsed_limits = dict()
+    if episode_time_limits is None:
+        return parsed_limits
+    for activity, limits in episode_time_limits.items():
+        parsed_limits[activity] = (parse(limits[0]).time(), parse(limits[1]).time())
+    return parsed_limits
+
+
+def __check_episode_time(start_time, stop_time, label, episode_time_limits):
+    """
+    Check if the episodes happened in specified abnormal period of time
+
+    Returns:
+        list of (positions of the episodes, function to format the issues of the episodes at the positions)
+    """
+    found = []
+    if len(episode_time_limits) == 0:
+        return found
+    activity = label.str.lower()
+    # compare the time of the day
+    start_of_day = start_time - start_time.dt.normalize()
+    stop_of_day = stop_time - stop_time.dt.normalize()
+    for activity_name, (lower_bound, upper_bound) in episode_time_limits.items():
+        in_period = ((activity == activity_name) & (stop_of_day > __time_to_time_delta(lower_bound))
+                     & (start_of_day < __time_to_time_delta(upper_bound))).values
+        issue = 'Activity {} in specified abnormal period of time: {} to {}'
+        found.append((np.flatnonzero(in_period),
+                      lambda rows, lower_bound=lower_bound, upper_bound=upper_bound: [
+                              issue.format(x, lower_bound, upper_bound) for x in label.iloc[rows]]))
+    return found
+
+
+def __time_to_time_delta(time):
+    return pd.Timedelta(hours=time.hour, minutes=time.minute, seconds=time.second, microseconds=time.microsecond)
             
         
 #if __name__ == '__main__':
@@ -1,16 +1,27 @@
 import click
-import SanityCheck
 
 @click.command()
 @click.argument('root_path', type=click.Path(exists=True))
 @click.argument('config_path', type=click.Path(exists=True))
 @click.option('--totalreport', is_flag=True, default=False)
 @click.option('--pid')
-def sanity_check(root_path, config_path, totalreport, pid):
+@click.option('--workers', default=1, help='number of worker processes to check different pids in parallel')
+@click.option('--incremental', is_flag=True, default=False, help='only parse the new or modified files, reuse the cached results of the others')
+@click.option('--profile', is_flag=True, default=False, help='record the time, bytes read and memory of every stage in sanity_check_profile.csv and the reports')
+def sanity_check(root_path, config_path, totalreport, pid, workers, incremental, profile):
+    # imported here so that --help does not load pandas and bokeh
+    try:
+        from . import SanityCheck
+    except ImportError:
+        # run from the padar_extra folder instead of as a package
+        import SanityCheck
     SanityCheck.sanity_check(root_path=root_path,
                             config_path=config_path,
                             totalreport=totalreport,
-                            pid=pid)
+                            pid=pid,
+                            workers=workers,
+                            incremental=incremental,
+                            profile=profile)
 
 if __name__ == '__main__':
     sanity_check()
\ No newline at end of file
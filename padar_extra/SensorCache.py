@@ -0,0 +1,154 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+try:
+    from . import TimestampParser
+except ImportError:
+    # run from the padar_extra folder instead of as a package
+    import TimestampParser
+
+try:
+    import pyarrow
+    import pyarrow.feather as feather
+except ImportError:
+    # without pyarrow the sensor files are always parsed from the csv files
+    feather = None
+
+CACHE_SUFFIX = '.feather'
+# the columnar file does not end with .csv so it is not listed as a sensor file
+CSV_SUFFIX_PATTERN = re.compile(r'\.csv(\.gz)?$')
+
+
+def get_cache_path(file_path):
+    """
+    Return the path of the columnar file of a sensor file, next to it, e.g. x.sensor.feather for x.sensor.csv
+    """
+    return CSV_SUFFIX_PATTERN.sub('', file_path) + CACHE_SUFFIX
+
+
+def has_fresh_cache(file_path):
+    """
+    Return True if the columnar file of the sensor file exists and is not older than the sensor file
+    """
+    if feather is None:
+        return False
+    try:
+        return os.stat(get_cache_path(file_path)).st_mtime_ns >= os.stat(file_path).st_mtime_ns
+    except OSError:
+        return False
+
+
+def read_sensor_file(file_path, write_cache=True):
+    """
+    Read a sensor file in mHealth format, with the timestamps in the first column as datetime64 and
+    the numeric columns, e.g. the axes, as float32.
+    The columnar file next to the sensor file is read instead if it is not older than the sensor file.
+    Else the sensor file is parsed and, if write_cache is True, the columnar file is written so that
+    the next reads do not parse the csv file again. Without pyarrow, the csv file is always parsed.
+
+    Args:
+        file_path: path of the sensor csv file
+        write_cache: if the columnar file is written after parsing the csv file, default True
+
+    Returns:
+        pandas.DataFrame of the sensor data
+    """
+    if has_fresh_cache(file_path):
+        try:
+            return __from_columnar(feather.read_feather(get_cache_path(file_path)))
+        except Exception:
+            print('WARNING: Ignore unreadable columnar file', get_cache_path(file_path))
+
+    data = __read_csv(file_path)
+    if write_cache and feather is not None:
+        __write_cache(file_path, data)
+    return data
+
+
+def read_sensor_timestamps(file_path):
+    """
+    Return the timestamps of a sensor file as numpy int64 nanoseconds since epoch, from its columnar
+    file, None if there is no fresh columnar file. NaT are dropped.
+    """
+    if not has_fresh_cache(file_path):
+        return None
+    try:
+        table = feather.read_table(get_cache_path(file_path), columns=[0])
+    except Exception:
+        return None
+    timestamps = table.column(0).to_numpy()
+    return timestamps[timestamps != np.iinfo(np.int64).min]
+
+
+def convert_sensor_files(root_path, pids=None, overwrite=False):
+    """
+    Write the columnar file of every sensor file in [pid]/MasterSynced of the root path, the files with
+    a fresh columnar file are skipped unless overwrite is True.
+
+    Args:
+        root_path: the root path of the dataset in mHealth structure
+        pids: list of pids to convert, all the folders of the root path if None
+        overwrite: if the columnar files are written again even if they are fresh
+
+    Returns:
+        the number of columnar files written
+    """
+    if feather is None:
+        raise ImportError('pyarrow is needed to write the columnar sensor files')
+    if pids is None:
+        pids = [x for x in sorted(os.listdir(root_path)) if os.path.isdir(os.path.join(root_path, x))]
+
+    count = 0
+    for pid in pids:
+        for path, _, file_names in os.walk(os.path.join(root_path, pid, 'MasterSynced')):
+            for file_name in sorted(file_names):
+                if not re.search(r'\.sensor\.csv(\.gz)?$', file_name):
+                    continue
+                file_path = os.path.join(path, file_name)
+                if not overwrite and has_fresh_cache(file_path):
+                    continue
+                print('CONVERTING ' + file_path)
+                if __write_cache(file_path, __read_csv(file_path)):
+                    count += 1
+    return count
+
+
+def __read_csv(file_path):
+    data = pd.read_csv(file_path)
+    if data.shape[1] == 0:
+        return data
+    data[data.columns[0]] = TimestampParser.parse_timestamps(data.iloc[:, 0])
+    for column in data.columns[1:]:
+        if np.issubdtype(data[column].dtype, np.number):
+            data[column] = data[column].astype(np.float32)
+    return data
+
+
+def __write_cache(file_path, data):
+    """
+    Write the columnar file with the timestamps as int64 nanoseconds since epoch, return False if it
+    can not be written, e.g. the folder is read only
+    """
+    columnar = data.copy()
+    if columnar.shape[1] > 0:
+        columnar[columnar.columns[0]] = columnar.iloc[:, 0].values.astype('datetime64[ns]').view(np.int64)
+    cache_path = get_cache_path(file_path)
+    temp_path = cache_path + '.tmp'
+    try:
+        feather.write_feather(columnar.reset_index(drop=True), temp_path)
+        os.replace(temp_path, cache_path)
+    except (OSError, ValueError, pyarrow.ArrowException) as e:
+        print('WARNING: Can not write columnar file', cache_path, e)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+    return True
+
+
+def __from_columnar(data):
+    if data.shape[1] > 0:
+        data[data.columns[0]] = data.iloc[:, 0].values.view('datetime64[ns]')
+    return data
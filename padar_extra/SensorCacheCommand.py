@@ -0,0 +1,20 @@
+import click
+
+@click.command()
+@click.argument('root_path', type=click.Path(exists=True))
+@click.option('--pid', help='only convert the sensor files of the given pid')
+@click.option('--overwrite', is_flag=True, default=False, help='write the columnar files again even if they are up to date')
+def convert_sensor_files(root_path, pid, overwrite):
+    # imported here so that --help does not load pandas and pyarrow
+    try:
+        from . import SensorCache
+    except ImportError:
+        # run from the padar_extra folder instead of as a package
+        import SensorCache
+    count = SensorCache.convert_sensor_files(root_path=root_path,
+                                             pids=None if pid is None else [pid],
+                                             overwrite=overwrite)
+    print('{} columnar sensor files written'.format(count))
+
+if __name__ == '__main__':
+    convert_sensor_files()
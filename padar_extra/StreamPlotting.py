@@ -11,8 +11,14 @@ import dash_core_components as dcc
 import dash_html_components as html
 import pandas as pd
 from dash.dependencies import Input, Output
-import Visualizer
-import Monitor
+try:
+    from . import AnnotationIndex, Visualizer, Monitor, TimestampParser
+except ImportError:
+    # run from the padar_extra folder instead of as a package
+    import AnnotationIndex
+    import Visualizer
+    import Monitor
+    import TimestampParser
 from collections import OrderedDict
 from plotly import tools
 import datetime
@@ -83,6 +89,9 @@ def gen_acceleration_graph(count):
         if label not in annotation_colors:
             annotation_colors[label] = Visualizer.generate_color(1)[0]
     
+    range_end = TimestampParser.parse_timestamp(acc_data.iloc[acc_data.shape[0]-1,0])
+    range_start = range_end - datetime.timedelta(seconds=DISPLAY_RANGE)
+
     annotation_end = len(db.annotationdata.index)
     annotation_start = int(annotation_end - DISPLAY_RANGE/FEATURE_TIME) - 1
 
@@ -91,7 +100,11 @@ def gen_acceleration_graph(count):
     if annotation_end < 0:
         annotation_end = 0
 
+    # only the last annotations are indexed, to keep the ones overlapping the displayed range, the
+    # start and stop times are the first two columns
     annotation_data = db.annotationdata.iloc[annotation_start:annotation_end,:]
+    annotation_index = AnnotationIndex.AnnotationIndex(annotation_data, time_columns=(0, 1))
+    annotation_data = annotation_data.iloc[annotation_index.find_overlapping(range_start, range_end),:]
     annotation_fig = Visualizer.annotation_feature_grapher(annotation_data.iloc[:,[0,1,3]], colors=annotation_colors, return_fig=True)
     
     
@@ -105,8 +118,6 @@ def gen_acceleration_graph(count):
     acc_fig['layout']['yaxis2']['domain'] = [0.31,0.6]
     acc_fig['layout']['yaxis3']['domain'] = [0.61, 1]
 
-    range_end = pd.to_datetime(acc_data.iloc[acc_data.shape[0]-1,0])
-    range_start = range_end - datetime.timedelta(seconds=DISPLAY_RANGE)
     acc_fig['layout']['xaxis'].update(dict(fixedrange=True, range=[range_start,range_end]))
     acc_fig['layout']['width'] = 1200
 
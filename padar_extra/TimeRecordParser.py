@@ -1,17 +1,57 @@
 import pandas as pd
 import numpy as np
+import os
 import sys
 import re
-from datetime import timedelta
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+try:
+    from . import TimestampParser
+except ImportError:
+    # run from the padar_extra folder instead of as a package
+    import TimestampParser
 
 
-def parse(path_in, path_out, split, categorize, annotatoinset, annotator_set_id):
+RECORD_COLUMNS = ['HEADER_TIME_STAMP','START_TIME','STOP_TIME','LABEL_NAME','LABEL_ID',
+                  'RATING_TIME_STAMP','RATING_INTENSITY','RATING_CONFIDENCE']
+# in nanoseconds
+SECOND = 10**9
+HOUR = 3600 * SECOND
+NAT = np.datetime64('NaT').view(np.int64)
+# number of threads writing the hourly files
+WRITE_WORKERS = 8
+# the categories of the labels not matching any keyword, see LabelCategorizer
+CATEGORY_DECISIONS_PATH = os.path.join(os.path.expanduser('~'), '.padar_extra', 'categorize_decisions.yaml')
+# the answers of ask_category and the categories of the decisions file, None removes the label
+CATEGORY_ANSWERS = {'s': 'Sedentary', 'sedentary': 'Sedentary', 'a': 'Ambulation', 'ambulation': 'Ambulation',
+                    'o': 'Other', 'other': 'Other', 'nonwear': 'nonwear', 'r': None, 'remove': None}
+# the category of the labels unresolved when not interactive
+UNRESOLVED_CATEGORY = 'Unknown'
+# the folder of the time record logs of every pid, named [AnnotationSet].[ANNOTATORID-ANNOTATIONSETID].txt
+TIME_RECORDS_FOLDER = os.path.join('OriginalRaw', 'TimeRecords')
+TIME_RECORDS_SUFFIX = '.txt'
+
+
+def parse(path_in, path_out, split, categorize, annotatoinset, annotator_set_id, workers=WRITE_WORKERS,
+          categorizer=None):
+    """
+    Parse a time record log and write the records in mHealth format, see write_to_file. If categorize,
+    the activities are categorized by categorizer, a LabelCategorizer shared by several logs, or if
+    None by one asking the unknown activities and saving the answers in CATEGORY_DECISIONS_PATH.
+
+    Returns:
+        the number of files and of bytes written
+    """
+    own_categorizer = categorize and categorizer is None
+    if own_categorizer:
+        categorizer = LabelCategorizer(interactive=True)
+    # the (start time, label) of the activities started and not stopped yet
     recordlist = []
-    parsed_data = pd.DataFrame(columns=['HEADER_TIME_STAMP','START_TIME',
-                                        'STOP_TIME','LABEL_NAME','LABEL_ID',
-                                        'RATING_TIME_STAMP','RATING_INTENSITY',
-                                        'RATING_CONFIDENCE'])
-    parsed_recordlist = []
+    # the columns of the stopped activities
+    start_times = []
+    stop_times = []
+    labels = []
     with open(path_in,'r') as file_in:
         for line in file_in:
             line = line.strip()
@@ -24,38 +64,119 @@ def parse(path_in, path_out, split, categorize, annotatoinset, annotator_set_id)
                 activities = tokens[1].split(',')
                 activities = standardize_label(activities)
                 if categorize:
-                    activities = categorize_label(activities)
+                    activities = categorizer.categorize(activities)
                 # if there is already activities in the list, add end time and add them to dataframe
-                if len(recordlist)!=0:
-                    while len(recordlist)>0:
-                        record = recordlist.pop()
-                        record['STOP_TIME'] = time
-                        parsed_recordlist.append(record)
+                __stop_records(recordlist, time, start_times, stop_times, labels)
                 for activity in activities:
-                    recordlist.append(pd.Series([time, time, activity.strip(), np.nan],
-                                      index=['HEADER_TIME_STAMP','START_TIME','LABEL_NAME','STOP_TIME']))
+                    recordlist.append((time, activity.strip()))
             elif action.startswith('e'):
-                while len(recordlist)>0:
-                    record = recordlist.pop()
-                    record['STOP_TIME'] = time
-                    parsed_recordlist.append(record)
+                __stop_records(recordlist, time, start_times, stop_times, labels)
             else:
                 print('Incorrect Record: '+ line)
+    if own_categorizer:
+        categorizer.save()
 
+    parsed_data = pd.DataFrame({'HEADER_TIME_STAMP': start_times, 'START_TIME': start_times,
+                                'STOP_TIME': stop_times, 'LABEL_NAME': labels}, columns=RECORD_COLUMNS)
+    hours = None
     if split:
-        parsed_recordlist = split_by_hour(parsed_recordlist)
+        parsed_data = split_by_hour(parsed_data)
+        hours = parsed_data['STOP_TIME'].values.astype('datetime64[h]')
+
+    parsed_data['HEADER_TIME_STAMP'] = TimestampParser.format_timestamps(parsed_data['HEADER_TIME_STAMP'])
+    parsed_data['START_TIME'] = TimestampParser.format_timestamps(parsed_data['START_TIME'])
+    parsed_data['STOP_TIME'] = TimestampParser.format_timestamps(parsed_data['STOP_TIME'])
+
+    return write_to_file(parsed_data, split, path_out, annotatoinset, annotator_set_id, hours, workers)
+
+
+def find_time_record_files(root_path):
+    """
+    Return the time record logs of every pid of a study, in [root_path]/[pid]/OriginalRaw/TimeRecords,
+    named [AnnotationSet].[ANNOTATORID-ANNOTATIONSETID].txt, the other files are skipped
+
+    Returns:
+        list of (file path, pid, annotation set, annotator set id)
+    """
+    jobs = []
+    for pid in sorted(os.listdir(root_path)):
+        folder = os.path.join(root_path, pid, TIME_RECORDS_FOLDER)
+        if not os.path.isdir(folder):
+            continue
+        for file_name in sorted(os.listdir(folder)):
+            if not file_name.endswith(TIME_RECORDS_SUFFIX):
+                continue
+            tokens = file_name[:-len(TIME_RECORDS_SUFFIX)].split('.')
+            if len(tokens) != 2:
+                print('WARNING: Skip time record file not named [AnnotationSet].[ANNOTATORID-ANNOTATIONSETID].txt',
+                      os.path.join(folder, file_name))
+                continue
+            jobs.append((os.path.join(folder, file_name), pid, tokens[0], tokens[1]))
+    return jobs
+
+
+def parse_files(root_path, jobs, workers=1, categorize=False, decisions_path=CATEGORY_DECISIONS_PATH,
+                write_workers=WRITE_WORKERS):
+    """
+    Parse the time record logs of a study split by hour, and write the annotation files in the
+    MasterSynced folder of their pid. The logs are parsed in a pool of worker processes if workers is
+    greater than 1, a log which can not be parsed, e.g. with a malformed record, is reported and
+    skipped. If categorize, the activities are categorized from the decisions file, without asking,
+    and the unresolved activities of all the logs are reported at the end.
+
+    Args:
+        root_path: the root folder of the study
+        jobs: the logs, e.g. from find_time_record_files
+        workers: the number of worker processes
+        categorize: if the activities are categorized, see LabelCategorizer
+        decisions_path: the decisions file of the categories
+        write_workers: the number of threads writing the hourly files of a log
+
+    Returns:
+        the number of files and of bytes written, and the list of the logs which could not be parsed
+    """
+    arguments = [(file_path, os.path.join(root_path, pid), annotation_set, annotator_set_id, categorize,
+                  decisions_path, write_workers) for file_path, pid, annotation_set, annotator_set_id in jobs]
+    if workers is None or workers <= 1 or len(arguments) <= 1:
+        results = [__parse_file(x) for x in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(arguments))) as executor:
+            results = list(executor.map(__parse_file, arguments))
+
+    failed = [job[0] for job, result in zip(jobs, results) if result is None]
+    results = [x for x in results if x is not None]
+    if categorize:
+        categorizer = LabelCategorizer(decisions_path)
+        for _, _, unresolved in results:
+            categorizer.unresolved.update(unresolved)
+        categorizer.report()
+    return sum(x[0] for x in results), sum(x[1] for x in results), failed
+
 
-    parsed_data = pd.DataFrame(parsed_recordlist)
-    parsed_data = parsed_data.reindex(columns = ['HEADER_TIME_STAMP','START_TIME',
-                                        'STOP_TIME','LABEL_NAME','LABEL_ID',
-                                        'RATING_TIME_STAMP','RATING_INTENSITY',
-                                        'RATING_CONFIDENCE'])
-                                        
-    parsed_data['HEADER_TIME_STAMP'] = pd.to_datetime(parsed_data['HEADER_TIME_STAMP']).apply(lambda x: x.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3])
-    parsed_data['START_TIME'] = pd.to_datetime(parsed_data['START_TIME']).apply(lambda x: x.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3])
-    parsed_data['STOP_TIME'] = pd.to_datetime(parsed_data['STOP_TIME']).apply(lambda x: x.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3])
+def __parse_file(arguments):
+    """
+    Parse a time record log, return the number of files and of bytes written and the counts of the
+    unresolved activities, or None if it can not be parsed
+    """
+    file_path, path_out, annotation_set, annotator_set_id, categorize, decisions_path, write_workers = arguments
+    print('PARSING ' + file_path)
+    try:
+        categorizer = LabelCategorizer(decisions_path, interactive=False) if categorize else None
+        files, size = parse(file_path, path_out, True, categorize, annotation_set, annotator_set_id,
+                            write_workers, categorizer)
+    except Exception as e:
+        print('WARNING: Can not parse', file_path, e)
+        return None
+    return files, size, categorizer.unresolved if categorizer is not None else Counter()
 
-    write_to_file(parsed_data, split, path_out, annotatoinset, annotator_set_id)
+
+def __stop_records(recordlist, time, start_times, stop_times, labels):
+    # the activities are stopped in the reverse order they were started
+    while len(recordlist)>0:
+        start_time, label = recordlist.pop()
+        start_times.append(start_time)
+        stop_times.append(time)
+        labels.append(label)
 
 def standardize_label(activities):
     standardized_activities = []
@@ -95,116 +216,300 @@ def standardize_label(activities):
 def categorize_label(activities):
     categorized_activities = []
     for activity in activities:
-        if 'shop' in activity:
-            categorized_activities.append('Other')
-            continue
-        if 'walk' in activity:
-            categorized_activities.append('Ambulation')
-            continue
-        elif 'sit' in activity or re.findall('us.*computer',activity):
-            categorized_activities.append('Sedentary')
-            continue
-        elif 'typ' in activity:
-            categorized_activities.append('Sedentary')
-            continue
-        elif 'run' in activity:
-            categorized_activities.append('Ambulation')
-            continue
-        elif re.findall('in\s*door',activity):
-            continue
-        elif re.findall('out',activity):
-            continue
-        elif 'pack' in activity:
-            categorized_activities.append('Other')
-            continue
-        elif 'stand' in activity:
-            categorized_activities.append('Sedentary')
-            continue
-        elif 'lay' in activity or  'ly' in activity:
-            categorized_activities.append('Sedentary')
-            continue
-        elif 'stair' in activity:
-            categorized_activities.append('Ambulation')
-            continue
-        elif re.findall('tak.*off', activity):
-            categorized_activities.append('nonwear')
-            continue
-        else:
-            while True:
-                user_input = input('Categorize '+activity+': [S]edentary, [A]mbulation, [O]ther, [R]emove: ').lower()
-                if user_input == 's' or user_input == 'sedentary':
-                    categorized_activities.append('Sedentary')
-                    break
-                elif user_input == 'o' or user_input == 'other':
-                    categorized_activities.append('Other')
-                    break
-                elif user_input == 'a' or user_input == 'ambulation':
-                    categorized_activities.append('Ambulation')
-                    break
-                elif user_input == 'r' or user_input == 'remove':
-                    break
-                else:
-                    print('Wrong input')
+        try:
+            category = match_keywords(activity)
+        except KeyError:
+            category = ask_category(activity)
+        if category is not None:
+            categorized_activities.append(category)
     return categorized_activities
 
-def split_by_hour(parsed_recordlist):
-    new_recordlist = []
-    for record in parsed_recordlist:
-        start_time = pd.to_datetime(record['START_TIME'])
-        stop_time = pd.to_datetime(record['STOP_TIME'])
-        if start_time.hour != stop_time.hour:
-            split_time_start = record['START_TIME'][:14]+'59:59'
-            new_record_1 = pd.Series([record['START_TIME'], record['START_TIME'], record['LABEL_NAME'], split_time_start],
-                                      index=['HEADER_TIME_STAMP','START_TIME','LABEL_NAME','STOP_TIME'])
-
-            one_hour = timedelta(hours=1)
-            split_time_stop = pd.to_datetime(split_time_start)
-            new_recordlist.append(new_record_1)
-            # if the activity is longer than 1 hour, creates multiple lines fills the gap
-            while split_time_stop < stop_time - one_hour:
-                new_recordlist.append(pd.Series([split_time_stop, split_time_stop, record['LABEL_NAME'], split_time_stop + one_hour],
-                                      index=['HEADER_TIME_STAMP','START_TIME','LABEL_NAME','STOP_TIME']))
-                split_time_stop = split_time_stop + one_hour
-
-            new_record_2 = pd.Series([split_time_stop, split_time_stop, record['LABEL_NAME'], record['STOP_TIME']],
-                                      index=['HEADER_TIME_STAMP','START_TIME','LABEL_NAME','STOP_TIME'])
-            new_recordlist.append(new_record_2)
+def match_keywords(activity):
+    """
+    Return the category of an activity from its keywords, None if the activity is removed, e.g.
+    indoor, raise KeyError if no keyword matches
+    """
+    if 'shop' in activity:
+        return 'Other'
+    if 'walk' in activity:
+        return 'Ambulation'
+    elif 'sit' in activity or re.findall('us.*computer',activity):
+        return 'Sedentary'
+    elif 'typ' in activity:
+        return 'Sedentary'
+    elif 'run' in activity:
+        return 'Ambulation'
+    elif re.findall('in\s*door',activity):
+        return None
+    elif re.findall('out',activity):
+        return None
+    elif 'pack' in activity:
+        return 'Other'
+    elif 'stand' in activity:
+        return 'Sedentary'
+    elif 'lay' in activity or  'ly' in activity:
+        return 'Sedentary'
+    elif 'stair' in activity:
+        return 'Ambulation'
+    elif re.findall('tak.*off', activity):
+        return 'nonwear'
+    raise KeyError(activity)
 
+def ask_category(activity):
+    """
+    Ask the category of an activity on the console, return None if it is removed
+    """
+    while True:
+        user_input = input('Categorize '+activity+': [S]edentary, [A]mbulation, [O]ther, [R]emove: ').lower()
+        if user_input in CATEGORY_ANSWERS and user_input != 'nonwear':
+            return CATEGORY_ANSWERS[user_input]
         else:
-            new_recordlist.append(record)
-    return new_recordlist
+            print('Wrong input')
 
-def write_to_file(parsed_data, split, path_out, annotatoinset, annotator_set_id):
+def load_decisions(decisions_path):
+    """
+    Load the categories of the labels in a decisions file, a YAML mapping of labels to Sedentary,
+    Ambulation, Other, nonwear or Remove, an empty dict if the file does not exist
+
+    Returns:
+        dict of the labels and their categories, None for the removed labels
+    """
+    if not os.path.exists(decisions_path):
+        return dict()
+    import yaml
+    with open(decisions_path, 'r', encoding='utf-8') as f:
+        decisions = yaml.safe_load(f) or dict()
+    categories = dict()
+    for label, decision in decisions.items():
+        if str(decision).lower() not in CATEGORY_ANSWERS:
+            raise ValueError('Invalid category of ' + str(label) + ' in ' + decisions_path + ': ' + str(decision))
+        categories[str(label)] = CATEGORY_ANSWERS[str(decision).lower()]
+    return categories
+
+def save_decisions(decisions, decisions_path):
+    import yaml
+    decisions = dict([(label, category if category is not None else 'Remove')
+                      for label, category in sorted(decisions.items())])
+    os.makedirs(os.path.dirname(os.path.abspath(decisions_path)), exist_ok=True)
+    temp_path = decisions_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(decisions, f, default_flow_style=False, allow_unicode=True)
+    os.replace(temp_path, decisions_path)
+
+
+class LabelCategorizer(object):
+    """
+    Categorize the activities like categorize_label, once per unique activity with a lookup table.
+    The activities matching no keyword are categorized from a decisions file, see load_decisions,
+    shared by all the logs. The ones still unknown are asked if interactive, the answers are added
+    to the decisions file by save, else they are categorized as UNRESOLVED_CATEGORY and counted in
+    unresolved, see report.
+
+    Args:
+        decisions_path: the decisions file, no file if None
+        interactive: if the unknown activities are asked on the console
+    """
+
+    def __init__(self, decisions_path=CATEGORY_DECISIONS_PATH, interactive=False):
+        self.decisions_path = decisions_path
+        self.interactive = interactive
+        self.decisions = load_decisions(decisions_path) if decisions_path is not None else dict()
+        self.changed = False
+        self.lookup = dict()
+        self.unresolved = Counter()
+
+
+    def categorize(self, activities):
+        categorized_activities = []
+        for activity in activities:
+            if activity not in self.lookup:
+                self.lookup[activity] = self.__resolve(activity)
+            category = self.lookup[activity]
+            if category == UNRESOLVED_CATEGORY:
+                self.unresolved[activity] += 1
+            if category is not None:
+                categorized_activities.append(category)
+        return categorized_activities
+
+
+    def __resolve(self, activity):
+        try:
+            return match_keywords(activity)
+        except KeyError:
+            pass
+        if activity in self.decisions:
+            return self.decisions[activity]
+        if not self.interactive:
+            return UNRESOLVED_CATEGORY
+        self.decisions[activity] = ask_category(activity)
+        self.changed = True
+        return self.decisions[activity]
+
+
+    def save(self):
+        """
+        Write the decisions file if categories were asked
+        """
+        if self.changed and self.decisions_path is not None:
+            save_decisions(self.decisions, self.decisions_path)
+            self.changed = False
+
+
+    def report(self):
+        """
+        Print the unresolved activities and their number of records, return the number of activities
+        """
+        for activity, count in sorted(self.unresolved.items()):
+            print('UNRESOLVED ' + activity + ': ' + str(count) + ' records')
+        if len(self.unresolved) > 0:
+            print(str(len(self.unresolved)) + ' activities categorized as ' + UNRESOLVED_CATEGORY +
+                  (', add their categories in ' + self.decisions_path if self.decisions_path is not None else ''))
+        return len(self.unresolved)
+
+def split_by_hour(parsed_data):
+    """
+    Split the records crossing hours, so every record stops in the hour it starts, vectorized.
+    A record is split at the last second of every hour it crosses, HH:59:59, the first part stops
+    there and the next parts start there, so a record of several days is split in one pass.
+
+    Args:
+        parsed_data: DataFrame with the START_TIME, STOP_TIME and LABEL_NAME of the records
+
+    Returns:
+        DataFrame with the columns of RECORD_COLUMNS, the times as datetime64
+    """
+    start_times = np.asarray(TimestampParser.parse_timestamps(parsed_data['START_TIME'])).view(np.int64)
+    stop_times = np.asarray(TimestampParser.parse_timestamps(parsed_data['STOP_TIME'])).view(np.int64)
+    labels = np.asarray(parsed_data['LABEL_NAME'], dtype=object)
+
+    valid = (start_times != NAT) & (stop_times != NAT)
+    split = valid & (start_times // HOUR != stop_times // HOUR)
+    # the last second of the start hour, where the first part stops
+    first_split_times = start_times // HOUR * HOUR + HOUR - SECOND
+    # the number of whole hours between the first part and the last part
+    middle_counts = np.maximum(0, -((first_split_times + HOUR - stop_times) // HOUR))
+    counts = np.where(split, middle_counts + 2, 1)
+
+    rows = np.repeat(np.arange(len(counts)), counts)
+    parts = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    split_times = first_split_times[rows] + parts * HOUR
+    new_start_times = np.where(parts == 0, start_times[rows], split_times - HOUR)
+    new_stop_times = np.where(parts == counts[rows] - 1, stop_times[rows], split_times)
+
+    return pd.DataFrame({'HEADER_TIME_STAMP': new_start_times.view('datetime64[ns]'),
+                         'START_TIME': new_start_times.view('datetime64[ns]'),
+                         'STOP_TIME': new_stop_times.view('datetime64[ns]'),
+                         'LABEL_NAME': labels[rows]}, columns=RECORD_COLUMNS)
+
+def write_to_file(parsed_data, split, path_out, annotatoinset, annotator_set_id, hours=None, workers=WRITE_WORKERS):
+    """
+    Write the records in total.annotation.csv, or if split in a file per hour of their STOP_TIME in
+    MasterSynced/YYYY/MM/DD/HH, named after the HEADER_TIME_STAMP of the first record of the hour.
+    The hours, datetime64[h] of the STOP_TIME, are computed if None. The missing hourly folders are
+    created and the hourly files are written by a pool of threads. Every file is written in a
+    temporary file renamed when complete, so the readers never see a partial file.
+
+    Returns:
+        the number of files and of bytes written
+    """
     if not split:
-        parsed_data.to_csv(path_out+'total.annotation.csv', index=False)
+        return 1, __write_file(parsed_data.to_csv(index=False), path_out+'total.annotation.csv')
+
+    if hours is None:
+        hours = np.asarray(TimestampParser.parse_timestamps(parsed_data['STOP_TIME'])).astype('datetime64[h]')
+    hours = np.asarray(hours, dtype='datetime64[h]')
+    order = np.argsort(hours, kind='mergesort')
+    order = order[~np.isnat(hours[order])]
+    hours = hours[order]
+    if len(order) == 0:
+        return 0, 0
+    bounds = np.append(np.flatnonzero(np.concatenate(([True], hours[1:] != hours[:-1]))), len(order))
+
+    # the rows are formatted at once and the lines of every hour sliced, unless a value spans lines
+    sorted_data = parsed_data.iloc[order]
+    lines = sorted_data.to_csv(index=False).split(os.linesep)
+    # the files are named after the HEADER_TIME_STAMP of their first record, as YYYY-MM-DD-HH-MM-SS-fff
+    start_times = TimestampParser.format_timestamps(sorted_data.iloc[bounds[:-1], 0].values)
+    texts = []
+    file_paths = []
+    for begin, end, start_time in zip(bounds[:-1], bounds[1:], start_times):
+        if len(lines) == len(order) + 2:
+            texts.append(os.linesep.join([lines[0]] + lines[begin + 1:end + 1] + ['']))
+        else:
+            texts.append(sorted_data.iloc[begin:end].to_csv(index=False))
+        time_elements = str(hours[begin]).replace('T', '-').split('-') #'%Y-%m-%d-%H'
+        file_paths.append('/'.join([path_out,'MasterSynced',str(time_elements[0]),
+                          str(time_elements[1]),
+                          str(time_elements[2]), str(time_elements[3]), '.'.join([annotatoinset, annotator_set_id,
+                          re.sub('[ :.]', '-', start_time)+'-P0000', 'annotation.csv'])]))
+
+    if workers > 1 and len(texts) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            sizes = list(executor.map(__write_file, texts, file_paths))
     else:
-        parsed_data['key'] = pd.to_datetime(parsed_data['STOP_TIME']).dt.strftime('%Y-%m-%d-%H')
-        temp_data = parsed_data.groupby('key')
-        for key, data in temp_data:
-            start_time = pd.to_datetime(data.iloc[0,0])
-            time_elements = key.split('-') #'%Y-%m-%d-%H'
-            data.drop('key', axis = 1).to_csv('/'.join([path_out,'MasterSynced',str(time_elements[0]),
-                        str(time_elements[1]),
-                        str(time_elements[2]), str(time_elements[3]), '.'.join([annotatoinset, annotator_set_id,start_time.strftime('%Y-%m-%d-%H-%M-%S-%f')[:-3]+'-P0000',
-                        'annotation.csv'])]), index=False)
+        sizes = [__write_file(text, file_path) for text, file_path in zip(texts, file_paths)]
+    return len(sizes), sum(sizes)
+
+
+def __write_file(text, file_path):
+    # the temporary file is hidden and its name has no dot before .tmp, so it matches none of the
+    # patterns of DatasetIndex.FILE_PATTERNS, e.g. .annotation.csv, while it is written
+    folder = os.path.dirname(file_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    temp_path = os.path.join(folder, '.' + os.path.basename(file_path).replace('.', '_') + '.tmp')
+    try:
+        with open(temp_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return os.path.getsize(file_path)
 
 
 if __name__ == '__main__':
-    if (len(sys.argv) < 6):
+    if len(sys.argv) >= 3 and sys.argv[1].lower() in ('batch', 'categorize_batch'):
+        workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+        start = time.perf_counter()
+        jobs = find_time_record_files(sys.argv[2])
+        files, size, failed = parse_files(sys.argv[2], jobs, workers, sys.argv[1].lower() == 'categorize_batch')
+        seconds = time.perf_counter() - start
+        print('Parsed {} logs in {:.1f} s, {:.1f} logs/s, wrote {} files, {:.1f} MB/s, {} failed'.format(
+            len(jobs), seconds, len(jobs) / seconds if seconds > 0 else 0, files,
+            size / seconds / 1e6 if seconds > 0 else 0, len(failed)))
+        for file_path in failed:
+            print('FAILED ' + file_path)
+    elif len(sys.argv) < 6:
         print('INSTRUCTION: \n'
-              + 'for simple parse: STANDARD/CATEGORIZE [Original File Path] [Formatted Annotation File Path] [AnnotationSet] [ANNOTATORID-ANNOTATIONSETID]\n'
-              + 'split by hour: STANDARD/CATEGORIZE  [Original File Path] [Formatted Annotation File Path] [AnnotationSet] [ANNOTATORID-ANNOTATIONSETID] split\n'
+              + 'for simple parse: STANDARD/CATEGORIZE/CATEGORIZE_NONINTERACTIVE [Original File Path] [Formatted Annotation File Path] [AnnotationSet] [ANNOTATORID-ANNOTATIONSETID]\n'
+              + 'split by hour: STANDARD/CATEGORIZE/CATEGORIZE_NONINTERACTIVE  [Original File Path] [Formatted Annotation File Path] [AnnotationSet] [ANNOTATORID-ANNOTATIONSETID] split [Number of Writing Threads]\n'
               + 'Standard for parse without categorize labels \n'
+              + 'Categorize asks the categories of the unknown labels and saves them in ' + CATEGORY_DECISIONS_PATH + '\n'
+              + 'Categorize_noninteractive reads them from this file and reports the unresolved labels \n'
+              + 'for all the time record logs of a study, split by hour, in [pid]/OriginalRaw/TimeRecords/[AnnotationSet].[ANNOTATORID-ANNOTATIONSETID].txt:\n'
+              + 'BATCH/CATEGORIZE_BATCH [Study Root Path] [Number of Workers]\n'
+              + 'Categorize_batch categorizes the labels from the decisions file without asking \n'
               + 'This tool automatically add annotation.csv at the end \n'
               + 'For more information, see README.MD')
     else:
+        categorizer = None
         if sys.argv[1].lower() == 'standard':
             categorize = False
         elif sys.argv[1].lower() == 'categorize':
             categorize = True
+        elif sys.argv[1].lower() == 'categorize_noninteractive':
+            categorize = True
+            categorizer = LabelCategorizer(interactive=False)
         else:
             raise ValueError('WRONG COMMAND')
-        if len(sys.argv) == 7 and sys.argv[6] == 'split':
-            parse(sys.argv[2],sys.argv[3], True, categorize, sys.argv[4], sys.argv[5])
-        else:
-            parse(sys.argv[2],sys.argv[3], False, categorize, sys.argv[4], sys.argv[5])
+        split = len(sys.argv) >= 7 and sys.argv[6] == 'split'
+        workers = int(sys.argv[7]) if split and len(sys.argv) > 7 else WRITE_WORKERS
+        start = time.perf_counter()
+        files, size = parse(sys.argv[2],sys.argv[3], split, categorize, sys.argv[4], sys.argv[5], workers, categorizer)
+        seconds = time.perf_counter() - start
+        print('Wrote {} files, {} bytes in {:.1f} s, {:.1f} MB/s'.format(
+            files, size, seconds, size / seconds / 1e6 if seconds > 0 else 0))
+        if categorizer is not None:
+            categorizer.report()
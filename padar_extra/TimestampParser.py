@@ -0,0 +1,197 @@
+import datetime as dt
+import functools
+
+import numpy as np
+import pandas as pd
+
+MHEALTH_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+# number of distinct strings whose parsed timestamp is kept by parse_timestamp
+SCALAR_CACHE_SIZE = 65536
+
+# offsets in 'YYYY-MM-DD HH:MM:SS.fff' of the digits and separators of the minute prefix 'YYYY-MM-DD HH:MM'
+MINUTE_DIGITS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15]
+MINUTE_SEPARATORS = [(4, '-'), (7, '-'), (10, ' '), (13, ':')]
+MINUTE_LENGTH = 16
+DATE_TIME_LENGTH = 19
+MONTH_LENGTHS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def parse_timestamps(values):
+    """
+    Parse a column of timestamps in mHealth format 'YYYY-MM-DD HH:MM:SS.fff', vectorized.
+    The digits are read at their fixed offsets into int64 nanoseconds; if some values are not
+    strings in this format, e.g. NaN or another format, pandas parses them, with the explicit
+    format first and inferring the format last.
+
+    Args:
+        values: pandas Series, Index, list or numpy array of strings, or of timestamps
+
+    Returns:
+        pandas Series of datetime64 with the same index if values is a Series, else a DatetimeIndex
+    """
+    try:
+        nanoseconds = __parse_fixed_format(values)
+    except ValueError:
+        try:
+            return pd.to_datetime(values, format=MHEALTH_TIMESTAMP_FORMAT)
+        except (ValueError, TypeError):
+            return pd.to_datetime(values)
+
+    timestamps = nanoseconds.view('datetime64[ns]')
+    if isinstance(values, pd.Series):
+        return pd.Series(timestamps, index=values.index, name=values.name)
+    return pd.DatetimeIndex(timestamps, name=getattr(values, 'name', None))
+
+
+def parse_timestamp(value):
+    """
+    Parse a single timestamp, e.g. in mHealth format, as a pandas Timestamp. The strings already
+    parsed are cached, so parsing the same strings again, e.g. in a loop, is cheap.
+    """
+    if isinstance(value, str):
+        return __parse_timestamp_string(value)
+    return pd.Timestamp(value)
+
+
+def format_timestamps(values):
+    """
+    Format timestamps in mHealth format 'YYYY-MM-DD HH:MM:SS.fff', vectorized, the same strings as
+    strftime(MHEALTH_TIMESTAMP_FORMAT)[:-3] of every timestamp.
+
+    Args:
+        values: pandas Series, Index or numpy array of datetime64, or values accepted by parse_timestamps
+
+    Returns:
+        numpy array of the strings, None for NaT
+    """
+    timestamps = np.asarray(values)
+    if timestamps.dtype.kind != 'M':
+        timestamps = np.asarray(parse_timestamps(values))
+    timestamps = timestamps.astype('datetime64[ms]')
+    missing = np.isnat(timestamps)
+    strings = np.datetime_as_string(timestamps, unit='ms')
+    if strings.dtype.itemsize == 4 * len('YYYY-MM-DDTHH:MM:SS.fff') and strings.shape[0] > 0:
+        # replace the 'T' between the date and the time, in place in the fixed width characters
+        characters = strings.view(np.uint32).reshape(strings.shape[0], -1)
+        characters[~missing, 10] = ord(' ')
+        strings = strings.astype(object)
+    else:
+        # e.g. years after 9999 or only NaT
+        strings = np.array([x.replace('T', ' ', 1) for x in strings], dtype=object)
+    strings[missing] = None
+    return strings
+
+
+@functools.lru_cache(maxsize=SCALAR_CACHE_SIZE)
+def __parse_timestamp_string(value):
+    try:
+        return pd.Timestamp(dt.datetime.strptime(value, MHEALTH_TIMESTAMP_FORMAT))
+    except ValueError:
+        return pd.Timestamp(value)
+
+
+def days_from_civil(year, month, day):
+    """
+    Return the days since 1970-01-01 of the proleptic gregorian dates, works on numpy arrays
+    """
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def parse_minute_prefixes(prefixes):
+    """
+    Return the minutes since epoch of the 'YYYY-MM-DD HH:MM' prefixes of timestamps in mHealth format.
+
+    Args:
+        prefixes: numpy uint8 array of shape (n, 16) of the bytes of the prefixes
+
+    Raises:
+        ValueError: if a prefix is not in the format, the values of the fields are not checked
+    """
+    year, month, day, hour, minute = __decode_minute_prefixes(prefixes)
+    return (days_from_civil(year, month, day) * 24 + hour) * 60 + minute
+
+
+def __decode_minute_prefixes(prefixes):
+    for offset, separator in MINUTE_SEPARATORS:
+        if np.any(prefixes[:, offset] != ord(separator)):
+            raise ValueError('Timestamp not in the mHealth format')
+    # the bytes below '0' wrap around to large values
+    digits = prefixes[:, MINUTE_DIGITS] - ord('0')
+    if np.any(digits > 9):
+        raise ValueError('Timestamp not in the mHealth format')
+
+    digits = np.ascontiguousarray(digits.T, dtype=np.int64)
+    year = digits[0] * 1000 + digits[1] * 100 + digits[2] * 10 + digits[3]
+    month = digits[4] * 10 + digits[5]
+    day = digits[6] * 10 + digits[7]
+    hour = digits[8] * 10 + digits[9]
+    minute = digits[10] * 10 + digits[11]
+    return year, month, day, hour, minute
+
+
+def __parse_fixed_format(values):
+    """
+    Return the int64 nanoseconds since epoch of strings all in the format 'YYYY-MM-DD HH:MM:SS'
+    followed by the same number of fraction digits, raise ValueError for any other values.
+    The consecutive timestamps of the same minute share their prefix 'YYYY-MM-DD HH:MM', which
+    is only decoded once, the seconds and fraction digits are decoded for every timestamp.
+    """
+    strings = np.asarray(values)
+    if strings.ndim != 1 or len(strings) == 0 or strings.dtype.kind not in 'OUS':
+        raise ValueError('Not an array of strings')
+    # joining the strings in one buffer is faster than converting the array to fixed width bytes
+    try:
+        if strings.dtype.kind == 'S':
+            joined = b'\n'.join(strings) + b'\n'
+        else:
+            joined = ('\n'.join(strings) + '\n').encode('ascii')
+    except (TypeError, UnicodeEncodeError):
+        raise ValueError('Not an array of ascii strings')
+
+    width = len(strings[0])
+    if width != DATE_TIME_LENGTH and not DATE_TIME_LENGTH + 2 <= width <= DATE_TIME_LENGTH + 10:
+        raise ValueError('Timestamp not in the mHealth format')
+    if len(joined) != len(strings) * (width + 1):
+        raise ValueError('Timestamps of different lengths')
+    buffer = np.frombuffer(joined, dtype=np.uint8).reshape(-1, width + 1)
+
+    # a string of another length shifts the following line breaks
+    if np.any(buffer[:, width] != ord('\n')) or np.any(buffer[:, MINUTE_LENGTH] != ord(':')):
+        raise ValueError('Timestamp not in the mHealth format')
+    if width > DATE_TIME_LENGTH and np.any(buffer[:, DATE_TIME_LENGTH] != ord('.')):
+        raise ValueError('Timestamp not in the mHealth format')
+    digits = buffer[:, [MINUTE_LENGTH + 1, MINUTE_LENGTH + 2] + list(range(DATE_TIME_LENGTH + 1, width))] - ord('0')
+    if np.any(digits > 9):
+        raise ValueError('Timestamp not in the mHealth format')
+
+    # compare the 16 bytes of the prefixes as two 8 bytes integers to find where the minute changes
+    first_word = np.ndarray(shape=(len(buffer),), dtype=np.uint64, buffer=joined, offset=0, strides=(width + 1,))
+    second_word = np.ndarray(shape=(len(buffer),), dtype=np.uint64, buffer=joined, offset=8, strides=(width + 1,))
+    run_starts = np.flatnonzero(np.concatenate(([True], (first_word[1:] != first_word[:-1]) |
+                                                        (second_word[1:] != second_word[:-1]))))
+    year, month, day, hour, minute = __decode_minute_prefixes(buffer[run_starts, :MINUTE_LENGTH])
+    second = digits[:, 0].astype(np.int64) * 10 + digits[:, 1]
+
+    # out of range values are left to pandas, which raises the usual error
+    if np.any((month < 1) | (month > 12)) or np.any(hour > 23) or np.any(minute > 59) or np.any(second > 59):
+        raise ValueError('Timestamp out of range')
+    leap_year = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    if np.any((day < 1) | (day > MONTH_LENGTHS[month - 1] + (leap_year & (month == 2)))):
+        raise ValueError('Timestamp out of range')
+
+    minutes = (days_from_civil(year, month, day) * 24 + hour) * 60 + minute
+    nanoseconds = np.repeat(minutes * 60, np.diff(np.append(run_starts, len(buffer))))
+    nanoseconds += second
+    nanoseconds *= 10**9
+    if width > DATE_TIME_LENGTH:
+        fraction = np.zeros(len(buffer), dtype=np.int64)
+        for i in range(2, digits.shape[1]):
+            fraction *= 10
+            fraction += digits[:, i]
+        nanoseconds += fraction * 10 ** (9 - (digits.shape[1] - 2))
+    return nanoseconds
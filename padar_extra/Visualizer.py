@@ -15,6 +15,12 @@ import ast
 import os.path
 import datetime as dt
 import numpy as np
+try:
+    from . import SensorCache, TimestampParser
+except ImportError:
+    # run from the padar_extra folder instead of as a package
+    import SensorCache
+    import TimestampParser
 
 def annotation_feature_grapher(annotationdata, featuredata=None, path_out=None, 
                                feature_index=None, return_fig=False, title='', colors=None,
@@ -59,7 +65,7 @@ def annotation_feature_grapher(annotationdata, featuredata=None, path_out=None,
     annotationdata.reset_index(drop=True, inplace=True)
     if annotationdata.shape[0] > 0:
         try:
-            test_date_time = pd.to_datetime(annotationdata.iloc[0,2])
+            test_date_time = TimestampParser.parse_timestamp(annotationdata.iloc[0,2])
             if isinstance(test_date_time, dt.datetime):
                 annotationdata = annotationdata.iloc[:,1:]
         except:
@@ -190,7 +196,7 @@ def acc_grapher(data, path_out=None, return_fig = False, showlegend=False):
     """
     
     if isinstance(data, str):
-        data = pd.read_csv(data)
+        data = SensorCache.read_sensor_file(data)
 
     x = go.Scatter(
             y=data['X_ACCELERATION_METERS_PER_SECOND_SQUARED'],
@@ -270,7 +276,7 @@ def feature_grapher(featuredata, feature_index = None, path_out=None, return_fig
     
         for index in feature_index:
             trace = go.Scatter(
-                            x = pd.to_datetime(featuredata.iloc[:,1]),
+                            x = TimestampParser.parse_timestamps(featuredata.iloc[:,1]),
                             y = featuredata.iloc[:,index],
                             name = featuredata.columns[index],
                             mode = 'lines+markers',
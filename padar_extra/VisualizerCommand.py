@@ -1,7 +1,7 @@
 import click
-import Visualizer
 import os
 
+# the modules are imported in the commands so that --help does not load plotly and pandas
 @click.group()
 def cli_annotation_feature_grapher():
     pass
@@ -14,6 +14,10 @@ def cli_acc_grapher():
 def cli_feature_grapher():
     pass
 
+@click.group()
+def cli_acc_range_grapher():
+    pass
+
 @cli_annotation_feature_grapher.command()
 @click.argument('annotationdata', type=click.Path(exists=True))
 @click.option('--featuredata', default=None, help='csv file path of the feature data in mHealth format, if not provided, will not graph features')
@@ -24,6 +28,11 @@ def cli_feature_grapher():
 @click.option('--feature_index', default=None, help='a list of indexes of features to show in python syntax')
 @click.option('--feature_num', default=16, help='number of features')
 def annotation_feature_grapher(annotationdata, featuredata, path_out, non_overlap, title, feature_index, feature_num):
+    try:
+        from . import Visualizer
+    except ImportError:
+        # run from the padar_extra folder instead of as a package
+        import Visualizer
     Visualizer.annotation_feature_grapher(annotationdata=annotationdata, 
                             featuredata=featuredata, 
                             path_out=path_out, 
@@ -38,6 +47,36 @@ def annotation_feature_grapher(annotationdata, featuredata, path_out, non_overla
 @click.option('--path_out', type=click.Path(exists=True), default=os.path.dirname(os.path.realpath(__file__)),
                 help='the output path of the graph created, if not provided, will store in the current folder')
 def acc_grapher(data, path_out):
+    try:
+        from . import Visualizer
+    except ImportError:
+        # run from the padar_extra folder instead of as a package
+        import Visualizer
+    Visualizer.acc_grapher(data=data, path_out=path_out, showlegend=True)
+
+
+@cli_acc_range_grapher.command()
+@click.argument('root_path', type=click.Path(exists=True))
+@click.argument('pid')
+@click.argument('start_time')
+@click.argument('stop_time')
+@click.option('--sensor_id', default=None, help='the sensor to graph, if not provided, the pid must have only one sensor in the time range')
+@click.option('--path_out', type=click.Path(exists=True), default=os.path.dirname(os.path.realpath(__file__)),
+                help='the output path of the graph created, if not provided, will store in the current folder')
+def acc_range_grapher(root_path, pid, start_time, stop_time, sensor_id, path_out):
+    try:
+        from . import DatasetCatalog, Visualizer
+    except ImportError:
+        # run from the padar_extra folder instead of as a package
+        import DatasetCatalog
+        import Visualizer
+    catalog = DatasetCatalog.DatasetCatalog(root_path)
+    catalog.refresh([pid])
+    sensor_ids = catalog.find_files(pid, start_time, stop_time, 'sensor', sensor_id)['SENSOR_ID'].unique()
+    if len(sensor_ids) > 1:
+        raise click.UsageError('several sensors in the time range, choose one with --sensor_id: ' + ', '.join(sensor_ids))
+    data = catalog.read_sensor_data(pid, start_time, stop_time, sensor_id)
+    catalog.close()
     Visualizer.acc_grapher(data=data, path_out=path_out, showlegend=True)
 
 
@@ -48,12 +87,17 @@ def acc_grapher(data, path_out):
 @click.option('--feature_index', default=None, help='a list of indexes of features to show in python syntax')
 @click.option('--feature_num', default=16, help='number of features')
 def feature_grapher(featuredata, path_out, feature_index, feature_num):
+    try:
+        from . import Visualizer
+    except ImportError:
+        # run from the padar_extra folder instead of as a package
+        import Visualizer
     Visualizer.feature_grapher(featuredata=featuredata, feature_index=feature_index, showlegend=True, hide_traces=True,
                                 path_out=path_out,
                                 feature_num=feature_num)
 
 
-total_comands = click.CommandCollection(sources=[cli_annotation_feature_grapher, cli_acc_grapher, cli_feature_grapher])
+total_comands = click.CommandCollection(sources=[cli_annotation_feature_grapher, cli_acc_grapher, cli_acc_range_grapher, cli_feature_grapher])
 
 if __name__ == '__main__':
     total_comands()
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""
+The annotation_splitter of the baseline AnnotationSplitter, copied unchanged, to compare the
+output of AnnotationSplitter.annotation_splitter with, see test_annotation_splitter.py
+"""
+
+import pandas as pd
+
+def annotation_splitter(in_annotation):
+    '''
+    Combine overlapped labels and split them according to time
+
+    :param pandas.DataFrame in_annotation: the raw annotation to split
+    '''
+
+    time_list = []
+    # iterate through the annotation data, put (start time/end time, label name
+    # start/end, index) to a list
+    for index, series in in_annotation.iterrows():
+        time_list.append((pd.to_datetime(series[1]),
+                          series[3],'start',index))
+        time_list.append((pd.to_datetime(series[2]),
+                          series[3],'end',index))
+    time_list.sort(key=lambda tup:tup[0])# sort the list according to time
+
+    # iterate through the time list, detect overlap. If exist, split and concatenate them
+    curr_activities = []
+    splitted_time_list = []
+    last_time = time_list[0][0]
+
+    for time_record in time_list:
+        curr_time = time_record[0]
+        if curr_time == last_time and time_record[2] == 'start':
+            curr_activities.append(time_record[1].lower().strip())
+        else:
+            if len(curr_activities) > 0 and last_time != curr_time:
+                curr_activities.sort()
+                new_label = '-'.join(curr_activities)
+                splitted_time_list.append(pd.Series([last_time, last_time, curr_time, new_label],
+                                                    index=['HEADER_TIME_STAMP','START_TIME','STOP_TIME','LABEL_NAME']))
+            if time_record[2] == 'start':
+                curr_activities.append(time_record[1].lower().strip())
+            else:
+                curr_activities.remove(time_record[1].lower().strip())
+
+            last_time = curr_time
+
+    # sort by start time, export to dataframe
+    splitted_time_list.sort(key=lambda series: series['START_TIME'])
+    splitted_annotation = pd.DataFrame(splitted_time_list)
+
+    return splitted_annotation
@@ -0,0 +1,99 @@
+"""
+Check that AnnotationSplitter.annotation_splitter, and iter_annotation_splitter on hourly chunks,
+split the annotations the same way as the baseline annotation_splitter.
+
+Usage: python tests/test_annotation_splitter.py, or python -m pytest tests
+"""
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'padar_extra'))
+import AnnotationSplitter
+import baseline_annotation_splitter
+
+LABELS = ['Walking', 'sitting', 'Standing ', 'lying', 'Talking', 'using phone', 'eating', 'Typing']
+
+
+def make_annotations(rows):
+    """
+    Return the annotations in mHealth format of rows of (start time, stop time, label)
+    """
+    start_times = [x[0] for x in rows]
+    return pd.DataFrame({'HEADER_TIME_STAMP': start_times,
+                         'START_TIME': start_times,
+                         'STOP_TIME': [x[1] for x in rows],
+                         'LABEL_NAME': [x[2] for x in rows]},
+                        columns=['HEADER_TIME_STAMP', 'START_TIME', 'STOP_TIME', 'LABEL_NAME'])
+
+
+def generate_annotations(rows, seed):
+    """
+    Return rows annotations in random order, with times on a grid of 10 seconds so many annotations
+    start or stop at the same time, and one in ten with the same start and stop time
+    """
+    random = np.random.RandomState(seed)
+    durations = random.randint(1, 60, rows) * 10
+    durations[random.rand(rows) < 0.1] = 0
+    start_times = pd.Timestamp('2015-10-08 22:00:00') + pd.to_timedelta(random.randint(0, 1500, rows) * 10, unit='s')
+    stop_times = start_times + pd.to_timedelta(durations, unit='s')
+    return make_annotations(list(zip(start_times.strftime('%Y-%m-%d %H:%M:%S.000'),
+                                     stop_times.strftime('%Y-%m-%d %H:%M:%S.000'),
+                                     random.choice(LABELS, rows))))
+
+
+class TestAnnotationSplitter(unittest.TestCase):
+
+    def assert_same_split(self, in_annotation):
+        expected = baseline_annotation_splitter.annotation_splitter(in_annotation)
+        self.assertGreater(expected.shape[0], 0)
+        pd.testing.assert_frame_equal(AnnotationSplitter.annotation_splitter(in_annotation), expected)
+
+        # hourly chunks sorted by start time, like the hourly annotation files
+        sorted_annotation = in_annotation.sort_values('START_TIME', kind='mergesort')
+        chunks = [x for _, x in sorted_annotation.groupby(sorted_annotation['START_TIME'].str[:13], sort=True)]
+        result = pd.concat(list(AnnotationSplitter.iter_annotation_splitter(chunks)), ignore_index=True)
+        pd.testing.assert_frame_equal(result, expected)
+
+
+    def test_random(self):
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                self.assert_same_split(generate_annotations(300, seed))
+
+
+    def test_zero_duration(self):
+        self.assert_same_split(make_annotations([
+            ('2015-10-08 20:00:00.000', '2015-10-08 20:10:00.000', 'Walking'),
+            # alone, inside another annotation, at its start and at its stop
+            ('2015-10-08 19:00:00.000', '2015-10-08 19:00:00.000', 'sitting'),
+            ('2015-10-08 20:05:00.000', '2015-10-08 20:05:00.000', 'Talking'),
+            ('2015-10-08 20:00:00.000', '2015-10-08 20:00:00.000', 'eating'),
+            ('2015-10-08 20:10:00.000', '2015-10-08 20:10:00.000', 'lying')]))
+
+
+    def test_unsorted(self):
+        self.assert_same_split(make_annotations([
+            ('2015-10-08 23:30:00.000', '2015-10-09 00:30:00.000', 'lying'),
+            ('2015-10-08 20:00:00.000', '2015-10-08 21:00:00.000', 'Walking'),
+            ('2015-10-08 22:15:00.000', '2015-10-08 23:45:00.000', 'sitting'),
+            ('2015-10-08 20:30:00.000', '2015-10-08 22:30:00.000', 'using phone'),
+            ('2015-10-08 21:10:00.500', '2015-10-08 21:10:01.250', 'Typing')]))
+
+
+    def test_shared_times(self):
+        self.assert_same_split(make_annotations([
+            # the same start, the same stop, one stopping when the other starts, the same label twice
+            ('2015-10-08 20:00:00.000', '2015-10-08 20:30:00.000', 'Walking'),
+            ('2015-10-08 20:00:00.000', '2015-10-08 20:10:00.000', 'Talking'),
+            ('2015-10-08 20:10:00.000', '2015-10-08 20:30:00.000', 'using phone'),
+            ('2015-10-08 20:30:00.000', '2015-10-08 20:40:00.000', 'Standing '),
+            ('2015-10-08 20:20:00.000', '2015-10-08 20:40:00.000', 'walking'),
+            ('2015-10-08 20:20:00.000', '2015-10-08 20:40:00.000', 'Walking')]))
+
+
+if __name__ == '__main__':
+    unittest.main()
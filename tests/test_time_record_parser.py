@@ -0,0 +1,124 @@
+"""
+Check that TimeRecordParser.parse writes the same files as the baseline parser, byte for byte,
+total.annotation.csv and the hourly annotation files when split by hour.
+
+Usage: python tests/test_time_record_parser.py, or python -m pytest tests
+"""
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'padar_extra'))
+import TimeRecordParser
+import baseline_time_record_parser
+
+ANNOTATION_SET = 'SPADESInLab'
+ANNOTATOR_SET_ID = 'alvin-SPADESInLab'
+
+# the activities matching a keyword of categorize_label, the others are asked on the console
+ACTIVITIES = ['walking outdoor', 'sitting, typing', 'running', 'standing', 'using computer', 'walk in door',
+              'shopping', 'climbing stairs', 'lying', 'packing']
+
+# several activities at once, stops on the hour, just before and after it, over midnight and for hours
+EDGE_RECORDS = ['[2018/06/20 08:00:00] start walking outdoor, typing',
+                '[2018/06/20 08:59:59] start sitting',
+                '[2018/06/20 09:00:00] start standing',
+                '[2018/06/20 09:00:01] end',
+                '[2018/06/20 09:30:00] start running',
+                '[2018/06/20 10:00:00] start using computer, walk in door',
+                '[2018/06/20 10:00:00] start lying',
+                '[2018/06/20 23:30:00] start lying',
+                '[2018/06/21 03:00:00] end',
+                '[2018/06/21 03:00:00] start climbing stairs',
+                '[2018/06/21 03:00:00] end',
+                '[2018/06/21 03:10:00] start shopping',
+                '[2018/06/21 05:59:59] end']
+
+
+def generate_time_records(records, seed):
+    """
+    Return the lines of a time record log with records activities of a few seconds to an hour, with
+    a night of sleep every 50 activities, stopped by the next start or by an end record
+    """
+    random = np.random.RandomState(seed)
+    time = pd.Timestamp('2018-06-20 08:00:00')
+    lines = []
+    for i in range(records):
+        label = 'lying' if i % 50 == 49 else ACTIVITIES[random.randint(len(ACTIVITIES))]
+        lines.append('[{}] start {}'.format(time.strftime('%Y/%m/%d %H:%M:%S'), label))
+        time += pd.Timedelta(seconds=int(8 * 3600 if label == 'lying' else random.randint(1, 3600)))
+        if random.rand() < 0.3:
+            lines.append('[{}] end'.format(time.strftime('%Y/%m/%d %H:%M:%S')))
+            time += pd.Timedelta(seconds=int(random.randint(0, 600)))
+    lines.append('[{}] end'.format(time.strftime('%Y/%m/%d %H:%M:%S')))
+    return lines
+
+
+def list_files(root_path):
+    return sorted(os.path.relpath(os.path.join(path, x), root_path)
+                  for path, _, file_names in os.walk(root_path) for x in file_names)
+
+
+class TestTimeRecordParser(unittest.TestCase):
+
+    def setUp(self):
+        self.root_path = tempfile.mkdtemp(prefix='test_time_record_parser_')
+
+
+    def tearDown(self):
+        shutil.rmtree(self.root_path, ignore_errors=True)
+
+
+    def assert_same_files(self, lines, split, categorize):
+        file_path = os.path.join(self.root_path, 'time_records.txt')
+        with open(file_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        baseline_path = os.path.join(self.root_path, 'baseline') + '/'
+        parser_path = os.path.join(self.root_path, 'parser') + '/'
+        os.makedirs(baseline_path)
+        os.makedirs(parser_path)
+        # the baseline parser expects the hourly folders to exist when the records are split by hour
+        times = pd.to_datetime([line[1:20] for line in lines])
+        for hour in pd.date_range(times.min().floor('H'), times.max().floor('H'), freq='H'):
+            os.makedirs(os.path.join(baseline_path, 'MasterSynced', hour.strftime('%Y/%m/%d/%H')))
+
+        baseline_time_record_parser.parse(file_path, baseline_path, split, categorize, ANNOTATION_SET, ANNOTATOR_SET_ID)
+        TimeRecordParser.parse(file_path, parser_path, split, categorize, ANNOTATION_SET, ANNOTATOR_SET_ID,
+                               categorizer=TimeRecordParser.LabelCategorizer(decisions_path=None))
+
+        files = list_files(baseline_path)
+        self.assertGreater(len(files), 0)
+        self.assertEqual(files, list_files(parser_path))
+        _, mismatch, errors = filecmp.cmpfiles(baseline_path, parser_path, files, shallow=False)
+        self.assertEqual(mismatch + errors, [])
+
+
+    def test_total(self):
+        self.assert_same_files(generate_time_records(500, 0), False, False)
+
+
+    def test_split_by_hour(self):
+        self.assert_same_files(generate_time_records(500, 0), True, False)
+
+
+    def test_categorize(self):
+        self.assert_same_files(generate_time_records(500, 1), True, True)
+
+
+    def test_edge_records(self):
+        for split in [False, True]:
+            for categorize in [False, True]:
+                with self.subTest(split=split, categorize=categorize):
+                    self.tearDown()
+                    self.setUp()
+                    self.assert_same_files(EDGE_RECORDS, split, categorize)
+
+
+if __name__ == '__main__':
+    unittest.main()